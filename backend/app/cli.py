@@ -0,0 +1,144 @@
+"""
+Command line tools for the saved chats (persistent mode database).
+
+Bulk export / import without going through the web server - for backups,
+analytics and moving to another database. Uses DATABASE_URL like the app.
+
+Run from the backend folder:
+    python -m app.cli export --out sessions.jsonl.gz          (.gz = compressed)
+    python -m app.cli export --session abc --since 2025-01-01 > abc.ndjson
+    python -m app.cli import sessions.jsonl.gz
+    zcat old.jsonl.gz | python -m app.cli import -
+    python -m app.cli index-roadmaps                (rebuild the roadmap index, e.g. after an import)
+    python -m app.cli archive --idle-days 30        (archive idle sessions now + incremental VACUUM)
+    python -m app.cli archive --idle-days 90 --new-dictionary
+    python -m app.cli archive --full-vacuum         (once, for a database made before archiving existed)
+"""
+
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import sys
+
+# Bytes read from the input file per chunk
+_READ_CHUNK_BYTES = 1024 * 1024
+
+
+def _since(value: str) -> datetime:
+    """--since as naive UTC, like the stored times (2025-01-01T10:00+05:30 is 04:30 UTC)."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+async def _export(args) -> None:
+    from .services.session_transfer import export_sessions
+
+    to_stdout = args.out in (None, "-")
+    compress = args.gzip or (not to_stdout and args.out.endswith(".gz"))
+    out = sys.stdout.buffer if to_stdout else open(args.out, "wb")
+    try:
+        async for chunk in export_sessions(compress=compress, session_ids=args.session, since=args.since):
+            out.write(chunk)
+    finally:
+        if not to_stdout:
+            out.close()
+
+
+async def _read_chunks(source):
+    while True:
+        chunk = source.read(_READ_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _import(args) -> None:
+    from .database import init_db
+    from . import models  # noqa: F401  (registers the tables)
+    from .services.session_transfer import import_sessions
+
+    # The target may be a brand-new database
+    await init_db()
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        report = await import_sessions(_read_chunks(source))
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    print(json.dumps(report, indent=2))
+
+
+async def _index_roadmaps(args) -> None:
+    from .database import init_db
+    from . import models  # noqa: F401  (registers the tables)
+    from .services.roadmap_index import rebuild_index
+
+    await init_db()
+    print(f"Indexed {await rebuild_index()} roadmaps")
+
+
+async def _archive(args) -> None:
+    from datetime import timedelta
+    from .config import settings
+    from .database import init_db
+    from . import models  # noqa: F401  (registers the tables)
+    from .services import session_archive
+
+    if args.idle_days is None and settings.ARCHIVE_AFTER_DAYS <= 0:
+        raise SystemExit("Archiving is off (ARCHIVE_AFTER_DAYS=0): pass --idle-days")
+    await init_db()
+    idle_for = timedelta(days=args.idle_days) if args.idle_days is not None else None
+    report = await session_archive.archive_idle_sessions(idle_for=idle_for, new_dictionary=args.new_dictionary)
+    if args.full_vacuum:
+        await session_archive.full_vacuum()
+    else:
+        report["vacuumed_pages"] = await session_archive.incremental_vacuum(args.vacuum_pages)
+    report["storage"] = await session_archive.storage_report()
+    print(json.dumps(report, indent=2))
+
+
+async def _run(command) -> None:
+    from .database import engine
+    try:
+        await command
+    finally:
+        # Close pooled connections (and their threads) before the loop ends
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write all chats as NDJSON / gzip JSONL")
+    export.add_argument("--out", help="output file (default: stdout); a .gz name is compressed")
+    export.add_argument("--gzip", action="store_true", help="compress even without a .gz name")
+    export.add_argument("--session", action="append", help="only this session (repeatable)")
+    export.add_argument("--since", type=_since,
+                        help="only messages at or after this time (UTC, or with an offset)")
+
+    import_ = commands.add_parser("import", help="load an export file into this database")
+    import_.add_argument("path", help="export file (NDJSON or gzip), or - for stdin")
+
+    commands.add_parser("index-roadmaps", help="rebuild the roadmap index from chat_history")
+
+    archive = commands.add_parser("archive", help="compress idle sessions out of chat_history, free disk space")
+    archive.add_argument("--idle-days", type=float, help="idle for more than this (default: ARCHIVE_AFTER_DAYS)")
+    archive.add_argument("--new-dictionary", action="store_true",
+                         help="train a new compression dictionary on the current messages first")
+    archive.add_argument("--vacuum-pages", type=int, default=0, help="free pages to give back (default 0 = all)")
+    archive.add_argument("--full-vacuum", action="store_true",
+                         help="rewrite the whole file instead (needed once to turn on incremental VACUUM)")
+
+    args = parser.parse_args(argv)
+    command = {"export": _export, "import": _import, "index-roadmaps": _index_roadmaps,
+               "archive": _archive}[args.command]
+    asyncio.run(_run(command(args)))
+
+
+if __name__ == "__main__":
+    main()
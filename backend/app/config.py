@@ -5,17 +5,174 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 import os
+from typing import Optional
 
 # Load variables from .env file
 load_dotenv()
 
 class Settings(BaseSettings):
+    # Which API the app serves (see main.py):
+    # - "stateless":  the client sends the chat history / PDF text (no database)
+    # - "persistent": chats are saved per session_id in the database
+    APP_MODE: str = os.getenv("APP_MODE", "stateless")
+
+    # Heavy setup (Groq SDK, PDF worker processes, language profiles):
+    # "background" = right after startup, while requests are already served,
+    # "blocking" = before the first request, "off" = on first use
+    STARTUP_WARM_UP: str = os.getenv("STARTUP_WARM_UP", "background")
+
+    # Production server (serve.py): worker processes (0 = one per CPU core), address,
+    # requests after which a worker is replaced by a fresh one (0 = never; each worker
+    # adds a random 0..JITTER so they don't all restart at once), and how long
+    # running requests / streams may take to finish on shutdown
+    WEB_WORKERS: int = int(os.getenv("WEB_WORKERS", "0"))
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8000"))
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+    GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+
     # Groq API key (get it from https://console.groq.com/keys)
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
 
+    # Optional: point the Groq client somewhere else (e.g. a local fake server for benchmarks)
+    GROQ_BASE_URL: Optional[str] = os.getenv("GROQ_BASE_URL")
+
+    # LLM client tuning (per worker process)
+    # - max concurrent Groq calls; extra requests wait for a free slot
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    # - HTTP connection pool (keep-alive connections are reused between requests)
+    #   keep it >= LLM_MAX_CONCURRENCY so waiting requests queue on the cheap semaphore
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "32"))
+    # - timeouts in seconds (connect is short, the full completion can take a while)
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "60"))
+
+    # Groq resilience (see services/upstream.py)
+    # Rate limits of your Groq plan, per minute (0 = don't limit on our side)
+    LLM_RPM: int = int(os.getenv("LLM_RPM", "0"))
+    LLM_TPM: int = int(os.getenv("LLM_TPM", "0"))
+    # How long a request may wait for a slot / rate-limit budget / retries before 503
+    LLM_QUEUE_DEADLINE_SECONDS: float = float(os.getenv("LLM_QUEUE_DEADLINE_SECONDS", "10"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+    LLM_RETRY_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+    # Failures in a row before we stop calling Groq, and for how long
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+    # LLM response cache (same prompt -> same reply, without calling Groq again)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    # Optional SQLite file for a second cache level that survives restarts (empty = off)
+    LLM_CACHE_SQLITE_PATH: str = os.getenv("LLM_CACHE_SQLITE_PATH", "")
+
+    # Chat history: how many recent messages are sent to the LLM,
+    # and how many sessions keep those messages in memory (0 = always read the DB)
+    HISTORY_WINDOW: int = int(os.getenv("HISTORY_WINDOW", "40"))
+    HISTORY_BUFFER_MAX_SESSIONS: int = int(os.getenv("HISTORY_BUFFER_MAX_SESSIONS", "10000"))
+
+    # Stateless mode, delta chat protocol: how many conversations each worker keeps
+    # (only the part that still fits in a prompt) so clients can send just the new message
+    STATELESS_SESSIONS_MAX: int = int(os.getenv("STATELESS_SESSIONS_MAX", "10000"))
+
+    # POST /api/chat/batch: max items per request, max Groq calls at once per batch,
+    # and how many answered turns are saved per INSERT + commit
+    CHAT_BATCH_MAX_ITEMS: int = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+    CHAT_BATCH_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_CONCURRENCY", "16"))
+    CHAT_BATCH_WRITE_CHUNK: int = int(os.getenv("CHAT_BATCH_WRITE_CHUNK", "100"))
+
+    # Roadmaps written earlier for a similar career goal (full-text index, persistent mode):
+    # "off" = no index, "exemplar" = show the best match to the LLM with a shorter reply limit,
+    # "reuse" = also send a stored plan as-is when a new session states the same goal.
+    # Off by default: both put text written for ANOTHER user into this user's chat
+    ROADMAP_REUSE: str = os.getenv("ROADMAP_REUSE", "off")
+    ROADMAP_MIN_OVERLAP: float = float(os.getenv("ROADMAP_MIN_OVERLAP", "0.5"))   # share of goal words
+    ROADMAP_EXEMPLAR_CHARS: int = int(os.getenv("ROADMAP_EXEMPLAR_CHARS", "1500"))
+    ROADMAP_EXEMPLAR_MAX_TOKENS: int = int(os.getenv("ROADMAP_EXEMPLAR_MAX_TOKENS", "500"))
+
+    # Bulk export / import of sessions (GET /api/sessions/export, POST /api/sessions/import, app.cli):
+    # rows fetched per cursor round trip, rows per executemany + commit, and gzip level.
+    # The HTTP endpoints need "Authorization: Bearer <ADMIN_TOKEN>" and are off while it is empty.
+    EXPORT_CHUNK_ROWS: int = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+    IMPORT_BATCH_ROWS: int = int(os.getenv("IMPORT_BATCH_ROWS", "5000"))
+    EXPORT_GZIP_LEVEL: int = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # Language detection: how many sessions remember their language in memory
+    LANGUAGE_MEMO_MAX_SESSIONS: int = int(os.getenv("LANGUAGE_MEMO_MAX_SESSIONS", "10000"))
+    # Load langdetect's profiles during warm-up (~60 MB per worker) instead of on the
+    # first mixed-script message (~0.6 s for that user)
+    LANGUAGE_WARM_UP: bool = os.getenv("LANGUAGE_WARM_UP", "true").lower() == "true"
+
+    # Prompt size: history is packed into this many (estimated) tokens,
+    # older messages are folded into a short summary of at most CONTEXT_SUMMARY_TOKENS
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+    CONTEXT_SUMMARY_TOKENS: int = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))
+
+    # PDF rendering runs in separate processes (so it never blocks chat)
+    # - how many render processes, and how many extra renders may wait in line
+    PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", str(min(2, os.cpu_count() or 1))))
+    PDF_MAX_QUEUE: int = int(os.getenv("PDF_MAX_QUEUE", "8"))
+    # - seconds the client is asked to wait when the pool is full (429 response)
+    PDF_RETRY_AFTER_SECONDS: int = int(os.getenv("PDF_RETRY_AFTER_SECONDS", "2"))
+
+    # Rendered PDFs are cached on disk by content hash (repeat downloads cost no CPU)
+    PDF_CACHE_DIR: str = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+    PDF_CACHE_MAX_BYTES: int = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    PDF_CACHE_MAX_AGE_SECONDS: float = float(os.getenv("PDF_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+    # true = never write PDFs to disk, render in memory and send straight to the client
+    PDF_IN_MEMORY: bool = os.getenv("PDF_IN_MEMORY", "false").lower() == "true"
+    # POST /api/export-pdf/bulk (one ZIP for many sessions): max sessions per ZIP, and
+    # how many of its renders may be in the pool at once (0 = one per PDF worker)
+    PDF_BULK_MAX_SESSIONS: int = int(os.getenv("PDF_BULK_MAX_SESSIONS", "500"))
+    PDF_BULK_CONCURRENCY: int = int(os.getenv("PDF_BULK_CONCURRENCY", "0"))
+    # Speculative PDF (persistent mode): after a roadmap reply, render the session's PDF in
+    # the background so the download is instant. One at a time, only while the pool is idle,
+    # at a lower CPU priority (nice); at most this many sessions wait (the oldest are dropped)
+    PDF_PRERENDER: bool = os.getenv("PDF_PRERENDER", "true").lower() == "true"
+    PDF_PRERENDER_MAX_PENDING: int = int(os.getenv("PDF_PRERENDER_MAX_PENDING", "32"))
+    PDF_PRERENDER_DELAY_SECONDS: float = float(os.getenv("PDF_PRERENDER_DELAY_SECONDS", "0.5"))
+    PDF_PRERENDER_NICE: int = int(os.getenv("PDF_PRERENDER_NICE", "10"))
+
+    # Loose generated files (temp_pdfs/) are deleted by a background sweeper
+    TEMP_PDF_DIR: str = os.getenv("TEMP_PDF_DIR", "temp_pdfs")
+    TEMP_PDF_MAX_BYTES: int = int(os.getenv("TEMP_PDF_MAX_BYTES", str(64 * 1024 * 1024)))
+    TEMP_PDF_MAX_AGE_SECONDS: float = float(os.getenv("TEMP_PDF_MAX_AGE_SECONDS", "3600"))
+    ARTIFACT_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("ARTIFACT_SWEEP_INTERVAL_SECONDS", "300"))
+
     # Database URL (SQLite is simple — just a file on disk)
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./career.db")
 
+    # SQLite storage profile: "tuned" (WAL + the settings below) or "default" (SQLite defaults)
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "tuned")
+    DB_SYNCHRONOUS: str = os.getenv("DB_SYNCHRONOUS", "NORMAL")    # fsync on checkpoint, not every commit
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))  # wait for locks instead of failing
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+    # Archival (persistent mode, services/session_archive.py): sessions idle for this many
+    # days (0 = never, the default) move out of chat_history into one zlib blob each, compressed with a
+    # shared dictionary, and come back when the user returns. Checked every INTERVAL seconds,
+    # CHUNK sessions per transaction; each run also gives up to VACUUM_PAGES free pages
+    # back to the file system (incremental VACUUM, 0 = all of them)
+    ARCHIVE_AFTER_DAYS: float = float(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+    ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+    ARCHIVE_CHUNK_SESSIONS: int = int(os.getenv("ARCHIVE_CHUNK_SESSIONS", "200"))
+    ARCHIVE_VACUUM_PAGES: int = int(os.getenv("ARCHIVE_VACUUM_PAGES", "5000"))
+    ARCHIVE_ZLIB_LEVEL: int = int(os.getenv("ARCHIVE_ZLIB_LEVEL", "9"))
+
+    # Group commit: save chat turns from many requests in one transaction
+    DB_WRITE_BATCHING: bool = os.getenv("DB_WRITE_BATCHING", "false").lower() == "true"
+    DB_WRITE_BATCH_WINDOW_MS: float = float(os.getenv("DB_WRITE_BATCH_WINDOW_MS", "2"))
+    DB_WRITE_BATCH_MAX: int = int(os.getenv("DB_WRITE_BATCH_MAX", "200"))
+
+    # GET /metrics (Prometheus text format) + per-request HTTP metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
     # Secret key for security (you can generate any random string)
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-change-me")
 
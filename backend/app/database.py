@@ -1,16 +1,105 @@
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
 
 Base = declarative_base()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False
-)
+
+def _is_file_sqlite(url: str) -> bool:
+    """True for an on-disk SQLite database (not :memory:, not another database)."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def _sqlite_pragmas() -> list:
+    """
+    Connection settings of the "tuned" storage profile.
+
+    - WAL: readers don't block the writer and the writer doesn't block readers
+    - synchronous=NORMAL: with WAL, commits no longer wait for an fsync each
+      (a power cut can lose the last commits, never corrupt the file)
+    - mmap_size: read the database through memory mapping
+    - busy_timeout: wait for a lock instead of raising "database is locked"
+    - auto_vacuum=INCREMENTAL: freed pages can be given back to the file
+      system a few at a time (services/session_archive.py). Only takes
+      effect on a new file (so it goes first); an existing one needs one
+      full VACUUM
+    """
+    return [
+        "PRAGMA auto_vacuum=INCREMENTAL",
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.DB_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.DB_MMAP_SIZE}",
+        f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT_MS}",
+    ]
+
+
+def make_engine(url: str = None):
+    """The async engine, with the storage profile applied to SQLite files."""
+    url = url or settings.DATABASE_URL
+    if not _is_file_sqlite(url) or settings.DB_PROFILE != "tuned":
+        return create_async_engine(url, echo=False)
+
+    engine = create_async_engine(
+        url,
+        echo=False,
+        # aiosqlite defaults to NullPool: a new connection (and thread) for
+        # every session. Keep connections open and reuse them instead.
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        # Same limit for Python's own sqlite3 lock wait (seconds)
+        connect_args={"timeout": settings.DB_BUSY_TIMEOUT_MS / 1000},
+    )
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
+
+
+def _add_missing_columns(sync_conn) -> None:
+    """ALTER TABLE ... ADD COLUMN for nullable columns added to a model later."""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+
+async def init_db():
+    """
+    Create missing tables, columns AND indexes (and the extra DDL of models.py).
+
+    create_all() skips tables that already exist, including any column or
+    index that was added to them later, so those are added one by one here.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        # Tables the models can't declare (e.g. the FTS5 index in models.py)
+        for ddl in Base.metadata.info.get("extra_ddl", []):
+            await conn.execute(text(ddl))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                await conn.run_sync(lambda sync_conn, ix=index: ix.create(sync_conn, checkfirst=True))
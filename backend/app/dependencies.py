@@ -1,8 +1,31 @@
 # backend/app/dependencies.py
 
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
 from .database import SessionLocal
 
 async def get_db():
     async with SessionLocal() as session:
         yield session
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Admin-only endpoints (bulk export / import of everyone's chats).
+
+    They need "Authorization: Bearer <ADMIN_TOKEN>", and don't exist at all
+    while ADMIN_TOKEN is not set.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Admin token required.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -1,247 +1,392 @@
+"""
+Main - Builds the FastAPI app (create_app) for one of two modes.
+
+- APP_MODE=stateless (default, what the React frontend uses):
+  POST /api/chat gets the whole history in the body (or only the new
+  message, see services/conversation_store.py), POST /api/export-pdf
+  gets the text to render. No database (routers/stateless.py).
+- APP_MODE=persistent: chats are saved per session_id.
+  POST /api/chat, POST /api/chat/stream (routers/chat.py) and
+  POST /api/export-pdf of the session's plan (routers/pdf.py), and the
+  admin-only bulk export / import of all chats (routers/transfer.py).
+
+Both modes share /, /health and /metrics.
+
+Startup is kept short: heavy packages are not imported here. The Groq SDK
+is imported by the first chat (or warm-up), langdetect by the first mixed-
+script message, ReportLab only inside the PDF worker processes, and the
+database modules only in persistent mode. STARTUP_WARM_UP decides whether
+that work happens in the background after startup (default), before the
+first request, or not at all until it's needed.
+
+Run:
+    python serve.py                           (production: one warm worker per CPU core)
+    uvicorn app.main:app                      (mode from APP_MODE)
+    uvicorn --factory app.main:create_app     (same, the app is built by uvicorn)
+"""
+
+from typing import Optional
+import asyncio
+import logging
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-from groq import Groq
-import logging
+from fastapi.responses import Response
 
 from .config import settings
-from .database import engine, Base
-from .models import ChatHistory  # Import models so tables are created
-
-# For PDF generation
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from io import BytesIO
-from fastapi.responses import StreamingResponse
+from .services import llm_service
+from .services.llm_service import close_client, llm_flights
+from .services.upstream import groq_guard
+from .services.response_cache import response_cache
+from .services.pdf_pool import pdf_pool
+from .services.pdf_cache import pdf_cache
+from .services.artifact_store import run_sweeper, temp_pdf_store
+from .services.metrics import CONTENT_TYPE, MetricsMiddleware, add_collector, render_latest, stats_family
 
 logger = logging.getLogger(__name__)
 
-# ------------------ ENV / CLIENT SETUP ------------------
+MODES = ("stateless", "persistent")
+WARM_UP_MODES = ("background", "blocking", "off")
 
-if not settings.GROQ_API_KEY:
-    # Fail fast at startup in a clear way, but do NOT print the key
-    raise RuntimeError(
-        "GROQ_API_KEY not found. Please add it to your .env file "
-        "or environment before starting the backend."
-    )
-
-client = Groq(api_key=settings.GROQ_API_KEY)
-
-# ------------------ APP SETUP ------------------
-
-app = FastAPI(
-    title="Career Debate Coach Backend",
-    version="1.0.0",
-    description="AI that debates career choices and generates roadmaps"
-)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],   # ← change this in production!
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# ------------------ METRICS COLLECTORS ------------------
 
-
-# ------------------ STARTUP HOOK ------------------
-
-@app.on_event("startup")
-async def startup_event():
+def _service_metrics():
     """
-    Create database tables automatically when the app starts.
-    
-    This is beginner-friendly: you don't need to run migrations manually.
-    SQLite will create the database file if it doesn't exist.
+    Numbers the services already count, read only when /metrics is scraped
+    (so cache lookups etc. don't pay for a second counter).
     """
-    try:
-        # Create all tables defined in models.py
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables created successfully (or already exist)")
-    except Exception as e:
-        logger.error(f"Failed to create database tables: {e}")
-        # Don't crash the app - maybe database file is locked or permissions issue
-        # But log it so you know something is wrong
+    for cache, stats in (
+        ("llm_response", response_cache.stats()),
+        ("pdf", pdf_cache.stats()),
+    ):
+        yield stats_family(
+            "career_coach_cache_lookups_total", "counter", "Cache lookups by result",
+            {"hit": stats["hits"], "miss": stats["misses"]}, label="result", extra={"cache": cache},
+        )
 
+    flights = llm_flights.stats()
+    yield stats_family(
+        "career_coach_llm_single_flight_total", "counter",
+        "LLM calls started vs. answered from an identical call already running",
+        {"started": flights["calls"], "shared": flights["shared"]},
+    )
 
-# ------------------ MODELS ------------------
+    upstream = groq_guard.stats()
+    breaker = upstream["breaker"]
+    yield stats_family(
+        "career_coach_llm_upstream_events_total", "counter", "Groq retries, failures and refusals",
+        {
+            "retry": upstream["retries"],
+            "failure": upstream["failures"],
+            "timed_out_in_queue": upstream["timed_out_in_queue"],
+            "breaker_opened": breaker["times_opened"],
+            "breaker_rejected": breaker["rejected"],
+        },
+        label="event",
+    )
+    yield stats_family(
+        "career_coach_llm_breaker_state", "gauge", "1 for the current circuit breaker state",
+        {state: int(breaker["state"] == state) for state in ("closed", "open", "half_open")},
+        label="state",
+    )
 
-class Message(BaseModel):
-    # Keep types simple, but we still explain clearly in comments
-    role: str   # should be "user" or "assistant"
-    content: str  # single chat message text
+    pool = pdf_pool.stats()
+    yield stats_family(
+        "career_coach_pdf_pool", "gauge", "PDF renders in the pool (running + waiting) and its limits",
+        {"pending": pool["pending"], "max_queue": pool["max_queue"], "workers": pool["workers"]},
+    )
+    yield stats_family(
+        "career_coach_pdf_pool_rejected_total", "counter", "PDF exports refused because the pool was full",
+        {"rejected": pool["rejected"]},
+    )
 
-class ChatRequest(BaseModel):
-    history: List[Message]
-    message: str
 
-class ChatResponse(BaseModel):
-    reply: str
+def _session_metrics():
+    """Persistent mode only: history buffer, language memo and batched DB writes."""
+    from .services.chat_writer import chat_write_batcher
+    from .services.history_service import history_buffer
+    from .services.language_service import language_detector
+    from .services.pdf_prerender import pdf_prerenderer
+    from .services import roadmap_index, session_archive
+
+    language = language_detector.stats()
+    for cache, hits, misses in (
+        ("history", history_buffer.hits, history_buffer.misses),
+        # Every message the memo didn't answer is a miss, however it was resolved then
+        ("language", language["memo_hits"], language["script_fast_path"] + language["model_calls"]),
+    ):
+        yield stats_family(
+            "career_coach_cache_lookups_total", "counter", "Cache lookups by result",
+            {"hit": hits, "miss": misses}, label="result", extra={"cache": cache},
+        )
+    yield stats_family(
+        "career_coach_language_detections_total", "counter",
+        "Messages by how their language was found: session memo, script alone, or the langdetect model",
+        {path: language[path] for path in ("memo_hits", "script_fast_path", "model_calls")}, label="path",
+    )
 
-class ExportPDFRequest(BaseModel):
-    content: str
-    title: Optional[str] = "Career Roadmap & Advice"
-    filename: Optional[str] = "career_roadmap.pdf"
+    roadmaps = roadmap_index.stats()
+    yield stats_family(
+        "career_coach_roadmap_lookups_total", "counter",
+        "Chat turns that reused a stored roadmap, got one as a reference, or found none",
+        {result: roadmaps[result] for result in ("reused", "exemplar", "none")}, label="result",
+    )
 
-# ------------------ ROUTES ------------------
+    archive = session_archive.stats()
+    yield stats_family(
+        "career_coach_session_archive_total", "counter",
+        "Idle sessions archived (compressed out of chat_history) and restored when users came back",
+        {"archived": archive["archived_sessions"], "restored": archive["restored"]}, label="event",
+    )
 
-@app.get("/")
-def root():
-    return {"status": "running"}
+    prerender = pdf_prerenderer.stats()
+    yield stats_family(
+        "career_coach_pdf_prerenders_total", "counter",
+        "Speculative PDF renders after roadmap replies, by outcome",
+        {outcome: prerender[outcome] for outcome in ("rendered", "cached", "skipped", "dropped", "failed")},
+        label="outcome",
+    )
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+    writes = chat_write_batcher.stats()
+    yield stats_family(
+        "career_coach_db_write_batches_total", "counter", "Group-commit batches and the turns they saved",
+        {"batches": writes["batches"], "turns": writes["turns"]},
+    )
 
-@app.post("/api/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    # -------- Basic input validation (simple but important) --------
-    if not req.message or not req.message.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty.")
-    if len(req.message) > 4000:
-        raise HTTPException(status_code=400, detail="Message is too long.")
-    if len(req.history) > 50:
-        raise HTTPException(
-            status_code=400,
-            detail="Too many messages in history. Please start a new session.",
-        )
 
-    system_prompt = """
-You are a tough, honest, no-BS CAREER DEBATE COACH.
-
-Your only job is to:
-- Aggressively challenge the user's career idea or plan
-- Present realistic downsides, risks, competition, failure rates, opportunity costs
-- Play devil's advocate — do NOT just agree or be encouraging by default
-- Force the user to defend their choice or rethink it
-- Use direct, provocative, sometimes uncomfortable language ("Are you serious?", "This is a terrible idea unless…", "Most people who try this fail because…")
-- Only give a roadmap / next steps AFTER the user has made a strong, realistic case — never give it automatically
-
-Typical reply structure (follow this most of the time):
-1. Acknowledge briefly what they said (1 sentence max)
-2. Hit them with 2–3 strong counter-arguments or reality checks
-3. Ask 1–2 sharp, uncomfortable questions to make them justify their decision
-4. If they still haven't convinced you — do NOT give a roadmap yet
-5. If they finally make a solid case — then (and only then) give a realistic, month-by-month roadmap + market context + practical actions
-6. Always end with a question to keep the debate going
-
-Be brutally honest. No sugar-coating. No generic motivation fluff.
-The goal is to help them make a better decision — not to make them feel good.
-"""
+def _conversation_metrics():
+    """Stateless mode only: delta chat turns answered from the server's copy vs. resyncs."""
+    from .services.conversation_store import conversation_store
 
-    messages = [{"role": "system", "content": system_prompt}]
+    yield stats_family(
+        "career_coach_cache_lookups_total", "counter", "Cache lookups by result",
+        {"hit": conversation_store.hits, "miss": conversation_store.resyncs},
+        label="result", extra={"cache": "conversation"},
+    )
 
-    # Add conversation history
-    for msg in req.history:
-        messages.append({"role": msg.role, "content": msg.content})
 
-    # Add current user message
-    messages.append({"role": "user", "content": req.message})
+# ------------------ STARTUP HELPERS ------------------
 
-    # Make the very first reply more challenging
-    if len(req.history) == 0:
-        system_prompt += "\nThis is the very first message — start by strongly questioning their career choice and showing why it might be a bad or risky idea."
+async def _init_database() -> None:
+    """Create tables / indexes and fill the sessions table (persistent mode)."""
+    from .database import init_db
+    from . import models  # noqa: F401  (registers the tables)
+    from .services.session_service import backfill_sessions
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=messages,
-            temperature=0.85,       # higher = more opinionated / less predictable
-            max_tokens=700,         # shorter, punchier replies
-        )
+        # Create all tables (and indexes) defined in models.py
+        await init_db()
+        # Fill the sessions table for chats saved before it existed (first run only)
+        await backfill_sessions()
+        logger.info("Database tables created successfully (or already exist)")
+    except Exception as e:
+        logger.error(f"Failed to create database tables: {e}")
+        # Don't crash the app - maybe database file is locked or permissions issue
+        # But log it so you know something is wrong
 
-        ai_reply = response.choices[0].message.content
-        return ChatResponse(reply=ai_reply)
 
+async def _warm_up(mode: str) -> None:
+    """Do the slow first-use work now: Groq SDK, PDF workers, language profiles."""
+    # Start the PDF worker processes now, so the first export is not slow
+    try:
+        await pdf_pool.start()
     except Exception as e:
-        # Log full error on the server, but send a simple message to the client
-        logger.exception("Error while calling Groq LLM")
-        raise HTTPException(
-            status_code=502,
-            detail="AI service is currently unavailable. Please try again in a moment.",
-        )
+        logger.error(f"Failed to start PDF worker pool: {e}")
 
+    # Import the Groq SDK and create the shared client
+    try:
+        await llm_service.warm_up()
+    except Exception as e:
+        logger.error(f"Failed to create the Groq client: {e}")
+
+    if mode == "persistent" and settings.LANGUAGE_WARM_UP:
+        # Load the language-detection profiles now, not on the first chat message
+        from .services.language_service import warm_up as warm_up_language_detection
+        try:
+            await asyncio.to_thread(warm_up_language_detection)
+        except Exception as e:
+            logger.error(f"Failed to load language detection profiles: {e}")
+
+    logger.info("Warm-up finished")
 
-@app.post("/api/export-pdf")
-def export_pdf(req: ExportPDFRequest):
+
+def preload(mode: Optional[str] = None) -> None:
     """
-    Generate and return a PDF file from the provided content (usually career advice/roadmap)
+    Import what every worker needs, before serve.py forks the workers.
+
+    Forked workers share these memory pages (copy-on-write) instead of each
+    loading its own copy: the routers and their services, the Groq SDK and
+    (persistent mode) langdetect's language profiles. The database tables
+    are created here once, not by every worker at the same time. Nothing may
+    be left running (event loop, threads, connections) - they don't survive
+    a fork.
     """
-    if not req.content or not req.content.strip():
-        raise HTTPException(status_code=400, detail="PDF content cannot be empty.")
-
-    buffer = BytesIO()
+    mode = mode or settings.APP_MODE
+    llm_service.import_client_modules()
+    if mode == "persistent":
+        from .routers import chat, pdf, transfer  # noqa: F401
+        from .database import engine
+        if settings.LANGUAGE_WARM_UP:
+            from .services.language_service import warm_up as warm_up_language_detection
+            warm_up_language_detection()
+
+        async def init_once():
+            await _init_database()
+            await engine.dispose()
+        asyncio.run(init_once())
+    else:
+        from .routers import stateless  # noqa: F401
+
+
+# ------------------ APP FACTORY ------------------
+
+def create_app(mode: Optional[str] = None) -> FastAPI:
+    """
+    Build the app for `mode` ("stateless" or "persistent", default: APP_MODE).
 
-    try:
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=inch,
+    Each call returns a new app; the services behind it (Groq client, PDF
+    pool, caches) are shared per process.
+    """
+    mode = mode or settings.APP_MODE
+    if mode not in MODES:
+        raise ValueError(f"APP_MODE must be one of {MODES}, not {mode!r}")
+    if settings.STARTUP_WARM_UP not in WARM_UP_MODES:
+        raise ValueError(f"STARTUP_WARM_UP must be one of {WARM_UP_MODES}, not {settings.STARTUP_WARM_UP!r}")
+    if settings.ROADMAP_REUSE not in ("off", "exemplar", "reuse"):
+        raise ValueError(f"ROADMAP_REUSE must be off, exemplar or reuse, not {settings.ROADMAP_REUSE!r}")
+
+    if not settings.GROQ_API_KEY:
+        # Fail fast at startup in a clear way, but do NOT print the key
+        raise RuntimeError(
+            "GROQ_API_KEY not found. Please add it to your .env file "
+            "or environment before starting the backend."
         )
 
-        styles = getSampleStyleSheet()
-        styles.add(
-            ParagraphStyle(
-                name="TitleBold",
-                fontName="Helvetica-Bold",
-                fontSize=18,
-                spaceAfter=20,
-            )
-        )
-        styles.add(
-            ParagraphStyle(
-                name="Content",
-                fontName="Helvetica",
-                fontSize=11,
-                leading=14,
-                spaceAfter=12,
-            )
-        )
+    app = FastAPI(
+        title="Career Debate Coach Backend",
+        version="1.0.0",
+        description="AI that debates career choices and generates roadmaps"
+    )
+    app.state.mode = mode
+    app.state.warm_up = None
+    app.state.archiver = None
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],   # ← change this in production!
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
-        story = []
-
-        # Title
-        story.append(Paragraph(req.title, styles["TitleBold"]))
-        story.append(Spacer(1, 0.3 * inch))
-
-        # Content — split by lines and wrap as paragraphs
-        lines = req.content.split("\n")
-        for line in lines:
-            if line.strip():
-                if line.startswith("## "):
-                    story.append(Paragraph(line[3:].strip(), styles["Heading2"]))
-                elif line.startswith("### "):
-                    story.append(Paragraph(line[4:].strip(), styles["Heading3"]))
-                elif line.strip().startswith("- ") or line.strip().startswith("* "):
-                    story.append(
-                        Paragraph(f"• {line.strip()[2:]}", styles["Content"])
-                    )
-                else:
-                    story.append(Paragraph(line, styles["Content"]))
-            else:
-                story.append(Spacer(1, 0.15 * inch))
-
-        doc.build(story)
-        buffer.seek(0)
-
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={req.filename}"
-            },
+    if settings.METRICS_ENABLED:
+        # Count every request (route, status, latency) - see GET /metrics
+        app.add_middleware(MetricsMiddleware)
+        add_collector(_service_metrics)
+        add_collector(_session_metrics if mode == "persistent" else _conversation_metrics)
+
+    # -------- Routers (imported here, so each mode only loads what it uses) --------
+    if mode == "persistent":
+        from .routers import chat, pdf, transfer
+        app.include_router(chat.router, prefix="/api", tags=["chat"])
+        app.include_router(pdf.router)
+        app.include_router(transfer.router)
+    else:
+        from .routers import stateless
+        app.include_router(stateless.router)
+
+    # -------- Startup / shutdown --------
+    @app.on_event("startup")
+    async def startup_event():
+        """
+        Create database tables automatically when the app starts (persistent mode).
+
+        This is beginner-friendly: you don't need to run migrations manually.
+        SQLite will create the database file if it doesn't exist.
+        """
+        if mode == "persistent":
+            await _init_database()
+
+        if settings.STARTUP_WARM_UP == "blocking":
+            await _warm_up(mode)
+        elif settings.STARTUP_WARM_UP == "background":
+            app.state.warm_up = asyncio.create_task(_warm_up(mode))
+
+        # Delete old generated files in the background (age + total size limits)
+        app.state.sweeper = asyncio.create_task(
+            run_sweeper([temp_pdf_store, pdf_cache], settings.ARTIFACT_SWEEP_INTERVAL_SECONDS)
         )
 
-    except Exception:
-        logger.exception("Error while generating inline PDF")
-        raise HTTPException(
-            status_code=500,
-            detail="Could not generate PDF. Please try again.",
-        )
+        # Move idle sessions into the compressed archive now and then (+ incremental VACUUM)
+        if mode == "persistent" and settings.ARCHIVE_AFTER_DAYS > 0 and settings.ARCHIVE_INTERVAL_SECONDS > 0:
+            from .services.session_archive import run_archiver
+            app.state.archiver = asyncio.create_task(run_archiver(settings.ARCHIVE_INTERVAL_SECONDS))
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        """Close the shared Groq client, flush queued chat writes, stop the PDF workers and background jobs."""
+        if app.state.warm_up is not None:
+            app.state.warm_up.cancel()
+        app.state.sweeper.cancel()
+        if app.state.archiver is not None:
+            # Let a running archive transaction roll back before the database goes away
+            app.state.archiver.cancel()
+            try:
+                await app.state.archiver
+            except asyncio.CancelledError:
+                pass
+        if mode == "persistent":
+            from .services.chat_writer import chat_write_batcher
+            from .services.pdf_prerender import pdf_prerenderer
+            await pdf_prerenderer.close()
+            await chat_write_batcher.close()
+        await close_client()
+        pdf_pool.shutdown()
+
+    # -------- Shared routes --------
+    @app.get("/")
+    def root():
+        return {"status": "running", "mode": mode}
+
+    @app.get("/health")
+    def health():
+        warm_up = app.state.warm_up
+        report = {
+            "status": "ok",
+            "mode": mode,
+            "warmed_up": warm_up.done() if warm_up is not None else settings.STARTUP_WARM_UP == "blocking",
+            "llm_cache": response_cache.stats(),
+            "llm_single_flight": llm_flights.stats(),
+            "llm_upstream": groq_guard.stats(),
+            "pdf_pool": pdf_pool.stats(),
+            "pdf_cache": pdf_cache.stats(),
+            "temp_files": temp_pdf_store.stats(),
+        }
+        if mode == "persistent":
+            from .services.chat_writer import chat_write_batcher
+            from .services.language_service import language_detector
+            from .services.pdf_prerender import pdf_prerenderer
+            from .services import roadmap_index, session_archive
+            report["language"] = language_detector.stats()
+            report["roadmap_index"] = roadmap_index.stats()
+            report["db_writes"] = chat_write_batcher.stats()
+            report["pdf_prerender"] = pdf_prerenderer.stats()
+            report["archive"] = session_archive.stats()
+        else:
+            from .services.conversation_store import conversation_store
+            report["conversations"] = conversation_store.stats()
+        return report
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus scrape endpoint (latency per phase, tokens, caches, in-flight work)."""
+        if not settings.METRICS_ENABLED:
+            raise HTTPException(status_code=404, detail="Metrics are disabled.")
+        return Response(render_latest(), media_type=CONTENT_TYPE)
+
+    return app
+
+
+# The app uvicorn serves with "app.main:app" (run.py)
+app = create_app()
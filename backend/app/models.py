@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, ForeignKey, LargeBinary
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 from .database import Base
 
@@ -14,6 +15,89 @@ class ChatHistory(Base):
     role = Column(String(20), nullable=False)        # "user" or "assistant"
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Same value on both messages of a turn; a retried turn is never saved twice
+    idempotency_key = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Lets "last N messages of a session" read only N index entries
+        Index("ix_chat_history_session_ts_id", "session_id", "timestamp", "id"),
+        # One user + one assistant message per idempotency key (NULLs don't clash)
+        Index("ux_chat_history_idempotency", "session_id", "idempotency_key", "role", unique=True),
+    )
+
+
+class ChatSession(Base):
+    """
+    One row per chat session, kept up to date on every chat write.
+
+    Lets PDF export and chat read what they need (goal, language, last AI
+    reply) with one primary-key lookup instead of scanning chat_history.
+    """
+    __tablename__ = "sessions"
+
+    session_id = Column(String(100), primary_key=True)
+    career_goal = Column(Text, nullable=True)        # first user message
+    language = Column(String(10), nullable=True)     # "hi" or "en"
+    turn_count = Column(Integer, default=0, nullable=False)   # user messages so far
+    last_assistant_message_id = Column(Integer, ForeignKey("chat_history.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_activity_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RoadmapGoal(Base):
+    """
+    One row per distinct career goal that got a roadmap (services/roadmap_index.py).
+
+    A goal is its language + the words that name the career, so "I want to be
+    a pilot" and "How do I become a pilot?" share a row. Points at the newest
+    roadmap for it; the goals are full-text indexed in roadmap_index (FTS5).
+    """
+    __tablename__ = "roadmap_goals"
+
+    id = Column(Integer, primary_key=True)
+    goal_key = Column(String(400), unique=True, nullable=False)   # "en:pilot"
+    goal = Column(Text, nullable=False)                           # one original wording
+    language = Column(String(10), nullable=False)
+    message_id = Column(Integer, nullable=False)          # newest roadmap for this goal
+    first_message_id = Column(Integer, nullable=True)     # newest reply to the goal itself
+    roadmaps = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ArchivedSession(Base):
+    """
+    All chat_history rows of an idle session, compressed into one blob
+    (services/session_archive.py). The session's `sessions` row stays.
+    """
+    __tablename__ = "session_archive"
+
+    session_id = Column(String(100), primary_key=True)
+    dictionary_id = Column(Integer, ForeignKey("archive_dictionaries.id"), nullable=True)  # None = plain zlib
+    messages = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)      # size before compression
+    data = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ArchiveDictionary(Base):
+    """A zlib preset dictionary shared by many archived sessions (never changed once written)."""
+    __tablename__ = "archive_dictionaries"
+
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Full-text index of the goal words of roadmap_goals (rowid = roadmap_goals.id).
+# Contentless SQLite FTS5 table (the words are in goal_key already); SQLAlchemy
+# can't declare virtual tables, so init_db() runs this statement.
+ROADMAP_INDEX_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS roadmap_index USING fts5(
+    terms, content = '',
+    tokenize = "porter unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+)
+"""
+Base.metadata.info.setdefault("extra_ddl", []).append(ROADMAP_INDEX_DDL)
 
 
 # ───────────── Pydantic Models ─────────────
@@ -21,7 +105,26 @@ class ChatHistory(Base):
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    use_cache: bool = True   # False = always ask the LLM for a fresh reply
+    # Optional: send the same key when retrying, and the saved reply is returned
+    # instead of asking the LLM again (max 64 characters)
+    idempotency_key: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     reply: str
+
+
+class ChatBatchRequest(BaseModel):
+    # Turns of many sessions; turns of the same session run in list order
+    items: List[ChatRequest]
+    # Max Groq calls at once for this batch (capped by CHAT_BATCH_CONCURRENCY)
+    max_concurrency: Optional[int] = None
+
+
+class BulkPdfRequest(BaseModel):
+    # Either a list of sessions ...
+    session_ids: Optional[List[str]] = None
+    # ... or every session active in this time range (both ends optional)
+    active_since: Optional[datetime] = None
+    active_until: Optional[datetime] = None
@@ -3,26 +3,172 @@ Chat Router - Handles chat endpoints with database persistence.
 
 This router:
 - Detects language (Hindi vs English)
-- Fetches conversation history from database
+- Fetches recent conversation history (last few messages, buffered in memory)
+- Looks up a roadmap written earlier for a similar goal (reused, or shown to the LLM)
 - Calls LLM service to generate response
-- Saves both user and AI messages to database
-- Handles errors gracefully
+- Saves both user and AI messages to database (and updates the session row)
+- Renders the PDF of a new roadmap in the background, before the user asks
+- Handles errors gracefully (503 + Retry-After when Groq can't answer)
+- Can stream the reply token-by-token with Server-Sent Events (/chat/stream)
+- Runs many turns of many sessions in one request (/chat/batch, NDJSON)
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from langdetect import detect, LangDetectException
-from datetime import datetime
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
 import logging
 
+from ..database import SessionLocal
 from ..dependencies import get_db
-from ..models import ChatRequest, ChatResponse, ChatHistory
-from ..services.llm_service import generate_llm_response
+from ..config import settings
+from ..models import ChatBatchRequest, ChatRequest, ChatResponse
+from ..services.llm_service import generate_llm_response, stream_llm_response
+from ..services.history_service import (
+    get_recent_histories, get_recent_history, history_buffer, record_messages
+)
+from ..services.context_builder import build_context
+from ..services.chat_writer import (
+    TurnToSave, derive_idempotency_key, find_saved_replies, find_saved_reply, previous_turn_key,
+    retry_cutoff, save_turn, save_turns
+)
+from ..services.single_flight import SingleFlight
+from ..services.upstream import UpstreamUnavailable
+from ..services.metrics import time_phase
+from ..services.language_service import ENGLISH, HINDI, language_detector
+from ..services.roadmap_index import RoadmapHint, looks_like_roadmap, roadmap_hint, wants_roadmap
+from ..services.pdf_prerender import pdf_prerenderer
+from ..services.session_service import get_session, get_sessions
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Chat turns being answered right now, by (session_id, idempotency key)
+_chat_flights = SingleFlight()
+
+
+# ------------------ HELPERS ------------------
+
+def _validate_chat_request(request: ChatRequest) -> None:
+    """Basic input validation shared by the normal and streaming endpoints."""
+    if not request.message or not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+
+    if len(request.message) > 4000:
+        raise HTTPException(status_code=400, detail="Message is too long (max 4000 characters).")
+
+    if not request.session_id or not request.session_id.strip():
+        raise HTTPException(status_code=400, detail="Session ID is required.")
+
+    if request.idempotency_key is not None and not 0 < len(request.idempotency_key) <= 64:
+        raise HTTPException(status_code=400, detail="Idempotency key must be 1-64 characters.")
+
+
+def _detect_is_hindi(session_id: str, message: str) -> bool:
+    """Return True if the message looks like Hindi (defaults to English)."""
+    return language_detector.detect(session_id, message) == HINDI
+
+
+def _language(is_hindi: bool) -> str:
+    """Language code stored on the session row."""
+    return HINDI if is_hindi else ENGLISH
+
+
+def _last_user_message(history: List[Dict[str, str]]) -> Optional[str]:
+    return next((m["content"] for m in reversed(history) if m.get("role") == "user"), None)
+
+
+async def _load_history(
+    db: AsyncSession,
+    session_id: str
+) -> Tuple[Optional[str], List[Dict[str, str]], int, Optional[str]]:
+    """
+    Conversation context of a session: (summary of older messages, recent messages,
+    turns saved so far, last saved user message).
+
+    Recent messages are packed into the token budget (see context_builder.py);
+    the session's career goal stays pinned at the top of the summary.
+    """
+    history = await get_recent_history(db, session_id)
+    session = await get_session(db, session_id)
+    summary, recent = build_context(
+        history, session_id=session_id, goal=session.career_goal if session else None
+    )
+    return summary, recent, session.turn_count if session else 0, _last_user_message(history)
+
+
+async def _turn_key(
+    db: AsyncSession,
+    request: ChatRequest,
+    turns: int,
+    last_user_message: Optional[str]
+) -> Tuple[str, Optional[str]]:
+    """
+    (idempotency key of this turn, reply already saved under it or None).
+
+    The key is the client's, or one derived from session + turn count +
+    message. A retry that arrives shortly after its first attempt was saved
+    is found through previous_turn_key() and gets the saved turn's key.
+    """
+    if request.idempotency_key:
+        return request.idempotency_key, await find_saved_reply(db, request.session_id, request.idempotency_key)
+
+    previous = previous_turn_key(request.session_id, request.message, turns, last_user_message)
+    if previous is not None:
+        saved_reply = await find_saved_reply(db, request.session_id, previous, saved_after=retry_cutoff())
+        if saved_reply is not None:
+            return previous, saved_reply
+    return derive_idempotency_key(request.session_id, request.message, turns), None
+
+
+def _turn_committed(session_id: str, user_message: str, ai_reply: str) -> None:
+    """Update the in-memory history after a successful commit (and pre-render a new plan's PDF)."""
+    record_messages(session_id, [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": ai_reply},
+    ])
+    # The download button comes next: render the PDF while the user reads
+    if looks_like_roadmap(ai_reply) or wants_roadmap(user_message):
+        pdf_prerenderer.schedule(session_id)
+
+
+async def _roadmap_hint(
+    db: AsyncSession,
+    request: ChatRequest,
+    is_hindi: bool,
+    summary: Optional[str],
+    history_messages: List[Dict[str, str]]
+) -> RoadmapHint:
+    """A similar earlier roadmap for this turn (a failed lookup never fails the turn)."""
+    try:
+        with time_phase("roadmap_lookup"):
+            return await roadmap_hint(
+                db, request.session_id, request.message, _language(is_hindi),
+                first_turn=not history_messages and summary is None,
+                allow_reuse=request.use_cache,
+            )
+    except Exception:
+        logger.exception("Roadmap index lookup failed")
+        return RoadmapHint()
+
+
+async def _single_delta(text: str):
+    """A stored reply, sent like a stream of one piece."""
+    yield text
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _ndjson(data: dict) -> str:
+    """One line of newline-delimited JSON."""
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_coach(
@@ -39,79 +185,57 @@ async def chat_with_coach(
     4. Generate AI response using LLM service
     5. Save both messages to database
     6. Return AI response
+
+    Each turn has an idempotency key (request.idempotency_key, or derived
+    from session + turn count + message). Duplicates of a turn that is still
+    running share its reply; retries of a saved turn get the saved reply.
     """
     # -------- Input validation --------
-    if not request.message or not request.message.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty.")
-    
-    if len(request.message) > 4000:
-        raise HTTPException(status_code=400, detail="Message is too long (max 4000 characters).")
-    
-    if not request.session_id or not request.session_id.strip():
-        raise HTTPException(status_code=400, detail="Session ID is required.")
+    _validate_chat_request(request)
 
     try:
         # -------- 1. Language detection --------
-        is_hindi = False
-        if request.message.strip():
-            try:
-                detected = detect(request.message)
-                is_hindi = detected == "hi"
-            except LangDetectException:
-                # If detection fails, default to English
-                logger.debug("Language detection failed, assuming English")
-                pass
+        with time_phase("detect"):
+            is_hindi = _detect_is_hindi(request.session_id, request.message)
 
         # -------- 2. Fetch chat history from database --------
-        result = await db.execute(
-            select(ChatHistory)
-            .where(ChatHistory.session_id == request.session_id)
-            .order_by(ChatHistory.timestamp.asc())
-        )
-        history_records = result.scalars().all()
+        with time_phase("history"):
+            summary, history_messages, turns, last_user_message = await _load_history(db, request.session_id)
 
-        # Convert database records to message list format (what LLM expects)
-        history_messages = [
-            {"role": h.role, "content": h.content}
-            for h in history_records
-        ]
-
-        # Limit history to last 20 messages to avoid token limits
-        if len(history_messages) > 20:
-            history_messages = history_messages[-20:]
-            logger.debug(f"Truncated history to last 20 messages for session {request.session_id}")
+        # A retry of a turn that is already saved: send the same reply again
+        key, saved_reply = await _turn_key(db, request, turns, last_user_message)
+        if saved_reply is not None:
+            return ChatResponse(reply=saved_reply)
 
-        # -------- 3. Generate AI response --------
-        ai_reply = await generate_llm_response(
-            user_message=request.message,
-            history=history_messages,  # Pass structured history (list of dicts)
-            is_hindi=is_hindi
-        )
+        # A roadmap written earlier for the same / a similar goal
+        hint = await _roadmap_hint(db, request, is_hindi, summary, history_messages)
 
-        # -------- 4. Save messages to database --------
-        now = datetime.utcnow()
+        async def answer_and_save() -> str:
+            # -------- 3. Generate AI response (or reuse a stored plan) --------
+            ai_reply = hint.reply or await generate_llm_response(
+                user_message=request.message,
+                history=history_messages,  # Pass structured history (list of dicts)
+                is_hindi=is_hindi,
+                use_cache=request.use_cache,
+                summary=summary,
+                exemplar=hint.exemplar,
+                max_tokens=hint.max_tokens
+            )
 
-        # Save user message
-        user_msg = ChatHistory(
-            session_id=request.session_id,
-            role="user",
-            content=request.message,
-            timestamp=now
-        )
-
-        # Save assistant message
-        assistant_msg = ChatHistory(
-            session_id=request.session_id,
-            role="assistant",
-            content=ai_reply,
-            timestamp=now
-        )
+            # -------- 4. Save messages to database (and commit) --------
+            # Own db session: a duplicate request may still be waiting for
+            # this after the request that started it has finished
+            async with SessionLocal() as save_db:
+                saved = await save_turn(
+                    save_db, request.session_id, request.message, ai_reply, _language(is_hindi), key
+                )
+            if saved.created:
+                _turn_committed(request.session_id, request.message, saved.reply)
+            return saved.reply
 
-        db.add(user_msg)
-        db.add(assistant_msg)
-
-        # Commit transaction
-        await db.commit()
+        # Duplicate requests for the same turn (double submit, client retry)
+        # wait for the one that is already running instead of asking again
+        ai_reply = await _chat_flights.do((request.session_id, key), answer_and_save)
 
         return ChatResponse(reply=ai_reply)
 
@@ -120,6 +244,16 @@ async def chat_with_coach(
         await db.rollback()
         raise
 
+    except UpstreamUnavailable as e:
+        # Groq is rate limited / down - nothing was saved, the client may retry
+        await db.rollback()
+        logger.warning(f"Groq unavailable: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="AI is temporarily unavailable. Please try again.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     except Exception as e:
         # Rollback database transaction on any other error
         await db.rollback()
@@ -130,3 +264,301 @@ async def chat_with_coach(
             status_code=500,
             detail="An error occurred while processing your request. Please try again."
         )
+
+
+@router.post("/chat/stream")
+async def chat_with_coach_stream(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming chat endpoint - same as /chat, but sends the reply as
+    Server-Sent Events while Groq is still generating it.
+
+    Events sent to the client:
+    - "delta": {"content": "..."}  - next piece of the reply
+    - "done":  {"reply": "..."}    - full reply (already saved to database)
+    - "error": {"detail": "..."}   - something went wrong, nothing was saved
+
+    If the client disconnects, the stream is cancelled, the upstream Groq
+    call is closed (no more tokens are paid for) and nothing is saved.
+
+    Streams are not shared between duplicate requests, but the idempotency
+    key still keeps a turn from being saved twice.
+    """
+    _validate_chat_request(request)
+
+    # Do the quick work before the stream starts, so errors can still be normal HTTP errors
+    with time_phase("detect"):
+        is_hindi = _detect_is_hindi(request.session_id, request.message)
+    try:
+        with time_phase("history"):
+            summary, history_messages, turns, last_user_message = await _load_history(db, request.session_id)
+        key, saved_reply = await _turn_key(db, request, turns, last_user_message)
+        hint = RoadmapHint()
+        if saved_reply is None:
+            hint = await _roadmap_hint(db, request, is_hindi, summary, history_messages)
+    except Exception:
+        logger.exception("Error loading history for streaming chat")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your request. Please try again."
+        )
+
+    async def event_stream():
+        if saved_reply is not None:
+            # A retry of a turn that is already saved: send the same reply again
+            yield _sse("delta", {"content": saved_reply})
+            yield _sse("done", {"reply": saved_reply})
+            return
+
+        parts = []
+        deltas = _single_delta(hint.reply) if hint.reply else stream_llm_response(
+            user_message=request.message,
+            history=history_messages,
+            is_hindi=is_hindi,
+            use_cache=request.use_cache,
+            summary=summary,
+            exemplar=hint.exemplar,
+            max_tokens=hint.max_tokens
+        )
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                yield _sse("delta", {"content": delta})
+        except asyncio.CancelledError:
+            # Client went away - the finally below closes the upstream Groq call
+            logger.info(f"Client disconnected, cancelled stream for session {request.session_id}")
+            raise
+        except UpstreamUnavailable as e:
+            logger.warning(f"Groq unavailable: {e}")
+            yield _sse("error", {
+                "detail": "AI is temporarily unavailable. Please try again.",
+                "retry_after": e.retry_after,
+            })
+            return
+        except Exception:
+            logger.exception("Error while streaming from Groq LLM")
+            yield _sse("error", {"detail": "AI is temporarily unavailable. Please try again."})
+            return
+        finally:
+            await deltas.aclose()
+
+        ai_reply = "".join(parts).strip()
+
+        # The request's db session is closed once the response starts,
+        # so the finished turn is saved with its own session
+        try:
+            async with SessionLocal() as save_db:
+                saved = await save_turn(
+                    save_db, request.session_id, request.message, ai_reply, _language(is_hindi), key
+                )
+            if saved.created:
+                _turn_committed(request.session_id, request.message, saved.reply)
+            ai_reply = saved.reply
+        except Exception:
+            logger.exception("Error saving streamed chat turn")
+            yield _sse("error", {"detail": "Reply was generated but could not be saved."})
+            return
+
+        yield _sse("done", {"reply": ai_reply})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # stop nginx-style proxies from buffering the stream
+        },
+    )
+
+
+@router.post("/chat/batch")
+async def chat_batch(
+    request: ChatBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Many chat turns (of many sessions) in one request - for evaluation jobs
+    that replay scripted debates.
+
+    - Sessions run concurrently (at most max_concurrency Groq calls at once),
+      the turns of one session run in order, each on the history before it
+    - The histories of all sessions are loaded with ONE query, and saved
+      turns are written in bulk (CHAT_BATCH_WRITE_CHUNK per commit)
+    - The response is NDJSON, one line per item as soon as it is answered:
+        {"index": 0, "session_id": "...", "reply": "...", "replayed": false}
+        {"index": 3, "session_id": "...", "error": "...", "status": 503}
+      and a last line {"done": true, ...} with the counts, sent after
+      everything is saved.
+
+    If a turn fails, the later turns of that session are skipped (status 424),
+    because they would be answered on a different history.
+    """
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=400, detail="The batch has no items.")
+    if len(items) > settings.CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items in one batch (max {settings.CHAT_BATCH_MAX_ITEMS}).",
+        )
+    concurrency = max(1, min(request.max_concurrency or settings.CHAT_BATCH_CONCURRENCY,
+                             settings.CHAT_BATCH_CONCURRENCY))
+
+    # -------- Validate every item (a bad item only fails itself) --------
+    invalid: Dict[int, str] = {}
+    by_session: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        try:
+            _validate_chat_request(item)
+        except HTTPException as e:
+            invalid[index] = e.detail
+            continue
+        by_session.setdefault(item.session_id, []).append(index)
+
+    # -------- Load everything the turns need before the stream starts --------
+    # (the request's db session is closed once the response starts)
+    try:
+        with time_phase("history"):
+            histories = await get_recent_histories(db, list(by_session))
+            sessions = await get_sessions(db, list(by_session))
+        turn_counts = {session_id: session.turn_count for session_id, session in sessions.items()}
+        # Replies already saved under the keys we know now: the client's own keys,
+        # and the last saved turn's key if a session's first item may retry it
+        known_keys, previous_keys = [], []
+        for session_id, indexes in by_session.items():
+            for position, index in enumerate(indexes):
+                item = items[index]
+                if item.idempotency_key:
+                    known_keys.append((session_id, item.idempotency_key))
+                elif position == 0:
+                    previous = previous_turn_key(
+                        session_id, item.message, turn_counts.get(session_id, 0),
+                        _last_user_message(histories[session_id])
+                    )
+                    if previous is not None:
+                        previous_keys.append((session_id, previous))
+        saved_replies = await find_saved_replies(db, known_keys)
+        saved_replies.update(await find_saved_replies(db, previous_keys, saved_after=retry_cutoff()))
+    except Exception:
+        logger.exception("Error loading histories for chat batch")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your request. Please try again."
+        )
+
+    async def answer(session_id: str, item: ChatRequest, history: deque, turns: int, first: bool,
+                     semaphore: asyncio.Semaphore) -> Tuple[str, Optional[TurnToSave]]:
+        """(reply, turn to save) - the turn is None when the reply was already saved."""
+        is_hindi = _detect_is_hindi(session_id, item.message)
+        if item.idempotency_key:
+            reply = saved_replies.get((session_id, item.idempotency_key))
+        elif first:
+            previous = previous_turn_key(session_id, item.message, turns, _last_user_message(list(history)))
+            reply = saved_replies.get((session_id, previous)) if previous else None
+        else:
+            reply = None
+        if reply is not None:
+            return reply, None
+        key = item.idempotency_key or derive_idempotency_key(session_id, item.message, turns)
+
+        session = sessions.get(session_id)
+        summary, recent = build_context(
+            list(history), session_id=session_id, goal=session.career_goal if session else None
+        )
+        async with semaphore:
+            reply = await generate_llm_response(
+                user_message=item.message,
+                history=recent,
+                is_hindi=is_hindi,
+                use_cache=item.use_cache,
+                summary=summary
+            )
+        return reply, TurnToSave(session_id, item.message, reply, _language(is_hindi), key)
+
+    async def run_session(session_id: str, indexes: List[int], semaphore: asyncio.Semaphore, out: asyncio.Queue):
+        """Answer the turns of one session in order; put (line, turn to save) on `out`."""
+        history = deque(histories[session_id], maxlen=history_buffer.window)
+        turns = turn_counts.get(session_id, 0)
+        failed = False
+        for index in indexes:
+            item = items[index]
+            line = {"index": index, "session_id": session_id}
+            if failed:
+                line.update(status=424, error="Skipped: an earlier turn of this session failed.")
+                out.put_nowait((line, None))
+                continue
+            try:
+                reply, turn = await answer(session_id, item, history, turns, index == indexes[0], semaphore)
+            except UpstreamUnavailable as e:
+                failed = True
+                line.update(status=503, error="AI is temporarily unavailable. Please try again.",
+                            retry_after=e.retry_after)
+                out.put_nowait((line, None))
+                continue
+            except Exception:
+                logger.exception(f"Error answering chat batch item {index}")
+                failed = True
+                line.update(status=500, error="An error occurred while processing this item.")
+                out.put_nowait((line, None))
+                continue
+
+            turns += turn is not None
+            history.append({"role": "user", "content": item.message})
+            history.append({"role": "assistant", "content": reply})
+            line.update(reply=reply, replayed=turn is None)
+            out.put_nowait((line, turn))
+
+    async def save(pending: List[TurnToSave], counts: Dict[str, int]) -> None:
+        """Bulk-save answered turns and update the in-memory histories."""
+        try:
+            results = await save_turns(pending)
+        except Exception:
+            logger.exception(f"Error saving {len(pending)} batch chat turns")
+            counts["save_errors"] += len(pending)
+            return
+        for turn, saved in zip(pending, results):
+            if saved.created:
+                counts["saved"] += 1
+                _turn_committed(turn.session_id, turn.user_message, turn.ai_reply)
+            else:
+                counts["duplicates"] += 1
+
+    async def ndjson_lines():
+        counts = {"ok": 0, "errors": 0, "replayed": 0, "saved": 0, "duplicates": 0, "save_errors": 0}
+        for index, detail in invalid.items():
+            counts["errors"] += 1
+            yield _ndjson({"index": index, "session_id": items[index].session_id, "status": 400, "error": detail})
+
+        out: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(concurrency)
+        workers = [
+            asyncio.create_task(run_session(session_id, indexes, semaphore, out))
+            for session_id, indexes in by_session.items()
+        ]
+        pending: List[TurnToSave] = []
+        try:
+            for _ in range(len(items) - len(invalid)):
+                line, turn = await out.get()
+                if "error" in line:
+                    counts["errors"] += 1
+                else:
+                    counts["ok"] += 1
+                    counts["replayed"] += turn is None
+                if turn is not None:
+                    pending.append(turn)
+                    if len(pending) >= settings.CHAT_BATCH_WRITE_CHUNK:
+                        await save(pending, counts)
+                        pending = []
+                yield _ndjson(line)
+        finally:
+            # Client gone (or done): stop asking Groq, but keep what was answered
+            for worker in workers:
+                worker.cancel()
+            if pending:
+                await asyncio.shield(save(pending, counts))
+
+        yield _ndjson({"done": True, "items": len(items), **counts})
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
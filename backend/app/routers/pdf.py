@@ -1,62 +1,101 @@
 # backend/app/routers/pdf.py
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy import select
+from typing import Optional
+import logging
+
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..dependencies import get_db                          # assuming you have this
-from ..models import ChatHistory, ChatRequest             # import your models
-from ..services.pdf_services import generate_pdf_report    # real service function
+from ..config import settings
+from ..dependencies import get_db, require_admin           # assuming you have this
+from ..models import BulkPdfRequest, ChatRequest           # import your models
+from ..services.session_service import get_session_plan, get_session_plans   # goal + last AI reply
+from ..services.pdf_bulk import stream_plans_zip           # many plans -> one streamed ZIP
+from ..services.pdf_jobs import render_report_bytes        # rendered in a PDF worker
+from ..services.pdf_pool import PdfPoolBusy                # renders off the event loop
+from ..services.pdf_cache import (                         # repeat downloads are free
+    etag_for, etag_matches, pdf_cache_key, serve_pdf
+)
 
 router = APIRouter(prefix="/api", tags=["pdf"])
+logger = logging.getLogger(__name__)
 
 @router.post("/export-pdf")
 async def download_career_plan(
     request: ChatRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Generate and download PDF of the career plan.
     Uses the last AI message in the session as the plan content.
+
+    The same plan is only rendered once (cached by content hash); the ETag
+    header lets browsers skip the download when they already have it.
     """
-    # Use async query (correct way with AsyncSession)
-    stmt = (
-        select(ChatHistory)
-        .where(ChatHistory.session_id == request.session_id)
-        .order_by(ChatHistory.timestamp)
-    )
-    result = await db.execute(stmt)
-    history = result.scalars().all()
+    # Goal + last AI reply from the sessions table (one primary-key lookup)
+    plan = await get_session_plan(db, request.session_id)
 
-    if not history:
+    if plan is None:
         raise HTTPException(status_code=404, detail="No chat history found for this session")
 
-    # Find the last message from assistant
-    last_ai_message = None
-    for msg in reversed(history):
-        if msg.role.lower() == "assistant":
-            last_ai_message = msg.content
-            break
+    user_goal, last_ai_message = plan
 
     if not last_ai_message:
         raise HTTPException(status_code=400, detail="No AI response found in this session")
 
-    # Optional: get user goal (first user message)
-    user_goal = None
-    for msg in history:
-        if msg.role.lower() == "user":
-            user_goal = msg.content
-            break
-
-    # Generate PDF (the real function should return a file path)
-    pdf_path = generate_pdf_report(
-        plan_text=last_ai_message,
-        career_goal=user_goal or "Not specified"
+    career_goal = user_goal or "Not specified"
+    key = pdf_cache_key("report", last_ai_message, career_goal)
+
+    # The browser already has exactly this PDF
+    if etag_matches(if_none_match, key):
+        return Response(status_code=304, headers={"ETag": etag_for(key)})
+
+    # Generate PDF in a worker process (or reuse the cached file) and send it
+    try:
+        return await serve_pdf(key, "career_plan.pdf", render_report_bytes, last_ai_message, career_goal)
+    except PdfPoolBusy as busy:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many PDF exports right now. Please try again in a moment.",
+            headers={"Retry-After": str(busy.retry_after)},
+        )
+    except Exception:
+        logger.exception("PDF generation failed")
+        raise HTTPException(status_code=500, detail="Could not generate PDF. Please try again.")
+
+
+@router.post("/export-pdf/bulk", dependencies=[Depends(require_admin)])
+async def download_career_plans_zip(
+    request: BulkPdfRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download the career plans of many sessions as one ZIP (admin only).
+
+    Pick sessions by `session_ids` and/or by last activity (`active_since`,
+    `active_until`). PDFs are rendered in parallel in the PDF workers (or
+    taken from the cache) and streamed into the ZIP as they finish.
+    """
+    if request.session_ids is None and request.active_since is None and request.active_until is None:
+        raise HTTPException(status_code=400, detail="Send session_ids or an active_since / active_until range.")
+    limit = settings.PDF_BULK_MAX_SESSIONS
+    if request.session_ids is not None and len(request.session_ids) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} sessions per ZIP.")
+
+    # One query for all plans (ask for one extra row to notice "too many")
+    plans = await get_session_plans(
+        db, request.session_ids, request.active_since, request.active_until, limit=limit + 1
     )
+    if not plans:
+        raise HTTPException(status_code=404, detail="No chat history found for these sessions")
+    if len(plans) > limit:
+        raise HTTPException(status_code=400, detail=f"More than {limit} sessions match. Narrow the date range.")
 
-    # Return the file as download
-    return FileResponse(
-        path=pdf_path,
-        media_type="application/pdf",
-        filename="career_plan.pdf"
-    )
\ No newline at end of file
+    filename = f"career_plans-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"
+    return StreamingResponse(
+        stream_plans_zip(plans),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
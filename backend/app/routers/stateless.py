@@ -0,0 +1,211 @@
+"""
+Stateless Router - Chat and PDF export without a database.
+
+The client (the React frontend) keeps the conversation and sends the text
+to put in the PDF. Nothing is saved on the server, so this mode needs no
+database at all.
+
+POST /api/chat takes the whole history, or - delta protocol, see
+services/conversation_store.py - only session_id + history_version + the
+new message, answering 409 (resync) when the server's copy doesn't match.
+
+Used when APP_MODE=stateless (see main.py). The session-based versions of
+the same paths live in routers/chat.py and routers/pdf.py.
+"""
+
+from typing import List, Optional
+import logging
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from ..services.llm_service import complete_chat
+from ..services.upstream import UpstreamUnavailable
+from ..services.context_builder import build_context
+from ..services.conversation_store import conversation_store
+from ..services.pdf_pool import PdfPoolBusy
+from ..services.pdf_cache import etag_for, etag_matches, pdf_cache_key, serve_pdf
+from ..services.pdf_jobs import render_pdf_bytes
+
+router = APIRouter(prefix="/api", tags=["stateless"])
+logger = logging.getLogger(__name__)
+
+
+# ------------------ MODELS ------------------
+
+class Message(BaseModel):
+    # Keep types simple, but we still explain clearly in comments
+    role: str   # should be "user" or "assistant"
+    content: str  # single chat message text
+
+class ChatRequest(BaseModel):
+    # Either the whole history (optionally with a session_id, so later turns
+    # can use the delta protocol), or session_id + history_version alone
+    history: Optional[List[Message]] = None
+    message: str
+    session_id: Optional[str] = None
+    history_version: Optional[str] = None   # from the previous ChatResponse
+    use_cache: bool = True  # False = always ask the LLM for a fresh reply
+
+class ChatResponse(BaseModel):
+    reply: str
+    # Send this back with the next message instead of the history (None = send the history)
+    history_version: Optional[str] = None
+
+# Upper bound on history sent by the client (the prompt itself is limited by tokens)
+MAX_HISTORY_MESSAGES = 200
+
+class ExportPDFRequest(BaseModel):
+    content: str
+    title: Optional[str] = "Career Roadmap & Advice"
+    filename: Optional[str] = "career_roadmap.pdf"
+
+
+# ------------------ ROUTES ------------------
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    # -------- Basic input validation (simple but important) --------
+    if not req.message or not req.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+    if len(req.message) > 4000:
+        raise HTTPException(status_code=400, detail="Message is too long.")
+    # History is trimmed by token budget below; this only bounds the request size
+    if req.history is not None and len(req.history) > MAX_HISTORY_MESSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail="Too many messages in history. Please start a new session.",
+        )
+    if req.session_id is not None and not 0 < len(req.session_id) <= 100:
+        raise HTTPException(status_code=400, detail="session_id must be 1-100 characters.")
+
+    # -------- Which history: the one sent, or the server's copy (delta protocol) --------
+    conversation = None
+    if req.history is None:
+        if not req.session_id or not req.history_version:
+            raise HTTPException(status_code=400, detail="Send the history, or session_id + history_version.")
+        conversation = conversation_store.get(req.session_id, req.history_version)
+        if conversation is None:
+            # Not our version (or we don't know the session): the client sends the full history once
+            raise HTTPException(status_code=409, detail={
+                "message": "Chat history is out of sync. Send the full history again.",
+                "resync": "full_history",
+                "history_version": conversation_store.current_version(req.session_id),
+            })
+    elif req.session_id:
+        conversation = conversation_store.seed(
+            req.session_id, [{"role": msg.role, "content": msg.content} for msg in req.history]
+        )
+
+    system_prompt = """
+You are a tough, honest, no-BS CAREER DEBATE COACH.
+
+Your only job is to:
+- Aggressively challenge the user's career idea or plan
+- Present realistic downsides, risks, competition, failure rates, opportunity costs
+- Play devil's advocate — do NOT just agree or be encouraging by default
+- Force the user to defend their choice or rethink it
+- Use direct, provocative, sometimes uncomfortable language ("Are you serious?", "This is a terrible idea unless…", "Most people who try this fail because…")
+- Only give a roadmap / next steps AFTER the user has made a strong, realistic case — never give it automatically
+
+Typical reply structure (follow this most of the time):
+1. Acknowledge briefly what they said (1 sentence max)
+2. Hit them with 2–3 strong counter-arguments or reality checks
+3. Ask 1–2 sharp, uncomfortable questions to make them justify their decision
+4. If they still haven't convinced you — do NOT give a roadmap yet
+5. If they finally make a solid case — then (and only then) give a realistic, month-by-month roadmap + market context + practical actions
+6. Always end with a question to keep the debate going
+
+Be brutally honest. No sugar-coating. No generic motivation fluff.
+The goal is to help them make a better decision — not to make them feel good.
+"""
+
+    messages = [{"role": "system", "content": system_prompt}]
+
+    # Add conversation history - newest messages that fit the token budget,
+    # plus a short summary of the older ones
+    if conversation is not None:
+        base_version = conversation.version
+        first_turn = conversation.count == 0
+        summary, recent = conversation_store.context(req.session_id, conversation)
+    else:
+        first_turn = len(req.history) == 0
+        summary, recent = build_context(
+            [{"role": msg.role, "content": msg.content} for msg in req.history]
+        )
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    messages.extend(recent)
+
+    # Add current user message
+    messages.append({"role": "user", "content": req.message})
+
+    # Make the very first reply more challenging
+    if first_turn:
+        system_prompt += "\nThis is the very first message — start by strongly questioning their career choice and showing why it might be a bad or risky idea."
+
+    try:
+        ai_reply = await complete_chat(
+            messages,
+            temperature=0.85,       # higher = more opinionated / less predictable
+            max_tokens=700,         # shorter, punchier replies
+            use_cache=req.use_cache,
+        )
+        version = None
+        if conversation is not None:
+            version = conversation_store.commit(req.session_id, conversation, base_version, [
+                {"role": "user", "content": req.message},
+                {"role": "assistant", "content": ai_reply},
+            ])
+        return ChatResponse(reply=ai_reply, history_version=version)
+
+    except UpstreamUnavailable as e:
+        # Groq is rate limited / down: tell the client when to try again
+        logger.warning(f"Groq unavailable: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="AI service is busy right now. Please try again in a moment.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    except Exception as e:
+        # Log full error on the server, but send a simple message to the client
+        logger.exception("Error while calling Groq LLM")
+        raise HTTPException(
+            status_code=502,
+            detail="AI service is currently unavailable. Please try again in a moment.",
+        )
+
+
+@router.post("/export-pdf")
+async def export_pdf(req: ExportPDFRequest, if_none_match: Optional[str] = Header(None)):
+    """
+    Generate and return a PDF file from the provided content (usually career advice/roadmap)
+
+    Rendering happens in the PDF worker pool, so chat requests keep flowing.
+    The same content is only rendered once (cached by content hash + ETag).
+    """
+    if not req.content or not req.content.strip():
+        raise HTTPException(status_code=400, detail="PDF content cannot be empty.")
+
+    key = pdf_cache_key("inline", req.content, req.title)
+    if etag_matches(if_none_match, key):
+        return Response(status_code=304, headers={"ETag": etag_for(key)})
+
+    try:
+        return await serve_pdf(key, req.filename, render_pdf_bytes, req.content, req.title)
+
+    except PdfPoolBusy as busy:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many PDF exports right now. Please try again in a moment.",
+            headers={"Retry-After": str(busy.retry_after)},
+        )
+
+    except Exception:
+        logger.exception("Error while generating inline PDF")
+        raise HTTPException(
+            status_code=500,
+            detail="Could not generate PDF. Please try again.",
+        )
@@ -0,0 +1,76 @@
+"""
+Transfer Router - Bulk export / import of all saved chats (persistent mode).
+
+GET  /api/sessions/export   streams every session as NDJSON (or gzip JSONL)
+POST /api/sessions/import   reads such a file from the request body
+
+Both need "Authorization: Bearer <ADMIN_TOKEN>". The file format and the
+constant-memory streaming are explained in services/session_transfer.py;
+the same thing is available offline with `python -m app.cli`.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..dependencies import require_admin
+from ..services.session_transfer import ImportFormatError, export_sessions, import_sessions
+
+router = APIRouter(prefix="/api/sessions", tags=["transfer"], dependencies=[Depends(require_admin)])
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "jsonl.gz")
+
+# Upper bound on ?session_id=... filters (the rest of the export has no limit)
+MAX_EXPORT_SESSION_IDS = 1000
+
+
+@router.get("/export")
+async def export(
+    format: str = Query("ndjson", description="ndjson or jsonl.gz"),
+    session_id: Optional[List[str]] = Query(None, description="only these sessions (repeat the parameter)"),
+    since: Optional[datetime] = Query(
+        None, description="only messages at or after this time (UTC, or with an offset like Z / +05:30)"
+    ),
+):
+    """
+    Download all chats, streamed straight from the database.
+
+    The response starts right away and never holds more than EXPORT_CHUNK_ROWS
+    rows, so it works the same for a hundred or tens of millions of messages.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {EXPORT_FORMATS}.")
+    if session_id and len(session_id) > MAX_EXPORT_SESSION_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EXPORT_SESSION_IDS} session_id filters.")
+
+    compress = format == "jsonl.gz"
+    filename = f"sessions-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        export_sessions(compress=compress, session_ids=session_id, since=since),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+async def import_(request: Request):
+    """
+    Import an export file sent as the request body (NDJSON, or gzip - detected
+    from the data). Committed every IMPORT_BATCH_ROWS lines.
+    """
+    try:
+        return await import_sessions(request.stream())
+    except ImportFormatError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e} Lines before the problem were already imported "
+                   f"(in batches of {settings.IMPORT_BATCH_ROWS}).",
+        )
+    except Exception:
+        logger.exception("Session import failed")
+        raise HTTPException(status_code=500, detail="Import failed. Lines before the error may have been imported.")
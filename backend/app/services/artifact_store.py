@@ -0,0 +1,143 @@
+"""
+Artifact Store - A folder of generated files that cleans up after itself.
+
+Generated PDFs used to be written with second-resolution timestamps (two
+exports in the same second overwrote each other) and were never deleted.
+An ArtifactStore fixes both:
+
+- unique_name() adds a random suffix, so names never collide
+- write() is atomic (temp file + rename), so readers never see half a file
+- sweep() deletes files older than max_age_seconds, then the oldest files
+  until the folder is below max_bytes
+- run_sweeper() does that in the background every few minutes
+- counters for bytes written and files swept are available via stats()
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """A self-cleaning folder with an age limit and a total size limit."""
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: Optional[float] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.bytes_written = 0
+        self.files_written = 0
+        self.files_swept = 0
+        self.bytes_swept = 0
+
+    @staticmethod
+    def unique_name(prefix: str, suffix: str) -> str:
+        """e.g. career_roadmap_20250101_120000_1a2b3c4d.pdf"""
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        return f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}{suffix}"
+
+    def write(self, name: str, data: bytes) -> Path:
+        """Atomically write `data` to `name` inside the store. Blocking."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / name
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        self.bytes_written += len(data)
+        self.files_written += 1
+        return path
+
+    def _files(self):
+        """(mtime, size, path) of every finished file, oldest first."""
+        files = []
+        if not self.directory.exists():
+            return files
+        for p in self.directory.iterdir():
+            if p.suffix == ".tmp" or not p.is_file():
+                continue
+            try:
+                stat = p.stat()
+            except FileNotFoundError:
+                continue   # another worker removed it
+            files.append((stat.st_mtime, stat.st_size, p))
+        files.sort()
+        return files
+
+    def _remove(self, path: Path, size: int) -> None:
+        path.unlink(missing_ok=True)
+        self.files_swept += 1
+        self.bytes_swept += size
+
+    def sweep(self, keep: Iterable[Path] = ()) -> int:
+        """
+        Apply the age and size limits now. Returns the folder size afterwards.
+
+        Files in `keep` are never deleted. Blocking - call it in a thread.
+        """
+        keep = set(keep)
+        files = self._files()
+
+        if self.max_age_seconds is not None:
+            cutoff = time.time() - self.max_age_seconds
+            fresh = []
+            for mtime, size, p in files:
+                if mtime < cutoff and p not in keep:
+                    self._remove(p, size)
+                else:
+                    fresh.append((mtime, size, p))
+            files = fresh
+
+        total = sum(size for _, size, _ in files)
+        for _, size, p in files:
+            if total <= self.max_bytes:
+                break
+            if p in keep:
+                continue
+            self._remove(p, size)
+            total -= size
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "bytes_written": self.bytes_written,
+            "files_written": self.files_written,
+            "files_swept": self.files_swept,
+            "bytes_swept": self.bytes_swept,
+        }
+
+
+async def run_sweeper(stores: Iterable[ArtifactStore], interval_seconds: float) -> None:
+    """Background task: sweep every store, then sleep, forever."""
+    stores = list(stores)
+    while True:
+        for store in stores:
+            try:
+                await asyncio.to_thread(store.sweep)
+            except Exception:
+                logger.exception(f"Sweeping {store.directory} failed")
+        await asyncio.sleep(interval_seconds)
+
+
+# Loose generated files (e.g. generate_pdf_report output)
+temp_pdf_store = ArtifactStore(
+    directory=settings.TEMP_PDF_DIR,
+    max_bytes=settings.TEMP_PDF_MAX_BYTES,
+    max_age_seconds=settings.TEMP_PDF_MAX_AGE_SECONDS,
+)
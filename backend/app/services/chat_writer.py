@@ -0,0 +1,371 @@
+"""
+Chat Writer - Saves finished chat turns, optionally with group commit.
+
+Every turn used to be its own transaction: two ChatHistory inserts, the
+sessions upsert and a commit. SQLite has ONE writer at a time, so under load
+requests queue up for the write lock and each pays for its own commit.
+
+With DB_WRITE_BATCHING=true, turns are handed to a single background writer
+instead. It waits DB_WRITE_BATCH_WINDOW_MS for more turns to arrive, then
+writes everything that is queued (up to DB_WRITE_BATCH_MAX turns) in ONE
+transaction and wakes up all the waiting requests. Each request still only
+returns after its turn is committed.
+
+Idempotency: every turn is saved with an idempotency key (sent by the
+client, or derived from session + turn count + message). A unique
+index makes a second save of the same key fail; save_turn() then returns
+the reply that was saved first, so retries never duplicate history.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import ChatHistory
+from .metrics import time_phase
+from .response_cache import normalize_text
+from .roadmap_index import index_turns
+from .session_service import record_turns, turn_params
+
+logger = logging.getLogger(__name__)
+
+# Chat writes of this process wait for each other here, not on the SQLite lock
+_write_lock = asyncio.Lock()
+
+# A retry with a derived key comes from a client that gave up waiting for
+# the reply (at most LLM_TIMEOUT) - this much later, it is a new message
+RETRY_MARGIN_SECONDS = 30
+
+# Rows per multi-row INSERT (5 values each - stays far below SQLite's variable limit)
+_INSERT_CHUNK_ROWS = 500
+
+
+class TurnToSave(NamedTuple):
+    session_id: str
+    user_message: str
+    ai_reply: str
+    language: Optional[str]
+    idempotency_key: Optional[str] = None
+
+
+def derive_idempotency_key(session_id: str, user_message: str, turn_number: int) -> str:
+    """
+    Key of a turn for clients that don't send one.
+
+    `turn_number` is the session's turn_count BEFORE the turn, so the same
+    message sent twice on the same turn (a double submit) gets the same
+    key, and sending it again after the reply was saved does not.
+    """
+    raw = "\x00".join([session_id, str(turn_number), normalize_text(user_message)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def previous_turn_key(
+    session_id: str,
+    user_message: str,
+    turn_number: int,
+    last_user_message: Optional[str]
+) -> Optional[str]:
+    """
+    Derived key of the last saved turn, if this message may be a retry of it.
+
+    A retry that arrives after the first attempt was committed sees one
+    more turn, so its own key is new. If the last saved user message is the
+    same (normalized) message, the reply saved under the previous turn's
+    key is the one to send again - but only if it was saved after
+    retry_cutoff(). Later, "continue" or "yes" sent again is a new turn.
+    """
+    if turn_number <= 0 or last_user_message is None:
+        return None
+    if normalize_text(last_user_message) != normalize_text(user_message):
+        return None
+    return derive_idempotency_key(session_id, user_message, turn_number - 1)
+
+
+def retry_cutoff() -> datetime:
+    """Turns saved before this can't be retried with a derived key any more."""
+    return datetime.utcnow() - timedelta(seconds=settings.LLM_TIMEOUT + RETRY_MARGIN_SECONDS)
+
+
+async def find_saved_reply(
+    db: AsyncSession,
+    session_id: str,
+    idempotency_key: str,
+    saved_after: Optional[datetime] = None
+) -> Optional[str]:
+    """The assistant reply already saved under this key (and after `saved_after`), or None."""
+    stmt = (
+        select(ChatHistory.content)
+        .where(
+            ChatHistory.session_id == session_id,
+            ChatHistory.idempotency_key == idempotency_key,
+            ChatHistory.role == "assistant",
+        )
+        .limit(1)
+    )
+    if saved_after is not None:
+        stmt = stmt.where(ChatHistory.timestamp >= saved_after)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def find_saved_replies(
+    db: AsyncSession,
+    keys: Iterable[Tuple[str, str]],
+    saved_after: Optional[datetime] = None
+) -> Dict[Tuple[str, str], str]:
+    """find_saved_reply() for many (session_id, idempotency_key) pairs, in one query."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    stmt = (
+        select(ChatHistory.session_id, ChatHistory.idempotency_key, ChatHistory.content)
+        .where(
+            ChatHistory.session_id.in_({session_id for session_id, _ in keys}),
+            ChatHistory.idempotency_key.in_({key for _, key in keys}),
+            ChatHistory.role == "assistant",
+        )
+    )
+    if saved_after is not None:
+        stmt = stmt.where(ChatHistory.timestamp >= saved_after)
+    result = await db.execute(stmt)
+    return {
+        (session_id, key): content
+        for session_id, key, content in result.all()
+        if (session_id, key) in keys
+    }
+
+
+async def add_turns(db: AsyncSession, turns: List[TurnToSave], now: Optional[datetime] = None) -> None:
+    """
+    Add the user message and assistant reply of each turn, and update the session rows.
+
+    All messages go in with one multi-row INSERT (per 500 rows) and all
+    session rows with one executemany. Does not commit - the caller (or the
+    batch writer) does.
+    """
+    now = now or datetime.utcnow()
+
+    rows = []
+    for turn in turns:
+        rows.append(dict(session_id=turn.session_id, role="user", content=turn.user_message,
+                         timestamp=now, idempotency_key=turn.idempotency_key))
+        rows.append(dict(session_id=turn.session_id, role="assistant", content=turn.ai_reply,
+                         timestamp=now, idempotency_key=turn.idempotency_key))
+
+    # A plain multi-row INSERT: ORM objects would be inserted one row at a
+    # time on SQLite, because it can't return their ids in insert order.
+    # New rowids are handed out in VALUES order, so the sorted ids line up
+    # with `rows` (user, assistant, user, assistant, ...).
+    ids = []
+    for start in range(0, len(rows), _INSERT_CHUNK_ROWS):
+        result = await db.execute(
+            insert(ChatHistory)
+            .values(rows[start:start + _INSERT_CHUNK_ROWS])
+            .returning(ChatHistory.id)
+        )
+        ids.extend(sorted(result.scalars().all()))
+    reply_ids = ids[1::2]
+
+    last_reply_id = {}
+    for turn, reply_id in zip(turns, reply_ids):
+        last_reply_id[turn.session_id] = max(reply_id, last_reply_id.get(turn.session_id, 0))
+
+    await record_turns(db, [
+        turn_params(turn.session_id, turn.user_message, turn.language, last_reply_id[turn.session_id], now)
+        for turn in turns
+    ])
+
+    # Roadmap replies go into the full-text index in the same transaction
+    await index_turns(db, [
+        (reply_id, turn.session_id, turn.user_message, turn.ai_reply, turn.language)
+        for turn, reply_id in zip(turns, reply_ids)
+    ])
+
+
+class SavedTurn(NamedTuple):
+    reply: str       # the reply that is in the database
+    created: bool    # False = this turn was already saved (same idempotency key)
+
+
+class _Queued(NamedTuple):
+    turn: TurnToSave
+    done: asyncio.Future
+
+
+class ChatWriteBatcher:
+    """One background task that commits queued turns in batches."""
+
+    def __init__(self, window_ms: float = 2, max_batch: int = 200):
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.turns = 0
+        self.largest_batch = 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        # Created lazily, inside the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._queue
+
+    async def save(self, turn: TurnToSave) -> SavedTurn:
+        """Queue one turn and wait until it is committed."""
+        queue = self._ensure_started()
+        done = asyncio.get_running_loop().create_future()
+        queue.put_nowait(_Queued(turn, done))
+        # shield: a client that disconnects now must not lose the turn for the others
+        return await asyncio.shield(done)
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            # Give concurrent requests a moment to join this commit
+            if self.window:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _write(self, batch: List[_Queued]) -> None:
+        try:
+            async with _write_lock, SessionLocal() as db:
+                await add_turns(db, [queued.turn for queued in batch])
+                await db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad turn (e.g. a duplicate idempotency key) must not fail
+                # the others: write them one by one
+                logger.warning(f"Batch of {len(batch)} chat turns failed ({e!r}), retrying one by one")
+                for queued in batch:
+                    await self._write([queued])
+                return
+            await self._write_failed(batch[0], e)
+            return
+
+        self.batches += 1
+        self.turns += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for queued in batch:
+            if not queued.done.done():
+                queued.done.set_result(SavedTurn(queued.turn.ai_reply, True))
+
+    async def _write_failed(self, queued: _Queued, error: Exception) -> None:
+        saved = None
+        if isinstance(error, IntegrityError) and queued.turn.idempotency_key:
+            async with SessionLocal() as db:
+                saved = await find_saved_reply(db, queued.turn.session_id, queued.turn.idempotency_key)
+        if queued.done.done():
+            return
+        if saved is not None:
+            queued.done.set_result(SavedTurn(saved, False))
+        else:
+            logger.error(f"Saving a chat turn failed: {error!r}")
+            queued.done.set_exception(error)
+
+    async def close(self) -> None:
+        """Write whatever is still queued, then stop the background task."""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.DB_WRITE_BATCHING,
+            "batches": self.batches,
+            "turns": self.turns,
+            "largest_batch": self.largest_batch,
+        }
+
+
+# One shared writer per app worker process
+chat_write_batcher = ChatWriteBatcher(
+    window_ms=settings.DB_WRITE_BATCH_WINDOW_MS,
+    max_batch=settings.DB_WRITE_BATCH_MAX,
+)
+
+
+async def save_turn(
+    db: AsyncSession,
+    session_id: str,
+    user_message: str,
+    ai_reply: str,
+    language: Optional[str],
+    idempotency_key: Optional[str] = None
+) -> SavedTurn:
+    """
+    Save and commit one finished turn.
+
+    If a turn with the same idempotency key was already saved, nothing is
+    written and the earlier reply is returned (created=False).
+
+    Uses the group-commit writer when DB_WRITE_BATCHING is on, otherwise
+    writes with `db` and commits it.
+    """
+    turn = TurnToSave(session_id, user_message, ai_reply, language, idempotency_key)
+    if settings.DB_WRITE_BATCHING:
+        with time_phase("commit"):
+            return await chat_write_batcher.save(turn)
+
+    # SQLite has one writer at a time: take turns here (first come, first
+    # served) instead of all connections polling for the file lock
+    async with _write_lock:
+        try:
+            with time_phase("commit"):
+                await add_turns(db, [turn])
+                await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            saved = await find_saved_reply(db, session_id, idempotency_key) if idempotency_key else None
+            if saved is None:
+                raise
+            return SavedTurn(saved, False)
+    return SavedTurn(ai_reply, True)
+
+
+async def save_turns(turns: List[TurnToSave]) -> List[SavedTurn]:
+    """
+    Save and commit many finished turns in ONE transaction (own db session).
+
+    If any of them was already saved (same idempotency key), the whole insert
+    fails on the unique index; then every turn is saved on its own with
+    save_turn(), so the others still go in and the duplicates get the reply
+    that was saved first.
+    """
+    if not turns:
+        return []
+    try:
+        async with _write_lock, SessionLocal() as db:
+            with time_phase("commit"):
+                await add_turns(db, turns)
+                await db.commit()
+    except IntegrityError:
+        logger.warning(f"Bulk save of {len(turns)} chat turns hit a duplicate, saving one by one")
+        saved = []
+        for turn in turns:
+            async with SessionLocal() as db:
+                saved.append(await save_turn(
+                    db, turn.session_id, turn.user_message, turn.ai_reply, turn.language, turn.idempotency_key
+                ))
+        return saved
+    return [SavedTurn(turn.ai_reply, True) for turn in turns]
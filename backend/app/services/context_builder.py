@@ -0,0 +1,222 @@
+"""
+Context Builder - Decides which history goes into the LLM prompt.
+
+Counting messages says nothing about cost: ten 4000-character messages blow
+the context, twenty short ones waste it. So here we count TOKENS instead:
+
+- estimate_tokens() is a fast local approximation of the Llama tokenizer
+  (no network, no extra dependency).
+- The newest messages are packed into CONTEXT_TOKEN_BUDGET tokens.
+- Older messages that don't fit are folded into a short rolling summary
+  (a few lines: who said what, first sentence only). The summary is cached
+  per session and only the NEWLY dropped messages are folded on each turn.
+- The persistent chat only loads the last HISTORY_WINDOW messages, so a
+  chat of short messages can fit the budget completely while its oldest
+  messages leave the window. The summary remembers the messages it left
+  out last time, and folds the ones that are gone from the next history.
+
+The career goal always stays at the top of the summary, because the whole
+debate is about it: the session's career_goal when the caller knows it (the
+history may start anywhere in a long chat), else the first user message.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import re
+
+from ..config import settings
+
+# Words, numbers, single punctuation marks and runs of non-Latin letters
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s")
+
+# Extra tokens per chat message (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longest line (in characters) a single message becomes in the summary
+SUMMARY_LINE_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for Llama-style BPE tokenizers.
+
+    English words cost about one token per 4 letters, numbers about one per
+    3 digits, and each non-Latin character (e.g. Devanagari) or punctuation
+    mark about one token.
+    """
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += 1 + (len(piece) - 1) // 4
+        elif first.isdigit():
+            tokens += 1 + (len(piece) - 1) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _fingerprint(message: Dict[str, str]) -> str:
+    raw = f"{message.get('role')}\x00{message.get('content')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _summary_line(message: Dict[str, str]) -> str:
+    """One short line for a message: speaker + first sentence."""
+    speaker = "User" if message.get("role") == "user" else "Coach"
+    text = " ".join(message.get("content", "").split())
+    first = _SENTENCE_END.split(text, maxsplit=1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS].rsplit(" ", 1)[0] + "…"
+    return f"- {speaker}: {first}"
+
+
+class RollingSummary:
+    """Summary of everything that no longer fits in the prompt, for one session."""
+
+    def __init__(self):
+        self.goal_line: Optional[str] = None   # career goal, always kept
+        self.lines: List[str] = []              # newest last
+        self.last_folded: Optional[str] = None  # fingerprint of last folded message
+        # (fingerprint, role, summary line) of the messages NOT folded last time
+        self.kept: List[Tuple[str, str, str]] = []
+
+    def keep(self, recent: List[Dict[str, str]]) -> None:
+        """Remember the messages that went into the prompt as they are."""
+        self.kept = [(_fingerprint(m), m.get("role", ""), _summary_line(m)) for m in recent]
+
+    def _align(self, history: List[Dict[str, str]]) -> Tuple[List[Tuple[str, str]], Optional[int]]:
+        """
+        Where the messages kept last time are in `history`.
+
+        Returns (role, summary line) of kept messages that have left the
+        window since, and the index in `history` where the messages not
+        folded yet begin (None = unknown, use last_folded).
+        """
+        if not self.kept:
+            return [], None
+        fingerprints = [_fingerprint(m) for m in history]
+        kept = [entry[0] for entry in self.kept]
+        # All of them still there (usually right after the folded ones)
+        for position in range(len(fingerprints) - len(kept) + 1):
+            if fingerprints[position:position + len(kept)] == kept:
+                return [], position
+        # The oldest ones left the window: the rest starts the history
+        for start in range(1, len(kept) + 1):
+            if fingerprints[:len(kept) - start] == kept[start:]:
+                return [(role, line) for _, role, line in self.kept[:start]], 0
+        return [], None
+
+    def fold(self, history: List[Dict[str, str]], cut: int, max_tokens: int, goal: Optional[str] = None) -> None:
+        """
+        Add the messages of history[:cut] (the ones that no longer fit) that
+        were not folded yet, and those that left the window since last time.
+
+        `goal` is the session's career goal. Without it, the first user
+        message folded is taken as the goal.
+        """
+        older = history[:cut]
+        left_window, start = self._align(history)
+        if start is None:
+            start = 0
+            if self.last_folded is not None:
+                for index in range(len(older) - 1, -1, -1):
+                    if _fingerprint(older[index]) == self.last_folded:
+                        start = index + 1
+                        break
+
+        entries = left_window + [(m.get("role", ""), _summary_line(m)) for m in older[start:]]
+        if goal and (entries or self.lines):
+            self.goal_line = _summary_line({"role": "user", "content": goal})
+        for role, line in entries:
+            if self.goal_line is None and role == "user":
+                self.goal_line = line
+            elif line != self.goal_line:
+                self.lines.append(line)
+
+        if older:
+            self.last_folded = _fingerprint(older[-1])
+
+        # Keep the summary inside its budget by dropping the oldest lines
+        budget = max_tokens - (estimate_tokens(self.goal_line) if self.goal_line else 0)
+        while self.lines and sum(estimate_tokens(line) for line in self.lines) > budget:
+            self.lines.pop(0)
+
+    def text(self) -> Optional[str]:
+        lines = ([self.goal_line] if self.goal_line else []) + self.lines
+        if not lines:
+            return None
+        return "Summary of the earlier conversation:\n" + "\n".join(lines)
+
+
+# session_id -> RollingSummary (LRU, so idle sessions are forgotten)
+_summaries: "OrderedDict[str, RollingSummary]" = OrderedDict()
+MAX_CACHED_SUMMARIES = 10000
+
+
+def _get_summary(session_id: Optional[str]) -> RollingSummary:
+    if session_id is None:
+        return RollingSummary()
+    summary = _summaries.get(session_id)
+    if summary is None:
+        summary = _summaries[session_id] = RollingSummary()
+        while len(_summaries) > MAX_CACHED_SUMMARIES:
+            _summaries.popitem(last=False)
+    _summaries.move_to_end(session_id)
+    return summary
+
+
+def forget_summary(session_id: str) -> None:
+    """Drop a session's cached summary (its history was replaced)."""
+    _summaries.pop(session_id, None)
+
+
+def build_context(
+    history: List[Dict[str, str]],
+    session_id: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    summary_tokens: Optional[int] = None,
+    goal: Optional[str] = None
+) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    """
+    Pack the newest history into the token budget.
+
+    Args:
+        history: Messages, oldest first ([{"role": ..., "content": ...}, ...])
+        session_id: Used to cache the rolling summary (None = not cached)
+        token_budget: Tokens for history messages (default CONTEXT_TOKEN_BUDGET)
+        summary_tokens: Max tokens for the summary (default CONTEXT_SUMMARY_TOKENS)
+        goal: The session's career goal, pinned at the top of the summary
+            (None = the first user message that gets folded)
+
+    Returns:
+        (summary text or None, recent messages that fit - oldest first)
+    """
+    if token_budget is None:
+        token_budget = settings.CONTEXT_TOKEN_BUDGET
+    if summary_tokens is None:
+        summary_tokens = settings.CONTEXT_SUMMARY_TOKENS
+
+    # Walk backwards from the newest message until the budget is used up
+    used = 0
+    cut = len(history)
+    while cut > 0:
+        cost = message_tokens(history[cut - 1])
+        if used + cost > token_budget:
+            break
+        used += cost
+        cut -= 1
+
+    recent = history[cut:]
+
+    summary = _get_summary(session_id)
+    summary.fold(history, cut, summary_tokens, goal)
+    if session_id is not None:
+        summary.keep(recent)
+    return summary.text(), recent
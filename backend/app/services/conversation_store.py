@@ -0,0 +1,133 @@
+"""
+Conversation Store - The server's copy of stateless chats (delta protocol).
+
+Without it the React client resends the WHOLE conversation on every turn:
+up to 200 messages of 4000 characters, ~200 KB of JSON that FastAPI parses
+and Pydantic validates, only for the context builder to keep the newest
+CONTEXT_TOKEN_BUDGET tokens of it. With the delta protocol
+(POST /api/chat in routers/stateless.py):
+
+1. The client sends the full history once, with a session_id. The server
+   keeps what can still go into a prompt and answers with a history_version.
+2. Next turns send only (session_id, history_version, message). The server
+   rebuilds the context from its copy and answers with the new version.
+3. If the server's copy is missing (restart, evicted, another worker) or at
+   another version (a retry after a lost reply, a second tab), the answer is
+   409 with a resync hint, and the client sends the full history again (1.).
+
+The version is "<number of messages>-<hash chain over all of them>", so it
+changes with every turn and only matches if both sides saw the same messages.
+
+Memory per session stays small: messages that no longer fit in the token
+budget are folded into the rolling summary (context_builder) and dropped.
+The store is per worker process, LRU over STATELESS_SESSIONS_MAX sessions.
+serve.py with several workers hands each request to whichever worker
+accepts it first, so a turn often reaches a worker without the copy and
+gets the 409 + resync (the full history again): correct, but the saving is
+gone. Sticky sessions in front of the workers (same session_id, same
+worker) keep the delta protocol effective.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+
+from ..config import settings
+from .context_builder import build_context, forget_summary
+
+
+def _chain(digest: str, message: Dict[str, str]) -> str:
+    raw = f"{digest}\x00{message['role']}\x00{message['content']}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Conversation:
+    """What the server keeps of one stateless chat."""
+
+    __slots__ = ("messages", "count", "digest")
+
+    def __init__(self):
+        self.messages: List[Dict[str, str]] = []   # the part that may still go into a prompt
+        self.count = 0                              # all messages so far
+        self.digest = ""                            # hash chain over all messages so far
+
+    def add(self, messages: List[Dict[str, str]]) -> None:
+        for message in messages:
+            self.messages.append(message)
+            self.digest = _chain(self.digest, message)
+        self.count += len(messages)
+
+    @property
+    def version(self) -> str:
+        return f"{self.count}-{self.digest[:16]}"
+
+
+class ConversationStore:
+    """session_id -> Conversation, with LRU eviction of sessions."""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self.hits = 0
+        self.resyncs = 0
+
+    def get(self, session_id: str, version: str) -> Optional[Conversation]:
+        """The server's copy if it is at `version`, else None (the client must resync)."""
+        conversation = self._sessions.get(session_id)
+        if conversation is None or conversation.version != version:
+            self.resyncs += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        self.hits += 1
+        return conversation
+
+    def current_version(self, session_id: str) -> Optional[str]:
+        conversation = self._sessions.get(session_id)
+        return conversation.version if conversation is not None else None
+
+    def seed(self, session_id: str, history: List[Dict[str, str]]) -> Conversation:
+        """Start over from the full history sent by the client."""
+        conversation = Conversation()
+        conversation.add(history)
+        forget_summary(_summary_key(session_id))
+        if self.max_sessions > 0:
+            self._sessions[session_id] = conversation
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return conversation
+
+    def context(self, session_id: str, conversation: Conversation) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """build_context() on the server's copy; what was folded into the summary is dropped."""
+        summary, recent = build_context(conversation.messages, session_id=_summary_key(session_id))
+        conversation.messages = list(recent)
+        return summary, recent
+
+    def commit(self, session_id: str, conversation: Conversation, base_version: str,
+               messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Add an answered turn. Returns the new version, or None if the copy
+        changed meanwhile (two turns at once) - then it is dropped and the
+        client resyncs on its next turn.
+        """
+        if self._sessions.get(session_id) is not conversation or conversation.version != base_version:
+            self.discard(session_id)
+            return None
+        conversation.add(messages)
+        return conversation.version
+
+    def discard(self, session_id: str) -> None:
+        if self._sessions.pop(session_id, None) is not None:
+            forget_summary(_summary_key(session_id))
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "hits": self.hits, "resyncs": self.resyncs}
+
+
+def _summary_key(session_id: str) -> str:
+    # Rolling summaries are cached by session_id; keep these apart from persistent sessions
+    return f"stateless:{session_id}"
+
+
+# One shared store per worker process
+conversation_store = ConversationStore(max_sessions=settings.STATELESS_SESSIONS_MAX)
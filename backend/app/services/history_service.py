@@ -0,0 +1,185 @@
+"""
+History Service - Loads the recent messages of a chat session, fast.
+
+Before, every chat turn read the WHOLE session from the database and then
+threw away everything except the last 20 messages. Now:
+
+- The database query asks only for the last N rows (newest first, LIMIT N)
+  using the (session_id, timestamp, id) index, then flips them back into
+  chronological order.
+- Each worker keeps a small in-memory ring buffer of the last N messages
+  per session. It is filled from the database on the first read and
+  updated after every successful write, so normal turns skip the
+  database read completely.
+
+A session that was archived (services/session_archive.py) may still have a
+few live rows (a kept roadmap, turns answered from the buffer). Whenever the
+buffer misses, an archive of the session (one primary-key lookup) is put
+back first, so the history is never read from only part of the rows.
+
+Note: the buffer is per worker process and only sees the turns its own
+worker saved. With several workers that share one socket (serve.py), any
+worker can get the next turn of a session, so the buffer would fall behind:
+serve.py sets HISTORY_BUFFER_MAX_SESSIONS=0 then, and every turn reads from
+the database. Only keep it on with one worker, or with sticky sessions.
+"""
+
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List
+import logging
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import ChatHistory
+from .session_archive import archived_among, restore_session
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryBuffer:
+    """Per-session ring buffers of recent messages, with LRU eviction of sessions."""
+
+    def __init__(self, window: int = 20, max_sessions: int = 10000):
+        self.window = window
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str):
+        """Return the buffered messages (oldest first), or None if not buffered."""
+        buffer = self._sessions.get(session_id)
+        if buffer is None:
+            self.misses += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        self.hits += 1
+        return list(buffer)
+
+    def prime(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        """Store what was just loaded from the database."""
+        if self.max_sessions <= 0:
+            return
+        self._sessions[session_id] = deque(messages, maxlen=self.window)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        """
+        Add newly saved messages (call only AFTER the commit succeeded).
+
+        Sessions that are not buffered are ignored - we don't know their
+        older messages, so they will be loaded from the database next time.
+        """
+        buffer = self._sessions.get(session_id)
+        if buffer is not None:
+            buffer.extend(messages)
+
+    def discard(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+
+# One shared buffer per worker process
+history_buffer = HistoryBuffer(
+    window=settings.HISTORY_WINDOW,
+    max_sessions=settings.HISTORY_BUFFER_MAX_SESSIONS,
+)
+
+
+async def fetch_recent_history(
+    db: AsyncSession,
+    session_id: str,
+    limit: int
+) -> List[Dict[str, str]]:
+    """Read only the last `limit` messages of a session (oldest first)."""
+    result = await db.execute(
+        select(ChatHistory.role, ChatHistory.content)
+        .where(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+        .limit(limit)
+    )
+    rows = result.all()
+    return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+
+async def get_recent_history(db: AsyncSession, session_id: str) -> List[Dict[str, str]]:
+    """Last HISTORY_WINDOW messages of a session - from memory if possible."""
+    messages = history_buffer.get(session_id)
+    if messages is not None:
+        return messages
+
+    # The user came back to an archived session: put its messages back first
+    await restore_session(db, session_id)
+    messages = await fetch_recent_history(db, session_id, history_buffer.window)
+    history_buffer.prime(session_id, messages)
+    return messages
+
+
+async def fetch_recent_histories(
+    db: AsyncSession,
+    session_ids: List[str],
+    limit: int
+) -> Dict[str, List[Dict[str, str]]]:
+    """
+    The last `limit` messages of MANY sessions in one query (oldest first).
+
+    ROW_NUMBER() numbers each session's messages newest-first, and only the
+    first `limit` of every session are returned.
+    """
+    histories: Dict[str, List[Dict[str, str]]] = {session_id: [] for session_id in session_ids}
+    if not session_ids:
+        return histories
+
+    ranked = (
+        select(
+            ChatHistory.session_id,
+            ChatHistory.role,
+            ChatHistory.content,
+            func.row_number().over(
+                partition_by=ChatHistory.session_id,
+                order_by=(ChatHistory.timestamp.desc(), ChatHistory.id.desc()),
+            ).label("rank"),
+        )
+        .where(ChatHistory.session_id.in_(session_ids))
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranked.c.session_id, ranked.c.role, ranked.c.content)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.session_id, ranked.c.rank.desc())
+    )
+    for session_id, role, content in result.all():
+        histories[session_id].append({"role": role, "content": content})
+    return histories
+
+
+async def get_recent_histories(
+    db: AsyncSession,
+    session_ids: Iterable[str]
+) -> Dict[str, List[Dict[str, str]]]:
+    """get_recent_history() for many sessions: buffered ones from memory, the rest in ONE query."""
+    histories: Dict[str, List[Dict[str, str]]] = {}
+    missing = []
+    for session_id in session_ids:
+        messages = history_buffer.get(session_id)
+        if messages is None:
+            missing.append(session_id)
+        else:
+            histories[session_id] = messages
+
+    for session_id in await archived_among(db, missing):
+        await restore_session(db, session_id)
+    loaded = await fetch_recent_histories(db, missing, history_buffer.window)
+    for session_id, messages in loaded.items():
+        history_buffer.prime(session_id, messages)
+    histories.update(loaded)
+    return histories
+
+
+def record_messages(session_id: str, messages: List[Dict[str, str]]) -> None:
+    """Tell the buffer about messages that were just committed."""
+    history_buffer.append(session_id, messages)
+
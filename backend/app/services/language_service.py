@@ -0,0 +1,141 @@
+"""
+Language Service - Decides whether a chat message is Hindi or English.
+
+langdetect used to run on every message. It is slow (~10 ms per call), it
+loads its language profiles on the first call (a ~0.6 s spike for the
+first user after a restart) and it gives random answers on short text
+unless seeded. Most messages don't need it at all:
+
+- Script fast path: Hindi is written in Devanagari, so counting Devanagari
+  vs Latin letters settles the common cases without the n-gram model.
+  (langdetect's Hindi profile is Devanagari-only - it never says "hi" for
+  Latin-script Hinglish like "mujhe data scientist banna hai" anyway.)
+- Only messages that MIX both scripts (with Devanagari in the minority)
+  go to langdetect, seeded so the answer is deterministic.
+- Per-session memo: each session remembers its last script + language and
+  only re-detects when the script of a message changes.
+- langdetect is imported on first use; warm_up() imports it and loads the
+  profiles during app warm-up instead of on the first chat.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+import logging
+import re
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+HINDI = "hi"
+ENGLISH = "en"
+
+# Scripts of a message
+DEVANAGARI = "devanagari"
+LATIN = "latin"
+MIXED = "mixed"
+NO_SCRIPT = "none"   # digits, emoji, punctuation only
+
+_DEVANAGARI_LETTER = re.compile(r"[\u0900-\u097F]")
+_LATIN_LETTER = re.compile(r"[A-Za-z\u00C0-\u024F]")
+
+# Share of Devanagari letters at which a message counts as Devanagari
+DEVANAGARI_SHARE = 0.5
+
+
+def detect_script(text: str) -> str:
+    """Which script a message is written in (see the constants above)."""
+    devanagari = len(_DEVANAGARI_LETTER.findall(text))
+    latin = len(_LATIN_LETTER.findall(text))
+    if devanagari == 0:
+        return LATIN if latin else NO_SCRIPT
+    if devanagari >= (devanagari + latin) * DEVANAGARI_SHARE:
+        return DEVANAGARI
+    return MIXED
+
+
+def _detect_with_model(text: str) -> str:
+    """The n-gram model, for mixed-script messages only."""
+    # Imported here: most workers never see a mixed-script message
+    from langdetect import DetectorFactory, LangDetectException, detect
+
+    # Deterministic results from langdetect
+    DetectorFactory.seed = 0
+    try:
+        return HINDI if detect(text) == HINDI else ENGLISH
+    except LangDetectException:
+        logger.debug("Language detection failed, assuming English")
+        return ENGLISH
+
+
+def detect_language(text: str) -> Optional[str]:
+    """
+    "hi" or "en" for one message, or None if it has no letters at all.
+
+    No session memo here - use LanguageDetector.detect() in request handlers.
+    """
+    script = detect_script(text)
+    if script == DEVANAGARI:
+        return HINDI
+    if script == LATIN:
+        return ENGLISH
+    if script == MIXED:
+        return _detect_with_model(text)
+    return None
+
+
+class LanguageDetector:
+    """detect_language() plus a per-session memo (LRU over sessions)."""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        # session_id -> (script of the last message, language)
+        self._memo: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self.memo_hits = 0
+        self.script_fast_path = 0   # not in the memo, but the script decided it
+        self.model_calls = 0
+
+    def detect(self, session_id: Optional[str], text: str) -> str:
+        """Language of a message in a session ("hi" or "en")."""
+        script = detect_script(text)
+        remembered = self._memo.get(session_id) if session_id else None
+
+        # Same script as last time (or no letters): keep the session language
+        if remembered and (script == remembered[0] or script == NO_SCRIPT):
+            self._memo.move_to_end(session_id)
+            self.memo_hits += 1
+            return remembered[1]
+
+        if script == MIXED:
+            self.model_calls += 1
+            language = _detect_with_model(text)
+        else:
+            self.script_fast_path += 1
+            language = HINDI if script == DEVANAGARI else ENGLISH
+
+        if session_id and script != NO_SCRIPT:
+            self._memo[session_id] = (script, language)
+            self._memo.move_to_end(session_id)
+            while len(self._memo) > self.max_sessions:
+                self._memo.popitem(last=False)
+        return language
+
+    def forget(self, session_id: str) -> None:
+        self._memo.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._memo),
+            "memo_hits": self.memo_hits,
+            "script_fast_path": self.script_fast_path,
+            "model_calls": self.model_calls,
+        }
+
+
+def warm_up() -> None:
+    """Import langdetect and load its profiles now (blocking - call it in a thread)."""
+    _detect_with_model("warm up मॉडल")
+
+
+# One shared detector per app worker process
+language_detector = LanguageDetector(max_sessions=settings.LANGUAGE_MEMO_MAX_SESSIONS)
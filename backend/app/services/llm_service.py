@@ -2,22 +2,152 @@
 LLM Service - Handles all Groq API calls for AI responses.
 
 This service is kept simple and beginner-friendly:
-- Uses async/await for better performance
+- Uses ONE shared async Groq client per worker (keep-alive connection pool)
+- Never blocks the event loop while waiting for Groq
+- Limits how many Groq calls run at the same time (LLM_MAX_CONCURRENCY),
+  with rate limiting, retries and a circuit breaker (see upstream.py)
+- Reuses replies for prompts it has already answered (see response_cache.py)
+  and asks only once for identical prompts that arrive together
 - Accepts structured message history (list of dicts) - better for LLMs
-- Handles errors gracefully
+- Raises UpstreamUnavailable when Groq can't answer (never a fake reply)
 - Supports English and Hindi
+- Can stream tokens as they are generated (for Server-Sent Events)
+- The groq package is imported when the client is first needed (warm_up()
+  does that during app warm-up), not when this module is imported
 """
 
-from groq import Groq
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Optional
+import asyncio
 import logging
+import time
 
 from ..config import settings
+from .response_cache import make_cache_key, response_cache
+from .single_flight import SingleFlight
+from .context_builder import message_tokens
+from .upstream import groq_guard
+from .metrics import observe_phase, record_llm_usage, time_phase
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
 
 logger = logging.getLogger(__name__)
 
-# Initialize Groq client once (reused for all requests)
-client = Groq(api_key=settings.GROQ_API_KEY)
+MODEL_NAME = "llama-3.1-8b-instant"
+
+# Shared client, created on first use (one per worker process)
+_client: Optional["AsyncGroq"] = None
+
+# Identical prompts that are being answered right now (keyed like the cache)
+llm_flights = SingleFlight()
+
+
+def get_client() -> "AsyncGroq":
+    """
+    Return the shared async Groq client (created once, reused for all requests).
+
+    The underlying httpx client keeps connections alive, so we don't pay
+    for a new TCP + TLS handshake on every chat message.
+    """
+    global _client
+    if _client is None:
+        import httpx
+        from groq import AsyncGroq
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        )
+        _client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL,
+            http_client=http_client,
+            # Retries are done by groq_guard (with jitter, Retry-After and the breaker)
+            max_retries=0,
+        )
+    return _client
+
+
+def import_client_modules() -> None:
+    """Import groq + httpx now (blocking, ~0.5 s - call it in a thread during warm-up)."""
+    import groq  # noqa: F401
+    import httpx  # noqa: F401
+
+
+async def warm_up() -> None:
+    """Import the Groq SDK off the event loop and create the shared client."""
+    await asyncio.to_thread(import_client_modules)
+    get_client()
+
+
+async def close_client() -> None:
+    """Close the shared client (call on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+    _client = None
+    groq_guard.reset()
+
+
+def _estimated_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a call may use (prompt + longest reply), for the tokens-per-minute budget."""
+    return sum(message_tokens(m) for m in messages) + max_tokens
+
+
+async def complete_chat(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.6,
+    max_tokens: int = 800,
+    use_cache: bool = True
+) -> str:
+    """
+    Send a ready-made message list to Groq and return the reply text.
+
+    If the same prompt was answered recently, the cached reply is returned
+    without calling Groq, and identical prompts that arrive while one is
+    still being answered share that one call (pass use_cache=False to
+    always get a fresh reply).
+    Waits (briefly) for a free concurrency slot and rate-limit budget, and
+    retries temporary Groq errors. Raises UpstreamUnavailable when Groq
+    can't answer in time; other errors are raised to the caller.
+    """
+    use_cache = use_cache and settings.LLM_CACHE_ENABLED
+    if use_cache:
+        cache_key = make_cache_key(messages, MODEL_NAME, temperature, max_tokens)
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    async def ask_groq() -> str:
+        tokens = _estimated_tokens(messages, max_tokens)
+        deadline = groq_guard.deadline()
+        async with groq_guard.slot(deadline), time_phase("llm_total"):
+            completion = await groq_guard.call(
+                lambda: get_client().chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                tokens=tokens,
+                deadline=deadline,
+            )
+        usage = getattr(completion, "usage", None)
+        record_llm_usage(usage)
+        groq_guard.limiter.refund(tokens, getattr(usage, "total_tokens", None) or None)
+        reply = completion.choices[0].message.content.strip()
+
+        if use_cache and reply:
+            await response_cache.set(cache_key, reply)
+        return reply
+
+    if use_cache:
+        # The same prompt is already being answered: wait for that reply
+        return await llm_flights.do(cache_key, ask_groq)
+    return await ask_groq()
 
 # System prompts for different languages
 SYSTEM_PROMPT_EN = """
@@ -41,22 +171,29 @@ SYSTEM_PROMPT_HI = """
 4. यूज़र का सवाल दोहराएं नहीं
 """
 
+# Put before a roadmap written earlier for a similar goal (services/roadmap_index.py)
+EXEMPLAR_PROMPT = (
+    "Reference: a roadmap written earlier for a similar goal. Reuse what fits, "
+    "adapt it to THIS user, and keep your answer more compact than the reference."
+)
 
-async def generate_llm_response(
+# Longest reply we ask Groq for (a reference roadmap lowers it, see roadmap_hint())
+DEFAULT_MAX_TOKENS = 800
+
+
+def build_messages(
     user_message: str,
     history: Optional[List[Dict[str, str]]] = None,
-    is_hindi: bool = False
-) -> str:
+    is_hindi: bool = False,
+    summary: Optional[str] = None,
+    exemplar: Optional[str] = None
+) -> List[Dict[str, str]]:
     """
-    Generate AI response using Groq LLM.
+    Build the message list that the Groq API expects.
 
-    Args:
-        user_message: The current user message
-        history: List of previous messages in format [{"role": "user", "content": "..."}, ...]
-        is_hindi: If True, use Hindi system prompt
-
-    Returns:
-        AI response text (or error message if something goes wrong)
+    The system prompt (English or Hindi) comes first, then the summary of
+    older messages (if any), then a reference roadmap (if any), then the
+    history (without any system messages), then the current user message.
     """
     # Choose system prompt based on language
     system_prompt = SYSTEM_PROMPT_HI if is_hindi else SYSTEM_PROMPT_EN
@@ -64,6 +201,14 @@ async def generate_llm_response(
     # Build messages list (this is what Groq API expects)
     messages = [{"role": "system", "content": system_prompt}]
 
+    # Short summary of the part of the conversation that no longer fits
+    if summary:
+        messages.append({"role": "system", "content": summary})
+
+    # Roadmap for a similar goal, so the model can adapt instead of writing from scratch
+    if exemplar:
+        messages.append({"role": "system", "content": f"{EXEMPLAR_PROMPT}\n\n{exemplar}"})
+
     # Add conversation history if provided
     # History should already be in the right format: [{"role": "...", "content": "..."}]
     if history:
@@ -77,21 +222,127 @@ async def generate_llm_response(
 
     # Add current user message
     messages.append({"role": "user", "content": user_message})
+    return messages
 
-    try:
-        # Call Groq API (this is synchronous, but we wrap it in async function)
-        # In production, you might want to use asyncio.to_thread() for true async
-        completion = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=messages,
-            temperature=0.6,  # Balanced creativity
-            max_tokens=800    # Reasonable length
+
+async def generate_llm_response(
+    user_message: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    is_hindi: bool = False,
+    use_cache: bool = True,
+    summary: Optional[str] = None,
+    exemplar: Optional[str] = None,
+    max_tokens: Optional[int] = None
+) -> str:
+    """
+    Generate AI response using Groq LLM.
+
+    Args:
+        user_message: The current user message
+        history: List of previous messages in format [{"role": "user", "content": "..."}, ...]
+        is_hindi: If True, use Hindi system prompt
+        use_cache: If False, skip the response cache and always ask Groq
+        summary: Optional summary of older messages (see context_builder.py)
+        exemplar: Optional roadmap for a similar goal (see roadmap_index.py)
+        max_tokens: Longest reply (default DEFAULT_MAX_TOKENS)
+
+    Returns:
+        AI response text
+
+    Raises:
+        UpstreamUnavailable if Groq can't answer right now. (It used to
+        return an "unavailable" text instead, which then got saved to the
+        chat history as if it were a real reply.)
+    """
+    messages = build_messages(user_message, history, is_hindi, summary, exemplar)
+
+    # Call Groq API (truly async - other requests keep running while we wait)
+    return await complete_chat(
+        messages,
+        temperature=0.6,  # Balanced creativity
+        max_tokens=max_tokens or DEFAULT_MAX_TOKENS,   # Reasonable length
+        use_cache=use_cache
+    )
+
+
+async def stream_llm_response(
+    user_message: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    is_hindi: bool = False,
+    use_cache: bool = True,
+    summary: Optional[str] = None,
+    exemplar: Optional[str] = None,
+    max_tokens: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Stream the AI response token-by-token (text deltas) from Groq.
+
+    Same arguments as generate_llm_response(), but yields small pieces of
+    text as soon as Groq produces them instead of waiting for the full reply.
+
+    If the caller stops iterating (for example because the browser went away
+    and the task was cancelled), the upstream HTTP stream is closed right
+    away so Groq stops generating tokens that nobody will read.
+
+    A cached reply (same cache as generate_llm_response) is sent as one piece,
+    and a fully streamed reply is added to the cache.
+
+    Errors are NOT swallowed here - the caller decides how to report them
+    (UpstreamUnavailable = Groq can't answer right now).
+    """
+    messages = build_messages(user_message, history, is_hindi, summary, exemplar)
+    max_tokens = max_tokens or DEFAULT_MAX_TOKENS
+
+    use_cache = use_cache and settings.LLM_CACHE_ENABLED
+    if use_cache:
+        cache_key = make_cache_key(messages, MODEL_NAME, 0.6, max_tokens)
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+
+    # The concurrency slot is held for the whole stream, not just the first byte.
+    # Only opening the stream is retried - once tokens were sent, errors are final.
+    tokens = _estimated_tokens(messages, max_tokens)
+    deadline = groq_guard.deadline()
+    async with groq_guard.slot(deadline):
+        started = time.perf_counter()
+        stream = await groq_guard.call(
+            lambda: get_client().chat.completions.create(
+                model=MODEL_NAME,
+                messages=messages,
+                temperature=0.6,
+                max_tokens=max_tokens,
+                stream=True,
+            ),
+            tokens=tokens,
+            deadline=deadline,
         )
 
-        reply = completion.choices[0].message.content.strip()
-        return reply
+        try:
+            async for chunk in stream:
+                # Groq sends the token usage on the last chunk: give back
+                # what was reserved for the budget but not used
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage is not None:
+                    record_llm_usage(usage)
+                    groq_guard.limiter.refund(tokens, getattr(usage, "total_tokens", None) or None)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        observe_phase("llm_first_token", time.perf_counter() - started)
+                    parts.append(delta)
+                    yield delta
+        finally:
+            # Runs on normal end, on errors AND on cancellation (client disconnect)
+            await stream.close()
+        observe_phase("llm_total", time.perf_counter() - started)
 
-    except Exception as e:
-        # Log the error for debugging, but return user-friendly message
-        logger.exception("Error calling Groq LLM API")
-        return "AI is temporarily unavailable. Please try again."
+    # Only reached when the stream finished normally
+    reply = "".join(parts).strip()
+    if use_cache and reply:
+        await response_cache.set(cache_key, reply)
@@ -0,0 +1,226 @@
+"""
+Markdown Parser - Turns an AI reply into a list of simple blocks.
+
+The LLM answers in light markdown (headings, bullet / numbered lists, bold,
+`code`). Both PDF exports used to re-parse the text line by line with their
+own ad-hoc prefix checks. Now the text is parsed ONCE into format-neutral
+blocks, which any output format (PDF today, maybe HTML / DOCX later) can
+turn into its own elements:
+
+    Block(kind="heading",   level=2, text="Month 1")
+    Block(kind="list_item", level=1, text="Learn **SQL**", marker="3.")
+    Block(kind="paragraph", text="...")
+    Block(kind="code",      text="pip install pandas")
+    Block(kind="blank")
+
+`text` keeps the inline markdown (**bold**, *italic*, `code`); use
+inline_to_reportlab() to convert it for ReportLab. parse_markdown() results
+are cached, so exporting the same reply again does not parse it again.
+"""
+
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+import re
+
+
+class Block(NamedTuple):
+    kind: str                     # heading | paragraph | list_item | code | blank
+    text: str = ""
+    level: int = 0                # heading level (1-4) or list depth (0 = top level)
+    marker: Optional[str] = None  # list marker: "•" or "1." etc.
+
+
+_HEADING = re.compile(r"^(#{1,4})\s+(.*)$")
+_BULLET = re.compile(r"^([ \t]*)[-*•+]\s+(.*)$")
+_NUMBERED = re.compile(r"^([ \t]*)(\d{1,3})[.)]\s+(.*)$")
+
+def _depth(indent: str) -> int:
+    """Two spaces (or one tab) of indentation = one list level."""
+    width = len(indent.replace("\t", "  "))
+    return min(width // 2, 3)
+
+
+@lru_cache(maxsize=256)
+def parse_markdown(text: str) -> Tuple[Block, ...]:
+    """Parse markdown text into a tuple of Blocks (cached)."""
+    blocks = []
+    code_lines = None   # lines of the fenced code block we are inside, if any
+
+    for raw in text.split("\n"):
+        line = raw.rstrip()
+
+        # Fenced code blocks ``` ... ```
+        if line.lstrip().startswith("```"):
+            if code_lines is None:
+                code_lines = []
+            else:
+                blocks.append(Block("code", "\n".join(code_lines)))
+                code_lines = None
+            continue
+        if code_lines is not None:
+            code_lines.append(raw)
+            continue
+
+        if not line.strip():
+            # Collapse runs of empty lines into one
+            if blocks and blocks[-1].kind != "blank":
+                blocks.append(Block("blank"))
+            continue
+
+        match = _HEADING.match(line.lstrip())
+        if match:
+            blocks.append(Block("heading", match.group(2).strip(), level=len(match.group(1))))
+            continue
+
+        match = _NUMBERED.match(line)
+        if match:
+            blocks.append(Block("list_item", match.group(3).strip(),
+                                level=_depth(match.group(1)), marker=f"{match.group(2)}."))
+            continue
+
+        match = _BULLET.match(line)
+        if match:
+            blocks.append(Block("list_item", match.group(2).strip(),
+                                level=_depth(match.group(1)), marker="•"))
+            continue
+
+        blocks.append(Block("paragraph", line.strip()))
+
+    # Unclosed fence: keep what we have
+    if code_lines:
+        blocks.append(Block("code", "\n".join(code_lines)))
+
+    # No trailing blank
+    while blocks and blocks[-1].kind == "blank":
+        blocks.pop()
+    return tuple(blocks)
+
+
+# Inline markdown -> ReportLab mini-HTML. Split into `code` spans, runs of
+# "*" and runs of "_"; the runs are then paired like CommonMark does it
+_INLINE_TOKEN = re.compile(r"`([^`]+)`|(\*+)|(_+)")
+_DUNDER = re.compile(r"[a-z][a-z0-9_]*")    # __init__, __main__: names, not bold
+_OPEN_PUNCT = "([{\"'"
+_CLOSE_PUNCT = ".,;:!?)]}\"'"
+
+
+class _Delimiter:
+    """A run of "*" or "__" that may open and/or close bold / italic."""
+
+    def __init__(self, char: str, count: int, can_open: bool, can_close: bool):
+        self.char = char
+        self.count = count            # characters not used by a pair yet
+        self.can_open = can_open
+        self.can_close = can_close
+        self.opens = []               # tags opened here, innermost first
+        self.closes = []              # tags closed here, innermost first
+
+    def render(self) -> str:
+        closes = "".join(f"</{tag}>" for tag in self.closes)
+        opens = "".join(f"<{tag}>" for tag in reversed(self.opens))
+        return closes + self.char * self.count + opens
+
+
+def _delimiter(text: str, start: int, end: int) -> _Delimiter:
+    """Decide from the characters around a run whether it can open / close."""
+    char = text[start]
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    count = end - start
+    if char == "_":
+        # "__" only at word boundaries, so snake_case and __init__.py stay as they are
+        if count != 2:
+            return _Delimiter(char, count, False, False)
+        after_next = text[end + 1] if end + 1 < len(text) else " "
+        can_open = not after.isspace() and (before.isspace() or before in _OPEN_PUNCT)
+        can_close = not before.isspace() and (
+            after.isspace() or (after in _CLOSE_PUNCT and not (after == "." and after_next.isalnum()))
+        )
+        return _Delimiter(char, count, can_open, can_close)
+    # "*": a single one must not touch a word on the outside (2*3*4 stays as it is)
+    can_open = not after.isspace() and (count > 1 or not (before.isalnum() or before == "_"))
+    can_close = not before.isspace() and (count > 1 or not (after.isalnum() or after == "_"))
+    return _Delimiter(char, count, can_open, can_close)
+
+
+def _nearest_opener(nodes: list, openers: list, closer: _Delimiter) -> Optional[int]:
+    """
+    Position in `openers` of the run `closer` pairs with: the nearest one of
+    the same size ("*" with "*", "**" with "**"), else the nearest at all.
+    """
+    same_char = [depth for depth in range(len(openers) - 1, -1, -1)
+                 if nodes[openers[depth]].char == closer.char]
+    for depth in same_char:
+        if (nodes[openers[depth]].count >= 2) == (closer.count >= 2):
+            return depth
+    return same_char[0] if same_char else None
+
+
+def _pair_delimiters(nodes: list) -> None:
+    """
+    Match closing runs with the nearest opening run before them.
+
+    Runs left open in between become plain text again, so the pairs are
+    always nested properly and ReportLab never sees <b><i></b></i>.
+    """
+    openers = []   # indexes into nodes
+    for index, node in enumerate(nodes):
+        if not isinstance(node, _Delimiter):
+            continue
+        if node.can_close:
+            while node.count:
+                match = _nearest_opener(nodes, openers, node)
+                if match is None:
+                    break
+                opener = nodes[openers[match]]
+                inner = nodes[openers[match] + 1:index]
+                if node.char == "_" and all(isinstance(n, str) for n in inner) \
+                        and _DUNDER.fullmatch("".join(inner)):
+                    break
+                del openers[match + 1:]
+                # ***x*** -> <b><i>x</i></b>; otherwise bold first, like CommonMark
+                if opener.count >= 3 and node.count >= 3:
+                    used, tags = 3, ["i", "b"]
+                elif opener.count >= 2 and node.count >= 2:
+                    used, tags = 2, ["b"]
+                elif node.char == "*":
+                    used, tags = 1, ["i"]
+                else:
+                    break
+                opener.count -= used
+                node.count -= used
+                opener.opens.extend(tags)
+                node.closes.extend(tags)
+                if not opener.count:
+                    openers.pop()
+        if node.can_open and node.count:
+            openers.append(index)
+
+
+def escape_xml(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def inline_to_reportlab(text: str) -> str:
+    """
+    Convert inline markdown to ReportLab paragraph markup.
+
+    The text is escaped first, so "<" or "&" in an AI reply can no longer
+    break the PDF. Only balanced tags come out: "**a *b** c*" gives
+    "<b>a *b</b> c*", and a "*" without a partner stays a "*".
+    """
+    nodes = []
+    position = 0
+    for match in _INLINE_TOKEN.finditer(text):
+        if match.start() > position:
+            nodes.append(escape_xml(text[position:match.start()]))
+        if match.group(1) is not None:
+            nodes.append(f'<font face="Courier">{escape_xml(match.group(1))}</font>')
+        else:
+            nodes.append(_delimiter(text, match.start(), match.end()))
+        position = match.end()
+    if position < len(text):
+        nodes.append(escape_xml(text[position:]))
+
+    _pair_delimiters(nodes)
+    return "".join(node.render() if isinstance(node, _Delimiter) else node for node in nodes)
@@ -0,0 +1,329 @@
+"""
+Metrics - Counters, gauges and histograms in the Prometheus text format.
+
+GET /metrics returns everything below, ready for Prometheus to scrape.
+No extra dependency: the few metric types we need are small enough to
+write here, and recording a value is just a dict lookup and an addition,
+so the hot path stays cheap.
+
+- Counter / Gauge / Histogram, optionally with labels
+- time_phase("history") times one step of a request into phase_seconds
+- add_collector(fn) registers a function that is only called on scrape,
+  for numbers other services already count (cache hits, pool sizes...)
+- MetricsMiddleware counts HTTP requests, their latency and in-flight count
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import time
+
+# Latency buckets in seconds: 1 ms ... 60 s
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# (metric name, type, help, [(labels, value), ...]) as returned by collectors
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str):
+        """The child metric for these label values (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = type(self)(self.name, self.help)
+            child._init_like(self)
+        return child
+
+    def _init_like(self, parent: "_Metric") -> None:
+        pass
+
+    def _samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        children = self._children.items() if self.labelnames else [((), self)]
+        for values, child in children:
+            base = dict(zip(self.labelnames, values))
+            for suffix, extra, value in child._samples():
+                lines.append(f"{self.name}{suffix}{_format_labels({**base, **extra})} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def _samples(self):
+        yield "_total" if not self.name.endswith("_total") else "", {}, self.value
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def _samples(self):
+        yield "", {}, self.value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)   # last one = +Inf
+        self.sum = 0.0
+
+    def _init_like(self, parent: "Histogram") -> None:
+        self.buckets = parent.buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        # Only the matching bucket is counted; render() adds them up
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def _samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield "_bucket", {"le": _format_value(bound)}, cumulative
+        cumulative += self.counts[-1]
+        yield "_bucket", {"le": "+Inf"}, cumulative
+        yield "_sum", {}, self.sum
+        yield "_count", {}, cumulative
+
+
+class Registry:
+    """All metrics of this process, plus scrape-time collectors."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], Iterable[Family]]) -> None:
+        # Apps built more than once in a process (tests, benchmarks) add the same collector again
+        if fn not in self._collectors:
+            self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        # A family may be yielded several times (e.g. once per cache):
+        # Prometheus wants one HELP/TYPE header per name, so merge them first
+        families: Dict[str, Family] = {}
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                if name in families:
+                    families[name][3].extend(samples)
+                else:
+                    families[name] = (name, kind, help, list(samples))
+        for name, kind, help, samples in families.values():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, help, labelnames, buckets))
+
+
+def add_collector(fn: Callable[[], Iterable[Family]]) -> None:
+    registry.add_collector(fn)
+
+
+# ------------------ SHARED METRICS ------------------
+
+PHASE_SECONDS = histogram(
+    "career_coach_phase_seconds",
+    "Time spent in each step of a request",
+    ["phase"],
+)
+LLM_TOKENS = counter(
+    "career_coach_llm_tokens_total",
+    "Tokens reported by Groq (usage field)",
+    ["kind"],
+)
+LLM_IN_FLIGHT = gauge(
+    "career_coach_llm_in_flight",
+    "Groq calls running right now",
+)
+
+
+class time_phase:
+    """
+    with time_phase("history"): ...  ->  one observation of phase_seconds{phase="history"}
+
+    A small class instead of @contextmanager: it is used on every request.
+    """
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, phase: str):
+        self._histogram = PHASE_SECONDS.labels(phase)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+    # Also usable in "async with a, time_phase(...)"
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    PHASE_SECONDS.labels(phase).observe(seconds)
+
+
+def record_llm_usage(usage) -> None:
+    """Add Groq's usage numbers (prompt / completion tokens), if there are any."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if prompt:
+        LLM_TOKENS.labels("prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels("completion").inc(completion)
+
+
+# ------------------ HTTP MIDDLEWARE ------------------
+
+HTTP_REQUESTS = counter(
+    "career_coach_http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_SECONDS = histogram(
+    "career_coach_http_request_seconds",
+    "HTTP request latency (until the response is fully sent)",
+    ["method", "route"],
+)
+HTTP_IN_FLIGHT = gauge(
+    "career_coach_http_in_flight",
+    "HTTP requests being handled right now",
+)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware: it adds a task per request
+    and buffers streaming responses).
+
+    Routes are labelled by their template ("/chat"), never the raw path, so
+    unknown URLs can't create unlimited label values.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
+            HTTP_SECONDS.labels(method, path).observe(time.perf_counter() - start)
+
+
+def render_latest() -> str:
+    """The text for GET /metrics."""
+    return registry.render()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def stats_family(name: str, kind: str, help: str, values: Dict[str, float],
+                 label: str = "kind", extra: Optional[Dict[str, str]] = None) -> Family:
+    """Turn a stats() dict into one metric family with one sample per key."""
+    extra = extra or {}
+    return name, kind, help, [({**extra, label: key}, value) for key, value in values.items()]
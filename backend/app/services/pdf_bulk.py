@@ -0,0 +1,135 @@
+"""
+PDF Bulk - The career plans of many sessions as one streamed ZIP file.
+
+Counsellors need the roadmaps of a whole cohort. Instead of one
+/api/export-pdf call per session:
+
+- every plan goes through the same path as a single export: the PDF cache
+  first, the PDF worker pool (separate processes, so all PDF_WORKERS cores
+  render in parallel) only for plans that were never rendered
+- at most PDF_BULK_CONCURRENCY renders of a ZIP are in the pool at once, so
+  a big cohort never fills the pool's queue and single exports still get in
+  (if the pool is busy anyway, the ZIP waits and tries again instead of failing)
+- each PDF is added to the ZIP as soon as ITS render finishes (completion
+  order, not list order) and the ZIP bytes are sent right away, so the
+  download starts after the first render, not after the last one
+- PDFs are already compressed, so entries are stored, not deflated again
+
+The last entry, manifest.json, lists every session: its file name, or why
+it has no PDF (no AI reply yet, render failed).
+"""
+
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import re
+import zipfile
+
+from ..config import settings
+from .pdf_cache import get_or_render_pdf, pdf_cache_key
+from .pdf_jobs import render_report_bytes
+from .pdf_pool import PdfPoolBusy, pdf_pool
+
+logger = logging.getLogger(__name__)
+
+# (session_id, career goal, last AI reply) - see session_service.get_session_plans()
+Plan = Tuple[str, Optional[str], Optional[str]]
+
+
+class _ZipStream:
+    """
+    Write-only file for zipfile.ZipFile that just collects the bytes.
+
+    It has no seek(), so zipfile writes each entry's sizes after its data
+    (a "data descriptor") and never goes back - perfect for streaming.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        """The bytes written since the last take()."""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _file_name(session_id: str) -> str:
+    # Session ids come from clients: keep them safe as a file name inside the ZIP
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", session_id).strip("._") or "session"
+    return f"{safe[:80]}-career_plan.pdf"
+
+
+async def _plan_pdf(goal: Optional[str], plan_text: str) -> bytes:
+    """The plan's PDF (cached, or rendered in the pool - waiting while it is full)."""
+    career_goal = goal or "Not specified"
+    while True:
+        try:
+            if settings.PDF_IN_MEMORY:
+                return await pdf_pool.run(render_report_bytes, plan_text, career_goal)
+            key = pdf_cache_key("report", plan_text, career_goal)
+            path = await get_or_render_pdf(key, render_report_bytes, plan_text, career_goal)
+            return await asyncio.to_thread(path.read_bytes)
+        except PdfPoolBusy as busy:
+            await asyncio.sleep(busy.retry_after)
+
+
+async def stream_plans_zip(plans: List[Plan], concurrency: Optional[int] = None) -> AsyncIterator[bytes]:
+    """The ZIP of all plans, as bytes chunks (one or more per finished PDF)."""
+    concurrency = max(1, concurrency or settings.PDF_BULK_CONCURRENCY or pdf_pool.workers)
+    sink = _ZipStream()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    manifest = []
+    used_names = set()
+
+    todo = []
+    for session_id, goal, plan_text in plans:
+        if plan_text:
+            todo.append((session_id, goal, plan_text))
+        else:
+            manifest.append({"session_id": session_id, "error": "No AI response found in this session"})
+    todo.reverse()   # pop() from the end = list order
+
+    running = {}
+    now = datetime.now().timetuple()[:6]
+    try:
+        while todo or running:
+            while todo and len(running) < concurrency:
+                session_id, goal, plan_text = todo.pop()
+                running[asyncio.create_task(_plan_pdf(goal, plan_text))] = session_id
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                session_id = running.pop(task)
+                try:
+                    data = task.result()
+                except Exception:
+                    logger.exception(f"Bulk PDF render failed for session {session_id}")
+                    manifest.append({"session_id": session_id, "error": "Could not generate PDF"})
+                    continue
+
+                name = _file_name(session_id)
+                if name in used_names:
+                    name = f"{len(used_names)}-{name}"
+                used_names.add(name)
+                archive.writestr(zipfile.ZipInfo(name, date_time=now), data)
+                manifest.append({"session_id": session_id, "file": name})
+            yield sink.take()
+
+        manifest.sort(key=lambda entry: entry["session_id"])
+        archive.writestr(zipfile.ZipInfo("manifest.json", date_time=now), json.dumps(manifest, indent=2))
+        archive.close()
+        yield sink.take()
+    finally:
+        # Client went away: stop waiting (renders already in a worker still finish into the cache)
+        for task in running:
+            task.cancel()
@@ -0,0 +1,168 @@
+"""
+PDF Cache - Keeps rendered PDFs on disk, addressed by their content.
+
+Users click "download" several times and shared links re-render the same
+roadmap. Rendering is the expensive part, so every rendered PDF is stored
+under a key that is a hash of everything that affects the output:
+
+    (renderer name, content, title / career goal, TEMPLATE_VERSION)
+
+- Same inputs -> same key -> the cached file is served, no rendering at all.
+- The key doubles as an HTTP ETag, so a browser that already has the file
+  gets a tiny 304 Not Modified instead of the whole PDF again.
+- The cache folder is bounded by PDF_CACHE_MAX_BYTES. When it grows past
+  that, the least recently used files are deleted (file modification time
+  is used as "last used", so this also works across restarts and workers).
+  The background sweeper also removes files older than PDF_CACHE_MAX_AGE_SECONDS.
+- Renders of the same key at the same time are done once (single flight):
+  a download that arrives while its PDF is being rendered (e.g. by the
+  speculative pre-render, pdf_prerender.py) waits for that render.
+- With PDF_IN_MEMORY=true nothing is written to disk at all: PDFs are
+  rendered into memory and sent straight to the client (ETags still work).
+
+Bump TEMPLATE_VERSION whenever the PDF layout changes, so old renders are
+not served any more.
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Optional
+import asyncio
+import hashlib
+import logging
+import os
+
+from fastapi.responses import FileResponse, Response
+
+from ..config import settings
+from .artifact_store import ArtifactStore
+from .pdf_pool import pdf_pool
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Change this whenever the PDF layout / styles change
+TEMPLATE_VERSION = "2"
+
+
+def pdf_cache_key(renderer: str, *parts: str) -> str:
+    """Content hash used as file name and ETag."""
+    digest = hashlib.sha256()
+    for part in (renderer, TEMPLATE_VERSION) + parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    """True if the client's If-None-Match header already names this PDF."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag_for(key) in tags or f"W/{etag_for(key)}" in tags
+
+
+class PdfRenderCache(ArtifactStore):
+    """Size-bounded, least-recently-used folder of rendered PDFs."""
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: Optional[float] = None):
+        super().__init__(directory, max_bytes, max_age_seconds)
+        self._approx_bytes: Optional[int] = None   # None = not scanned yet
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Path of the cached PDF, or None. Marks the file as recently used."""
+        path = self._path(key)
+        try:
+            os.utime(path)  # "touch" = most recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        """
+        Store a rendered PDF and return its path.
+
+        Blocking - call it in a thread.
+        """
+        path = self.write(self._path(key).name, data)
+
+        if self._approx_bytes is None:
+            self._approx_bytes = self.sweep(keep=[path])
+        else:
+            self._approx_bytes += len(data)
+            if self._approx_bytes > self.max_bytes:
+                # never delete the file we are about to serve
+                self._approx_bytes = self.sweep(keep=[path])
+        return path
+
+    def sweep(self, keep=()) -> int:
+        self._approx_bytes = super().sweep(keep)
+        return self._approx_bytes
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes": self._approx_bytes,
+            **super().stats(),
+        }
+
+
+# One shared cache per worker process (all workers share the same folder)
+pdf_cache = PdfRenderCache(
+    directory=settings.PDF_CACHE_DIR,
+    max_bytes=settings.PDF_CACHE_MAX_BYTES,
+    max_age_seconds=settings.PDF_CACHE_MAX_AGE_SECONDS,
+)
+
+
+# Renders running right now, by cache key
+pdf_flights = SingleFlight()
+
+
+async def get_or_render_pdf(key: str, render_fn: Callable[..., bytes], *args: Any) -> Path:
+    """
+    Return the cached PDF for `key`, rendering it first if needed.
+
+    render_fn(*args) must return PDF bytes; it runs in the PDF worker pool
+    (so PdfPoolBusy may be raised). If the same key is already being
+    rendered, that render is awaited instead.
+    """
+    path = pdf_cache.get(key)
+    if path is not None:
+        return path
+
+    async def render_and_store() -> Path:
+        data = await pdf_pool.run(render_fn, *args)
+        return await asyncio.to_thread(pdf_cache.put, key, data)
+
+    return await pdf_flights.do(key, render_and_store)
+
+
+async def serve_pdf(key: str, filename: str, render_fn: Callable[..., bytes], *args: Any) -> Response:
+    """
+    Build the download response for a PDF (cached on disk, or in memory only).
+
+    Adds Content-Disposition and ETag headers. May raise PdfPoolBusy.
+    """
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "ETag": etag_for(key),
+    }
+
+    if settings.PDF_IN_MEMORY:
+        data = await pdf_pool.run(render_fn, *args)
+        return Response(content=data, media_type="application/pdf", headers=headers)
+
+    pdf_path = await get_or_render_pdf(key, render_fn, *args)
+    return FileResponse(path=pdf_path, media_type="application/pdf", headers=headers)
@@ -0,0 +1,59 @@
+"""
+PDF Jobs - The functions the PDF worker processes run.
+
+pdf_pool sends a function to a worker by its module + name, so the app
+process has to import that module. pdf_services imports ReportLab (~0.15 s
+and several MB per app worker) even though the app process never renders
+anything itself. These thin wrappers import pdf_services only when they
+run, which happens inside the worker processes.
+
+Routers pass these to serve_pdf() / pdf_pool.run() instead of the
+pdf_services functions.
+"""
+
+
+def render_pdf_bytes(content: str, title: str = "Career Roadmap & Advice") -> bytes:
+    """pdf_services.render_pdf_bytes (runs in a PDF worker)."""
+    from .pdf_services import render_pdf_bytes as render
+    return render(content, title)
+
+
+def render_report_bytes(plan_text: str, career_goal: str = "") -> bytes:
+    """pdf_services.render_report_bytes (runs in a PDF worker)."""
+    from .pdf_services import render_report_bytes as render
+    return render(plan_text, career_goal)
+
+
+def render_report_bytes_low_priority(plan_text: str, career_goal: str = "", nice: int = 10) -> bytes:
+    """
+    render_report_bytes at a lower CPU priority (speculative renders, see pdf_prerender).
+
+    On Linux the nice value belongs to a thread, so the render runs in a
+    short-lived thread that lowers only its own priority - the worker
+    process keeps full priority for the downloads users wait for.
+    """
+    import os
+    import sys
+    import threading
+
+    if sys.platform != "linux" or nice <= 0:
+        return render_report_bytes(plan_text, career_goal)
+
+    result = {}
+
+    def run():
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), min(19, os.nice(0) + nice))
+        except OSError:
+            pass
+        try:
+            result["pdf"] = render_report_bytes(plan_text, career_goal)
+        except BaseException as error:
+            result["error"] = error
+
+    thread = threading.Thread(target=run, name="pdf-prerender")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["pdf"]
@@ -0,0 +1,112 @@
+"""
+PDF Pool - Runs PDF rendering in separate worker processes.
+
+ReportLab layout is pure CPU work. Running it inside an async endpoint
+freezes the event loop, so every chat user waits while a roadmap renders.
+Here the rendering happens in a small ProcessPoolExecutor instead:
+
+- PDF_WORKERS processes render in parallel (they are started at app startup,
+  so the first export doesn't pay for spawning them, importing ReportLab and
+  building the stylesheets)
+- At most PDF_MAX_QUEUE extra renders may wait for a free worker.
+  When the pool is full we refuse quickly with PdfPoolBusy, and the endpoint
+  answers 429 with a Retry-After header instead of piling up work.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import multiprocessing
+
+from ..config import settings
+from .metrics import time_phase
+
+logger = logging.getLogger(__name__)
+
+
+class PdfPoolBusy(Exception):
+    """Raised when too many PDF renders are already running or waiting."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("PDF render pool is full")
+        self.retry_after = retry_after
+
+
+def _warm_worker() -> bool:
+    """Import ReportLab and build the stylesheets ahead of the first real render."""
+    from .pdf_templates import INLINE, REPORT, get_stylesheet
+    get_stylesheet(REPORT)
+    get_stylesheet(INLINE)
+    return True
+
+
+class PdfRenderPool:
+    """A process pool with a limit on how much work may wait in line."""
+
+    def __init__(self, workers: int, max_queue: int, retry_after: int = 2):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0   # running + waiting renders
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn" starts clean processes - forking a process that runs an
+            # event loop and threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def start(self) -> None:
+        """Start the worker processes now (call at app startup)."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, _warm_worker) for _ in range(self.workers)
+        ))
+        logger.info(f"PDF render pool ready with {self.workers} worker(s)")
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) in a worker process and return its result.
+
+        fn must be a module-level function (it is sent to another process).
+        Raises PdfPoolBusy if the pool and its queue are full.
+        """
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PdfPoolBusy(self.retry_after)
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with time_phase("pdf_render"):
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+
+# One shared pool per app worker process
+pdf_pool = PdfRenderPool(
+    workers=settings.PDF_WORKERS,
+    max_queue=settings.PDF_MAX_QUEUE,
+    retry_after=settings.PDF_RETRY_AFTER_SECONDS,
+)
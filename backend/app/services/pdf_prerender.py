@@ -0,0 +1,135 @@
+"""
+PDF Prerender - Renders a session's PDF before the user asks for it.
+
+Right after the coach writes the month-by-month roadmap, users nearly
+always click "download" - and then wait for a cold ReportLab render.
+So after every saved chat turn whose reply looks like a roadmap (or that
+asked for the plan / to finalize it), the session is queued here and its
+PDF is rendered into the PDF cache in the background. /api/export-pdf then
+finds the file in the cache; if it isn't there (yet), it renders on demand
+as before, and if the pre-render is running it just waits for it
+(single flight in pdf_cache).
+
+Speculation must never slow down real work:
+- one pre-render at a time per app worker, and only while the PDF pool
+  has nothing else to do (downloads always go first)
+- it waits PDF_PRERENDER_DELAY_SECONDS first, so the reply is sent before
+  any CPU goes to rendering
+- the render runs at a lower CPU priority (PDF_PRERENDER_NICE)
+- at most PDF_PRERENDER_MAX_PENDING sessions wait; newer roadmaps push out
+  the oldest, and a session that is queued again is rendered once (its
+  latest reply - the one a download would use)
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+import logging
+
+from ..config import settings
+from .pdf_cache import get_or_render_pdf, pdf_cache, pdf_cache_key
+from .pdf_jobs import render_report_bytes_low_priority
+from .pdf_pool import PdfPoolBusy, pdf_pool
+
+logger = logging.getLogger(__name__)
+
+# How often to look again while the PDF pool is busy, and for how long
+_IDLE_POLL_SECONDS = 0.2
+_MAX_WAIT_SECONDS = 60.0
+
+
+class PdfPrerenderer:
+    """A small queue of sessions whose PDF should be rendered in the background."""
+
+    def __init__(self, max_pending: int = 32, delay: float = 0.5, nice: int = 10):
+        self.max_pending = max_pending
+        self.delay = delay
+        self.nice = nice
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.counts = {"queued": 0, "dropped": 0, "rendered": 0, "cached": 0, "skipped": 0, "failed": 0}
+
+    def schedule(self, session_id: str) -> None:
+        """Queue the session's PDF (call after its turn was committed)."""
+        if self.max_pending <= 0:
+            return
+        self._pending[session_id] = None
+        self._pending.move_to_end(session_id)
+        self.counts["queued"] += 1
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+            self.counts["dropped"] += 1
+
+        if self._worker is None or self._worker.done():
+            self._wake = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await asyncio.sleep(self.delay)
+            while self._pending:
+                session_id, _ = self._pending.popitem(last=False)
+                try:
+                    self.counts[await self._prerender(session_id)] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self.counts["failed"] += 1
+                    logger.exception(f"Speculative PDF render failed for session {session_id}")
+
+    async def _wait_for_idle_pool(self) -> bool:
+        waited = 0.0
+        while pdf_pool.stats()["pending"] > 0:
+            if waited >= _MAX_WAIT_SECONDS:
+                return False
+            await asyncio.sleep(_IDLE_POLL_SECONDS)
+            waited += _IDLE_POLL_SECONDS
+        return True
+
+    async def _prerender(self, session_id: str) -> str:
+        from ..database import SessionLocal
+        from .session_service import get_session_plan
+
+        # The same plan + goal (and so the same cache key) as /api/export-pdf
+        async with SessionLocal() as db:
+            plan = await get_session_plan(db, session_id)
+        if plan is None or not plan[1]:
+            return "skipped"
+        career_goal = plan[0] or "Not specified"
+        key = pdf_cache_key("report", plan[1], career_goal)
+        if pdf_cache.get(key) is not None:
+            return "cached"
+
+        if not await self._wait_for_idle_pool():
+            return "skipped"
+        try:
+            await get_or_render_pdf(key, render_report_bytes_low_priority, plan[1], career_goal, self.nice)
+        except PdfPoolBusy:
+            # A burst of downloads came in first: they matter more
+            return "skipped"
+        return "rendered"
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), **self.counts}
+
+
+# One shared pre-renderer per worker process (nothing to pre-render without a PDF cache)
+pdf_prerenderer = PdfPrerenderer(
+    max_pending=settings.PDF_PRERENDER_MAX_PENDING if settings.PDF_PRERENDER and not settings.PDF_IN_MEMORY else 0,
+    delay=settings.PDF_PRERENDER_DELAY_SECONDS,
+    nice=settings.PDF_PRERENDER_NICE,
+)
@@ -1,93 +1,87 @@
 # app/services/pdf_services.py
-from pathlib import Path
-import os
 from datetime import datetime
 from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from io import BytesIO
 import logging
 
+from .artifact_store import temp_pdf_store
+from .markdown_parser import escape_xml, parse_markdown
+from .pdf_templates import INLINE, REPORT, blocks_to_flowables, get_stylesheet
+
 logger = logging.getLogger(__name__)
 
 
-def generate_pdf_report(plan_text: str, career_goal: str = "") -> str:
+def render_report_bytes(plan_text: str, career_goal: str = "") -> bytes:
     """
-    Generate a simple PDF file from the career plan text using reportlab.
+    Render the career plan (roadmap + goal) to a PDF and return its bytes.
 
-    This function is kept small and beginner‑friendly:
-    - Creates a temp folder if it does not exist
-    - Builds a basic, readable PDF
-    - Falls back to a .txt file if something goes wrong
+    Errors are raised to the caller.
     """
-    # These are needed in both success and error paths
-    output_dir = Path("temp_pdfs")
-    output_dir.mkdir(exist_ok=True)
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    buffer = BytesIO()
+
+    # Create PDF document
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72,
+    )
+
+    # Built once per process, not per export
+    styles = get_stylesheet(REPORT)
+    heading_style = styles["Heading2"]
+
+    story = []
+
+    # Title
+    story.append(Paragraph("Career Roadmap & Debate Summary", styles["Title"]))
+    story.append(Spacer(1, 0.4 * inch))
+
+    # Goal
+    if career_goal.strip():
+        story.append(Paragraph(f"Career Goal: {escape_xml(career_goal)}", heading_style))
+        story.append(Spacer(1, 0.3 * inch))
 
-    try:
-        # Unique filename with timestamp
-        filename = f"career_roadmap_{timestamp}.pdf"
-        filepath = output_dir / filename
-
-        # Create PDF document
-        doc = SimpleDocTemplate(
-            str(filepath),
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72,
+    # Generated date
+    story.append(
+        Paragraph(
+            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}",
+            styles["Normal"],
         )
+    )
+    story.append(Spacer(1, 0.5 * inch))
 
-        styles = getSampleStyleSheet()
-        title_style = styles["Title"]
-        heading_style = styles["Heading2"]
-        normal_style = styles["Normal"]
-        bullet_style = styles["BodyText"]
-
-        story = []
-
-        # Title
-        story.append(Paragraph("Career Roadmap & Debate Summary", title_style))
-        story.append(Spacer(1, 0.4 * inch))
-
-        # Goal
-        if career_goal.strip():
-            story.append(Paragraph(f"Career Goal: {career_goal}", heading_style))
-            story.append(Spacer(1, 0.3 * inch))
-
-        # Generated date
-        story.append(
-            Paragraph(
-                f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}",
-                normal_style,
-            )
-        )
-        story.append(Spacer(1, 0.5 * inch))
+    # Main content header
+    story.append(Paragraph("Detailed Roadmap / Plan:", heading_style))
+    story.append(Spacer(1, 0.3 * inch))
 
-        # Main content header
-        story.append(Paragraph("Detailed Roadmap / Plan:", heading_style))
-        story.append(Spacer(1, 0.3 * inch))
+    # Plan text: parsed markdown (headings, lists, bold, code) -> flowables
+    story.extend(blocks_to_flowables(parse_markdown(plan_text), styles))
 
-        # Process plan_text line by line
-        for line in plan_text.split("\n"):
-            line = line.strip()
-            if not line:
-                story.append(Spacer(1, 0.15 * inch))
-                continue
+    # Build PDF
+    doc.build(story)
+    return buffer.getvalue()
 
-            # Handle bullet points or numbered items
-            if line.startswith(("-", "*", "•", "1.", "2.", "3.", "4.", "5.")):
-                cleaned = line.lstrip("-*•123456789. ").strip()
-                story.append(Paragraph(f"• {cleaned}", bullet_style))
-            else:
-                story.append(Paragraph(line, normal_style))
-            story.append(Spacer(1, 0.12 * inch))
 
-        # Build PDF
-        doc.build(story)
+def generate_pdf_report(plan_text: str, career_goal: str = "") -> str:
+    """
+    Generate a simple PDF file from the career plan text using reportlab.
+
+    This function is kept small and beginner‑friendly:
+    - Writes into the temp folder store (unique names, old files are swept)
+    - Builds a basic, readable PDF (see render_report_bytes)
+    - Falls back to a .txt file if something goes wrong
+    """
+    try:
+        # Unique filename (timestamp + random part, so parallel exports never collide)
+        filepath = temp_pdf_store.write(
+            temp_pdf_store.unique_name("career_roadmap", ".pdf"),
+            render_report_bytes(plan_text, career_goal),
+        )
 
         logger.info(f"PDF generated successfully: {filepath}")
         return str(filepath)
@@ -95,7 +89,42 @@ def generate_pdf_report(plan_text: str, career_goal: str = "") -> str:
     except Exception as e:
         logger.exception("PDF generation failed")
         # Fallback text file so the user still gets something
-        fallback_path = output_dir / f"error_report_{timestamp}.txt"
-        with open(fallback_path, "w", encoding="utf-8") as f:
-            f.write(f"PDF generation failed: {str(e)}\n\nOriginal content:\n{plan_text}")
+        fallback_path = temp_pdf_store.write(
+            temp_pdf_store.unique_name("error_report", ".txt"),
+            f"PDF generation failed: {str(e)}\n\nOriginal content:\n{plan_text}".encode("utf-8"),
+        )
         return str(fallback_path)
+
+
+def render_pdf_bytes(content: str, title: str = "Career Roadmap & Advice") -> bytes:
+    """
+    Render content (usually the latest AI reply) to a PDF and return its bytes.
+
+    Used by the stateless /api/export-pdf endpoint. Nothing is written to disk.
+    Errors are raised to the caller.
+    """
+    buffer = BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=inch,
+    )
+
+    # Built once per process, not per export
+    styles = get_stylesheet(INLINE)
+
+    story = []
+
+    # Title
+    story.append(Paragraph(escape_xml(title), styles["TitleBold"]))
+    story.append(Spacer(1, 0.3 * inch))
+
+    # Content: parsed markdown (headings, lists, bold, code) -> flowables
+    story.extend(blocks_to_flowables(parse_markdown(content), styles))
+
+    doc.build(story)
+    return buffer.getvalue()
@@ -0,0 +1,112 @@
+"""
+PDF Templates - Stylesheets built once per process, plus block -> flowable.
+
+getSampleStyleSheet() and the extra ParagraphStyles used to be created on
+every export. They never change, so each template's stylesheet is built the
+first time it is needed and then reused (every PDF worker process keeps its
+own copy).
+
+blocks_to_flowables() turns parsed markdown blocks (see markdown_parser.py)
+into ReportLab flowables using a template's styles.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, Paragraph, Preformatted, Spacer
+
+from .markdown_parser import Block, escape_xml, inline_to_reportlab
+
+# Template names
+REPORT = "report"   # session-based career plan (routers/pdf.py)
+INLINE = "inline"   # stateless export of any content (main.py)
+
+LIST_INDENT = 18    # points per list level
+
+
+def _add_common_styles(styles: StyleSheet1, body: ParagraphStyle) -> None:
+    """List, code and spacing styles shared by all templates."""
+    for depth in range(4):
+        # Hanging indent: the marker sits left of the text, wrapped lines align with the text
+        styles.add(ParagraphStyle(
+            name=f"ListItem{depth}",
+            parent=body,
+            leftIndent=LIST_INDENT * (depth + 1),
+            firstLineIndent=-LIST_INDENT + 4,
+            spaceAfter=4,
+        ))
+    styles.add(ParagraphStyle(
+        name="CodeBlock",
+        parent=styles["Code"],
+        fontSize=9,
+        leading=11,
+        leftIndent=LIST_INDENT,
+        spaceBefore=4,
+        spaceAfter=8,
+    ))
+
+
+@lru_cache(maxsize=None)
+def get_stylesheet(template: str) -> StyleSheet1:
+    """The stylesheet of a template (built on first use, then cached)."""
+    styles = getSampleStyleSheet()
+
+    if template == INLINE:
+        styles.add(ParagraphStyle(
+            name="TitleBold",
+            fontName="Helvetica-Bold",
+            fontSize=18,
+            spaceAfter=20,
+        ))
+        styles.add(ParagraphStyle(
+            name="Content",
+            fontName="Helvetica",
+            fontSize=11,
+            leading=14,
+            spaceAfter=12,
+        ))
+        styles.add(ParagraphStyle(name="Body", parent=styles["Content"]))
+    elif template == REPORT:
+        styles.add(ParagraphStyle(name="Body", parent=styles["Normal"], spaceAfter=8))
+    else:
+        raise ValueError(f"Unknown PDF template: {template}")
+
+    _add_common_styles(styles, styles["Body"])
+    return styles
+
+
+# Markdown heading level -> stylesheet entry
+_HEADING_STYLES: Dict[int, str] = {1: "Heading1", 2: "Heading2", 3: "Heading3", 4: "Heading4"}
+
+
+def _paragraph(text: str, style: ParagraphStyle, prefix: str = "") -> Paragraph:
+    """
+    A Paragraph of inline markdown. If ReportLab still can't parse the
+    markup, the text goes in as plain (escaped) text instead of failing the
+    whole export.
+    """
+    try:
+        return Paragraph(prefix + inline_to_reportlab(text), style)
+    except ValueError:
+        return Paragraph(prefix + escape_xml(text), style)
+
+
+def blocks_to_flowables(blocks: Iterable[Block], styles: StyleSheet1) -> List[Flowable]:
+    """Turn parsed markdown blocks into ReportLab flowables."""
+    story: List[Flowable] = []
+    for block in blocks:
+        if block.kind == "blank":
+            story.append(Spacer(1, 0.15 * inch))
+        elif block.kind == "heading":
+            story.append(_paragraph(block.text, styles[_HEADING_STYLES[block.level]]))
+        elif block.kind == "list_item":
+            # Marker inside the text as plain characters - bulletText and
+            # entities like &nbsp; push ReportLab onto a much slower layout path
+            story.append(_paragraph(block.text, styles[f"ListItem{block.level}"], f"{block.marker} "))
+        elif block.kind == "code":
+            story.append(Preformatted(block.text, styles["CodeBlock"]))
+        else:
+            story.append(_paragraph(block.text, styles["Body"]))
+    return story
@@ -0,0 +1,175 @@
+"""
+Response Cache - Remembers LLM replies for prompts we have already answered.
+
+Many users open with almost the same first message ("I want to be a data
+scientist"), so the same prompt goes to Groq again and again. This cache
+sits in front of the LLM call:
+
+- The key is a hash of (system prompt, normalized history + message,
+  model, temperature, max_tokens). "Normalized" means lower-case with
+  extra spaces and trailing punctuation removed, so "I want to be a Data
+  Scientist!" and "i want to be a data scientist" hit the same entry.
+- Level 1: in-memory LRU with a time-to-live (TTL) - very fast, per worker.
+- Level 2 (optional): a small SQLite file, so hits survive restarts and are
+  shared between workers on the same machine.
+- Hit / miss counters are available via stats().
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    text = _SPACES.sub(" ", text.strip().lower())
+    return text.rstrip(" .!?।")
+
+
+def make_cache_key(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """Build the cache key for one LLM call (sha256 hex string)."""
+    normalized = [
+        # The system prompt is ours, so it is hashed exactly as-is
+        [m["role"], m["content"] if m["role"] == "system" else normalize_text(m["content"])]
+        for m in messages
+    ]
+    raw = json.dumps([normalized, model, temperature, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-level (memory LRU + optional SQLite) cache with TTL expiry."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+
+        # key -> (expires_at, reply); order = least recently used first
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    # ------------------ Level 2 (SQLite) ------------------
+
+    def _get_db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, reply TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._get_db().execute(
+                "SELECT expires_at, reply FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def _disk_set(self, key: str, expires_at: float, reply: str) -> None:
+        with self._db_lock:
+            db = self._get_db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, reply, expires_at) VALUES (?, ?, ?)",
+                (key, reply, expires_at),
+            )
+            # Cheap cleanup of expired rows, so the file does not grow forever
+            db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            db.commit()
+
+    # ------------------ Public API ------------------
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached reply, or None if missing / expired."""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, reply = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return reply
+            del self._memory[key]
+
+        if self.sqlite_path:
+            try:
+                row = await asyncio.to_thread(self._disk_get, key)
+            except Exception:
+                logger.exception("Response cache: SQLite read failed")
+                row = None
+            if row is not None and row[0] > now:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, reply: str) -> None:
+        """Store a reply in memory (and on disk if enabled)."""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, reply)
+
+        if self.sqlite_path:
+            try:
+                await asyncio.to_thread(self._disk_set, key, expires_at, reply)
+            except Exception:
+                logger.exception("Response cache: SQLite write failed")
+
+    def _remember(self, key: str, expires_at: float, reply: str) -> None:
+        self._memory[key] = (expires_at, reply)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)  # evict least recently used
+
+    def clear(self) -> None:
+        """Forget everything in memory (the SQLite tier is left alone)."""
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit / miss counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._memory),
+        }
+
+
+# One shared cache per worker process
+response_cache = ResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    sqlite_path=settings.LLM_CACHE_SQLITE_PATH or None,
+)
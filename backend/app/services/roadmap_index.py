@@ -0,0 +1,369 @@
+"""
+Roadmap Index - Finds roadmaps written earlier for a similar career goal.
+
+Most roadmaps are for a few dozen careers, yet each one is a fresh
+800-token Groq completion. So every roadmap-shaped reply is filed under the
+career goal of its session (its first user message), boiled down to the
+words that name the career: "I want to be a pilot" and "How do I become a
+pilot?" are both the goal "en:pilot".
+
+- roadmap_goals (models.py) has one row per goal with the newest roadmap
+  for it; roadmap_index is a SQLite FTS5 table (an on-disk inverted index
+  with BM25 ranking, in the same database file) over the goal words. The
+  index grows with the number of different goals, not with the number of
+  chats, so lookups stay fast with millions of messages.
+- index_turns() files new roadmaps in the same transaction that saves the
+  chat turn (chat_writer.add_turns); `python -m app.cli index-roadmaps`
+  rebuilds everything from chat_history
+- find_roadmaps(): the same goal (one index lookup), else the best BM25
+  matches having all its words, else the goal minus one word, else matches
+  having all but one word; re-ranked by how many goal words they share
+- roadmap_hint() is what the chat endpoints use (ROADMAP_REUSE):
+  "exemplar" shows the best match to the LLM as a reference and lowers
+  max_tokens, "reuse" also sends a stored plan as the reply when a new
+  session states the same goal as an earlier one (no LLM call at all)
+
+Both modes hand one user's roadmap to another, so ROADMAP_REUSE is "off"
+unless the operator turns it on. The exemplar is only the plan itself,
+never the other user's own words of their goal.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+import re
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import ChatHistory, ChatSession, RoadmapGoal
+from .language_service import ENGLISH
+
+# FTS5 candidates re-ranked in Python (only their goal keys are read)
+_CANDIDATES = 20
+# Goal words used in a query (long first messages would match everything)
+_MAX_QUERY_TERMS = 12
+
+# "Month 1", "Week 3", "**Phase 2:**", "चरण 1" ... at the start of a line
+_ROADMAP_STEP = re.compile(
+    r"^[\s#>*_\-\d.)]*(?:month|week|phase|step|stage|महीना|माह|सप्ताह|हफ्ता|चरण)s?\s*[-–:]?\s*\d+",
+    re.IGNORECASE | re.MULTILINE,
+)
+_PLAN_REQUEST = re.compile(
+    r"\b(?:road\s?map|plan|month[\s-]by[\s-]month|step[\s-]by[\s-]step|next steps|finali[sz]e)\b"
+    r"|रोडमैप|योजना|प्लान",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[\wऀ-ॿ]+")
+
+# Words that say nothing about WHICH career
+_STOPWORDS = frozenset("""
+a an the i im i'm me my mine we our you your to of in on at for from with and or but as by is am are was
+be been being become becoming do does did can could should would will want wants wanted wanna like love
+how what which who why when where please help tell give make get good best career careers job jobs
+field work working plan roadmap after before into about also really very so just some any future dream
+मैं मुझे मेरा मेरी बनना बनने बनूं चाहता चाहती चाहते हूँ हूं है हैं था के की का को में से और एक करना
+करनी करने लिए क्या कैसे कौन भी तो
+""".split())
+
+
+class RoadmapMatch(NamedTuple):
+    message_id: int                  # newest roadmap for this goal (chat_history id)
+    first_message_id: Optional[int]  # newest reply to the goal itself (first turn of its session)
+    goal: str                        # how one session worded the goal
+    overlap: float                   # share of the query's goal words that this goal has
+    exact: bool                      # both goals have exactly the same words
+    bm25: float                      # FTS5 rank (lower = better, 0 for the exact goal)
+
+
+class RoadmapHint(NamedTuple):
+    reply: Optional[str] = None      # stored plan to send as the reply (no LLM call)
+    exemplar: Optional[str] = None   # similar plan to show the LLM
+    max_tokens: Optional[int] = None  # lower reply limit when an exemplar is used
+
+
+def looks_like_roadmap(reply: str) -> bool:
+    """True for a step-by-step plan (at least two "Month N" / "Step N" style lines)."""
+    return len(_ROADMAP_STEP.findall(reply or "")) >= 2
+
+
+def wants_roadmap(message: str) -> bool:
+    """True if the user asks for the plan / roadmap (or to finalize it)."""
+    return bool(_PLAN_REQUEST.search(message or ""))
+
+
+def goal_terms(goal: str) -> List[str]:
+    """The words of a goal that name the career (lower case, crude plural folding)."""
+    terms = []
+    for word in _WORD.findall((goal or "").lower()):
+        if word in _STOPWORDS or word.isdigit():
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word not in terms:
+            terms.append(word)
+    return terms
+
+
+def _goal_key(language: Optional[str], terms: List[str]) -> str:
+    # Word order doesn't matter: "data scientist" == "scientist (data)"
+    return f"{language or ENGLISH}:{' '.join(sorted(terms))}"
+
+
+def _key_terms(goal_key: str) -> List[str]:
+    return goal_key.split(":", 1)[1].split()
+
+
+# ------------------ INDEXING ------------------
+
+# Goals that got their roadmap_goals row in this write go into the FTS index
+_INDEX_NEW_GOALS_SQL = text("""
+INSERT INTO roadmap_index (rowid, terms)
+SELECT id, :terms FROM roadmap_goals WHERE goal_key = :goal_key AND roadmaps = :count
+""")
+
+
+async def _file_roadmaps(db, entries: Iterable[Tuple[int, str, Optional[str], bool]], now: datetime) -> int:
+    """
+    Upsert roadmaps into roadmap_goals + roadmap_index (db: session or connection).
+
+    entries: (assistant message id, goal, language, answers the goal itself),
+    oldest first. Returns how many roadmaps were filed.
+    """
+    goals = OrderedDict()
+    filed = 0
+    for message_id, goal, language, first in entries:
+        terms = goal_terms(goal)[:_MAX_QUERY_TERMS]
+        if not terms:
+            continue
+        filed += 1
+        key = _goal_key(language, terms)
+        row = goals.get(key)
+        if row is None:
+            row = goals[key] = {
+                "goal_key": key, "goal": goal[:1000], "language": language or ENGLISH,
+                "first_message_id": None, "roadmaps": 0, "updated_at": now,
+            }
+        row["message_id"] = message_id
+        row["roadmaps"] += 1
+        if first:
+            row["first_message_id"] = message_id
+    if not goals:
+        return 0
+
+    stmt = sqlite_insert(RoadmapGoal)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[RoadmapGoal.goal_key],
+        set_={
+            "message_id": stmt.excluded.message_id,
+            "first_message_id": func.coalesce(stmt.excluded.first_message_id, RoadmapGoal.first_message_id),
+            "roadmaps": RoadmapGoal.roadmaps + stmt.excluded.roadmaps,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ), list(goals.values()))
+    await db.execute(_INDEX_NEW_GOALS_SQL, [
+        {"goal_key": key, "terms": " ".join(_key_terms(key)), "count": row["roadmaps"]}
+        for key, row in goals.items()
+    ])
+    return filed
+
+
+async def index_turns(db: AsyncSession, turns: Iterable[Tuple[int, str, str, str, Optional[str]]]) -> int:
+    """
+    File the roadmap replies among saved turns (caller commits).
+
+    turns: (assistant message id, session_id, user message, reply, language),
+    after the session rows were updated. Returns how many were filed.
+    """
+    if settings.ROADMAP_REUSE == "off":
+        return 0
+    roadmaps = [turn for turn in turns if looks_like_roadmap(turn[3])]
+    if not roadmaps:
+        return 0
+
+    # The goal is the session's first user message (this one, for a new session)
+    result = await db.execute(
+        select(ChatSession.session_id, ChatSession.career_goal)
+        .where(ChatSession.session_id.in_({turn[1] for turn in roadmaps}))
+    )
+    session_goals = dict(result.all())
+    entries = []
+    for message_id, session_id, user_message, reply, language in roadmaps:
+        goal = session_goals.get(session_id) or user_message
+        entries.append((message_id, goal, language, user_message == goal))
+    return await _file_roadmaps(db, entries, datetime.utcnow())
+
+
+async def rebuild_index(batch_rows: int = 5000) -> int:
+    """
+    Rebuild roadmap_goals + roadmap_index from chat_history (CLI). Returns how many roadmaps.
+
+    Streams all messages in session order, so memory stays small.
+    """
+    from ..database import engine
+
+    stmt = (
+        select(ChatHistory.id, ChatHistory.session_id, ChatHistory.role, ChatHistory.content,
+               ChatSession.language)
+        .outerjoin(ChatSession, ChatSession.session_id == ChatHistory.session_id)
+        .order_by(ChatHistory.session_id, ChatHistory.timestamp, ChatHistory.id)
+        .execution_options(yield_per=batch_rows)
+    )
+    now = datetime.utcnow()
+    total = 0
+    async with engine.connect() as read, engine.connect() as write:
+        await write.execute(text("DELETE FROM roadmap_goals"))
+        await write.execute(text("INSERT INTO roadmap_index (roadmap_index) VALUES ('delete-all')"))
+        session, goal, question = None, None, None
+        entries = []
+        result = await read.stream(stmt)
+        async for message_id, session_id, role, content, language in result:
+            if session_id != session:
+                session, goal, question = session_id, None, None
+            if role.lower() == "user":
+                goal = goal or content
+                question = content
+            elif role.lower() == "assistant" and goal and looks_like_roadmap(content):
+                entries.append((message_id, goal, language, question == goal))
+                if len(entries) >= batch_rows:
+                    total += await _file_roadmaps(write, entries, now)
+                    entries = []
+        total += await _file_roadmaps(write, entries, now)
+        await write.commit()
+    return total
+
+
+# ------------------ LOOKUP ------------------
+
+_SEARCH_SQL = text("""
+SELECT g.message_id, g.first_message_id, g.goal, g.goal_key, roadmap_index.rank
+FROM roadmap_index JOIN roadmap_goals AS g ON g.id = roadmap_index.rowid
+WHERE roadmap_index MATCH :query AND g.language = :language
+ORDER BY roadmap_index.rank LIMIT :candidates
+""")
+
+
+async def find_roadmaps(
+    db: AsyncSession,
+    goal: str,
+    language: Optional[str] = None,
+    limit: int = 3
+) -> List[RoadmapMatch]:
+    """Roadmaps written for goals like this one (same language), best first."""
+    terms = goal_terms(goal)[:_MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    language = language or ENGLISH
+    key = _goal_key(language, terms)
+
+    matches = []
+    wanted = set(terms)
+
+    def add(message_id, first_message_id, match_goal, goal_key, rank):
+        found = set(_key_terms(goal_key))
+        matches.append(RoadmapMatch(
+            message_id, first_message_id, match_goal,
+            overlap=len(wanted & found) / len(wanted), exact=found == wanted, bm25=rank,
+        ))
+
+    # 1. The same goal: one lookup in the goal_key index
+    same = await db.scalar(select(RoadmapGoal).where(RoadmapGoal.goal_key == key))
+    if same is not None:
+        add(same.message_id, same.first_message_id, same.goal, key, 0.0)
+        if limit == 1:
+            return matches
+
+    # 2. Goals with ALL the words (few, cheap to rank). If there are none,
+    # 3. the goal without one of its words, then goals with all words but one,
+    # dropping words from the end first (career words come early, places and
+    # names later). Matching ANY word would rank huge lists for words like
+    # "engineer", and such goals rarely reach ROADMAP_MIN_OVERLAP anyway.
+    fewer = [terms[:n] + terms[n + 1:] for n in reversed(range(len(terms)))] if len(terms) > 1 else []
+    steps = [("fts", terms)] + [("key", words) for words in fewer] + [("fts", words) for words in fewer]
+    for step, words in steps:
+        if step == "key":
+            shorter = await db.scalar(select(RoadmapGoal).where(RoadmapGoal.goal_key == _goal_key(language, words)))
+            if shorter is not None:
+                add(shorter.message_id, shorter.first_message_id, shorter.goal, shorter.goal_key, 0.0)
+        else:
+            result = await db.execute(_SEARCH_SQL, {
+                "query": " AND ".join(f'"{term}"' for term in words),
+                "language": language, "candidates": _CANDIDATES,
+            })
+            for row in result:
+                if row.goal_key != key:
+                    add(*row)
+        if len(matches) >= limit:
+            break
+
+    # Most goal words in common first, then prefer replies to the goal itself, then BM25
+    matches.sort(key=lambda m: (-m.overlap, not m.exact, m.first_message_id is None, m.bm25))
+    return matches[:limit]
+
+
+def _trim(plan: str, max_chars: int) -> str:
+    """The start of a plan, cut at a line break."""
+    if len(plan) <= max_chars:
+        return plan
+    cut = plan.rfind("\n", 0, max_chars)
+    return plan[:cut if cut > 0 else max_chars].rstrip() + "\n..."
+
+
+# How often roadmap_hint() found something (see /health and /metrics)
+_hint_counts = {"reused": 0, "exemplar": 0, "none": 0}
+
+
+async def roadmap_hint(
+    db: AsyncSession,
+    session_id: str,
+    message: str,
+    language: Optional[str],
+    first_turn: bool,
+    allow_reuse: bool = True
+) -> RoadmapHint:
+    """
+    What the index can contribute to this chat turn.
+
+    Only looks for a roadmap on the first turn of a session (the goal) or
+    when the user asks for the plan. allow_reuse=False (use_cache=False)
+    never returns a stored reply.
+    """
+    mode = settings.ROADMAP_REUSE
+    if mode == "off" or not (first_turn or wants_roadmap(message)):
+        return RoadmapHint()
+
+    goal = message
+    if not first_turn:
+        session = await db.get(ChatSession, session_id)
+        goal = (session.career_goal if session is not None else None) or message
+
+    matches = await find_roadmaps(db, goal, language, limit=1)
+    if not matches or matches[0].overlap < settings.ROADMAP_MIN_OVERLAP:
+        _hint_counts["none"] += 1
+        return RoadmapHint()
+    best = matches[0]
+
+    # Prefer the reply to the goal itself over a plan from later in a chat
+    plan = await db.scalar(
+        select(ChatHistory.content).where(ChatHistory.id == (best.first_message_id or best.message_id))
+    )
+    if not plan:
+        # The message is gone (archiving keeps indexed ones; deleted by hand?): skip the entry
+        _hint_counts["none"] += 1
+        return RoadmapHint()
+
+    if mode == "reuse" and allow_reuse and first_turn and best.exact and best.first_message_id:
+        _hint_counts["reused"] += 1
+        return RoadmapHint(reply=plan)
+
+    _hint_counts["exemplar"] += 1
+    return RoadmapHint(
+        exemplar=_trim(plan, settings.ROADMAP_EXEMPLAR_CHARS),
+        max_tokens=settings.ROADMAP_EXEMPLAR_MAX_TOKENS,
+    )
+
+
+def stats() -> dict:
+    return {"mode": settings.ROADMAP_REUSE, **_hint_counts}
@@ -0,0 +1,464 @@
+"""
+Session Archive - Moves idle chats out of chat_history, and back when needed.
+
+chat_history keeps every message as a plain Text row, forever. Most sessions
+are never opened again after a few days, but their rows (and index entries)
+stay in the hot table and in every backup. Here:
+
+- archive_idle_sessions() moves all rows of sessions idle for
+  ARCHIVE_AFTER_DAYS (opt-in, 0 = off) into ONE row of session_archive
+  each: the messages as
+  JSON, zlib-compressed with a preset dictionary shared by all sessions.
+  Chat messages are short and similar ("Month 1: ...", the coach's stock
+  phrases), so a dictionary trained on earlier messages compresses them far
+  better than zlib alone could from one session's text.
+- restore_session() puts the rows back (same ids) - called by
+  history_service whenever it reads a session's history from the database
+  and the session has an archive, so chat works as if nothing happened.
+- Reads that don't need the rows back use the blob directly: PDF export of
+  the last reply (session_service) and the bulk export (session_transfer).
+- Roadmaps filed in the roadmap index (roadmap_goals points at their rows,
+  services/roadmap_index.py) stay in chat_history, so the index never
+  points at a message that is gone. One per distinct goal: little space.
+- incremental_vacuum() gives the freed pages back to the file system a
+  bounded number at a time (the database uses auto_vacuum=INCREMENTAL,
+  see database.py), so the file really shrinks without a long VACUUM lock.
+- run_archiver() does archive + vacuum in the background every
+  ARCHIVE_INTERVAL_SECONDS (persistent mode).
+
+Ids stay unique: SQLite hands out max(id) + 1 for new rows, so the session
+that holds the newest message is never archived - the ids of archived rows
+can't be handed out again, and restored rows (and roadmap index entries
+pointing at them) keep their ids.
+
+A session can end up with both live rows and an archive (its indexed
+roadmaps stay, or a worker answered from its in-memory history buffer).
+Archiving it again merges both. Restoring it puts everything back, and
+history_service restores before it reads, so a chat never continues on only
+the live part.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import re
+import time
+import zlib
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import SessionLocal, engine
+from ..models import ArchiveDictionary, ArchivedSession, ChatHistory, ChatSession, RoadmapGoal
+from .chat_writer import _write_lock
+
+logger = logging.getLogger(__name__)
+
+# zlib uses at most 32 KB of preset dictionary (its whole window)
+DICTIONARY_BYTES = 32 * 1024
+# Messages the dictionary is trained on
+_DICTIONARY_SAMPLE_MESSAGES = 2000
+
+# One archived message: [id, role, content, timestamp, idempotency_key]
+_Row = Tuple[int, str, str, Optional[datetime], Optional[str]]
+
+# Dictionaries never change once written, so each worker keeps the ones it used
+_dictionaries: Dict[int, bytes] = {}
+
+_counts = {"archived_sessions": 0, "archived_messages": 0, "raw_bytes": 0, "stored_bytes": 0,
+           "restored": 0, "restore_ms": 0.0, "vacuumed_pages": 0}
+
+
+# ------------------ ENCODING ------------------
+
+def encode_messages(rows: Iterable[_Row]) -> bytes:
+    """The messages of one session as compact JSON (oldest first)."""
+    return json.dumps(
+        [[id_, role, content, ts.isoformat() if ts is not None else None, key]
+         for id_, role, content, ts, key in rows],
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def decode_messages(raw: bytes) -> List[_Row]:
+    return [
+        (id_, role, content, datetime.fromisoformat(ts) if ts is not None else None, key)
+        for id_, role, content, ts, key in json.loads(raw)
+    ]
+
+
+def compress(raw: bytes, dictionary: Optional[bytes], level: Optional[int] = None) -> bytes:
+    level = settings.ARCHIVE_ZLIB_LEVEL if level is None else level
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 9)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def decompress(data: bytes, dictionary: Optional[bytes]) -> bytes:
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS, dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?:])\s+|\n+")
+
+
+def build_dictionary(texts: Iterable[str], size: int = DICTIONARY_BYTES) -> bytes:
+    """
+    A zlib preset dictionary from sample messages.
+
+    zlib can't train one (zstd can), but a preset dictionary is just text
+    that comes "before" the data: the sentences and lines that appear in
+    many different messages, the most valuable last (the end of the
+    dictionary stays in zlib's 32 KB window longest), and the JSON framing
+    of encode_messages() at the very end.
+    """
+    frequency: Counter = Counter()
+    for content in texts:
+        pieces = {piece.strip() for piece in _SENTENCE_END.split(content)}
+        frequency.update(piece for piece in pieces if len(piece) >= 12)
+
+    chosen, used = [], 0
+    # Worth = bytes saved per message it appears in; seen once = no help
+    for piece, count in sorted(frequency.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2:
+            break
+        encoded = piece.encode("utf-8")
+        if used + len(encoded) + 1 > size - 256:
+            continue
+        chosen.append(encoded)
+        used += len(encoded) + 1
+
+    framing = encode_messages([(1, "user", "", datetime(2025, 1, 1), None),
+                               (2, "assistant", "", datetime(2025, 1, 1), None)])
+    return b"\n".join(reversed(chosen)) + b"\n" + framing
+
+
+async def _dictionary(db, dictionary_id: Optional[int]) -> Optional[bytes]:
+    if dictionary_id is None:
+        return None
+    data = _dictionaries.get(dictionary_id)
+    if data is None:
+        data = (await db.execute(
+            select(ArchiveDictionary.data).where(ArchiveDictionary.id == dictionary_id)
+        )).scalar_one()
+        _dictionaries[dictionary_id] = data
+    return data
+
+
+async def decode_archive(db, dictionary_id: Optional[int], data: bytes) -> List[_Row]:
+    """The messages of one session_archive row (db: session or connection)."""
+    return decode_messages(decompress(data, await _dictionary(db, dictionary_id)))
+
+
+async def _current_dictionary(new: bool = False) -> Tuple[Optional[int], Optional[bytes]]:
+    """The newest dictionary; trained on recent messages (and saved) if there is none yet, or new=True."""
+    async with SessionLocal() as db:
+        if not new:
+            dictionary_id = (await db.execute(select(func.max(ArchiveDictionary.id)))).scalar()
+            if dictionary_id is not None:
+                return dictionary_id, await _dictionary(db, dictionary_id)
+
+        sample = (await db.execute(
+            select(ChatHistory.content).order_by(ChatHistory.id.desc()).limit(_DICTIONARY_SAMPLE_MESSAGES)
+        )).scalars().all()
+        if len(sample) < 10:
+            return None, None   # too little to learn from: plain zlib
+        data = build_dictionary(sample)
+        async with _write_lock:
+            result = await db.execute(insert(ArchiveDictionary).values(data=data, created_at=datetime.utcnow()))
+            dictionary_id = result.inserted_primary_key[0]
+            await db.commit()
+    _dictionaries[dictionary_id] = data
+    logger.info(f"Trained archive dictionary {dictionary_id} ({len(data)} bytes) on {len(sample)} messages")
+    return dictionary_id, data
+
+
+# ------------------ ARCHIVE ------------------
+
+# Idle sessions that still have rows to archive in chat_history, in session_id order
+_CANDIDATES_SQL = text("""
+SELECT s.session_id FROM sessions s
+WHERE s.session_id > :after AND s.last_activity_at < :cutoff
+  AND EXISTS (SELECT 1 FROM chat_history h WHERE h.session_id = s.session_id
+              AND h.id NOT IN (SELECT message_id FROM roadmap_goals)
+              AND h.id NOT IN (SELECT first_message_id FROM roadmap_goals WHERE first_message_id IS NOT NULL))
+ORDER BY s.session_id
+LIMIT :limit
+""")
+
+
+def _indexed_roadmaps():
+    """Ids of the chat_history rows the roadmap index points at (they are never archived)."""
+    return select(RoadmapGoal.message_id).union(
+        select(RoadmapGoal.first_message_id).where(RoadmapGoal.first_message_id.is_not(None))
+    )
+
+
+def _move_rows_statement(session_ids: List[str], cutoff: datetime):
+    """
+    DELETE ... RETURNING the rows of the sessions to archive, in one statement.
+
+    Rechecks idleness (a turn may have come in since the candidates were
+    picked) and leaves out the session holding the newest message and the
+    roadmaps filed in the roadmap index (see above).
+    """
+    newest_session = (
+        select(ChatHistory.session_id)
+        .where(ChatHistory.id == select(func.max(ChatHistory.id)).scalar_subquery())
+        .scalar_subquery()
+    )
+    still_idle = select(ChatSession.session_id).where(
+        ChatSession.session_id.in_(session_ids), ChatSession.last_activity_at < cutoff
+    )
+    return (
+        delete(ChatHistory)
+        .where(ChatHistory.session_id.in_(still_idle), ChatHistory.session_id != newest_session,
+               ChatHistory.id.not_in(_indexed_roadmaps()))
+        .returning(ChatHistory.id, ChatHistory.session_id, ChatHistory.role, ChatHistory.content,
+                   ChatHistory.timestamp, ChatHistory.idempotency_key)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _archive_chunk(session_ids: List[str], cutoff: datetime,
+                         dictionary_id: Optional[int], dictionary: Optional[bytes]) -> Dict[str, int]:
+    async with _write_lock, SessionLocal() as db:
+        moved: Dict[str, List[_Row]] = {}
+        for id_, session_id, role, content, ts, key in (await db.execute(_move_rows_statement(session_ids, cutoff))):
+            moved.setdefault(session_id, []).append((id_, role, content, ts, key))
+
+        # Sessions archived before (and active again since): merge with the old blob
+        earlier = await db.execute(
+            select(ArchivedSession.session_id, ArchivedSession.dictionary_id, ArchivedSession.data)
+            .where(ArchivedSession.session_id.in_(list(moved)))
+        )
+        for session_id, old_dictionary_id, data in earlier.all():
+            known = {row[0] for row in moved[session_id]}
+            moved[session_id].extend(
+                row for row in await decode_archive(db, old_dictionary_id, data) if row[0] not in known
+            )
+
+        report = {"sessions": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+        rows = []
+        now = datetime.utcnow()
+        for session_id, messages in moved.items():
+            messages.sort(key=lambda row: (row[3] or datetime.min, row[0]))
+            raw = encode_messages(messages)
+            data = compress(raw, dictionary)
+            rows.append({"session_id": session_id, "dictionary_id": dictionary_id, "messages": len(messages),
+                         "raw_bytes": len(raw), "data": data, "archived_at": now})
+            report["sessions"] += 1
+            report["messages"] += len(messages)
+            report["raw_bytes"] += len(raw)
+            report["stored_bytes"] += len(data)
+        if rows:
+            stmt = sqlite_insert(ArchivedSession)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[ArchivedSession.session_id],
+                set_={column: stmt.excluded[column]
+                      for column in ("dictionary_id", "messages", "raw_bytes", "data", "archived_at")},
+            ), rows)
+        await db.commit()
+    return report
+
+
+async def archive_idle_sessions(
+    idle_for: Optional[timedelta] = None,
+    chunk_sessions: Optional[int] = None,
+    max_sessions: Optional[int] = None,
+    new_dictionary: bool = False
+) -> dict:
+    """
+    Archive every session idle for longer than `idle_for` (default
+    ARCHIVE_AFTER_DAYS; nothing happens when that is 0 and no `idle_for` is given).
+
+    One transaction per `chunk_sessions` sessions, so chat writes only ever
+    wait for one chunk. new_dictionary=True trains a fresh dictionary from
+    the current messages first (older archives keep theirs).
+    """
+    total = {"sessions": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+    if idle_for is None:
+        if settings.ARCHIVE_AFTER_DAYS <= 0:
+            return total
+        idle_for = timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    chunk_sessions = chunk_sessions or settings.ARCHIVE_CHUNK_SESSIONS
+    cutoff = datetime.utcnow() - idle_for
+    dictionary_id = dictionary = None
+
+    after = ""
+    while max_sessions is None or total["sessions"] < max_sessions:
+        limit = chunk_sessions if max_sessions is None else min(chunk_sessions, max_sessions - total["sessions"])
+        async with SessionLocal() as db:
+            session_ids = (await db.execute(
+                _CANDIDATES_SQL, {"after": after, "cutoff": cutoff, "limit": limit}
+            )).scalars().all()
+        if not session_ids:
+            break
+        after = session_ids[-1]
+        if dictionary_id is None:
+            dictionary_id, dictionary = await _current_dictionary(new=new_dictionary)
+        report = await _archive_chunk(list(session_ids), cutoff, dictionary_id, dictionary)
+        for name, value in report.items():
+            total[name] += value
+
+    _counts["archived_sessions"] += total["sessions"]
+    _counts["archived_messages"] += total["messages"]
+    _counts["raw_bytes"] += total["raw_bytes"]
+    _counts["stored_bytes"] += total["stored_bytes"]
+    if total["sessions"]:
+        logger.info(
+            f"Archived {total['sessions']} idle sessions ({total['messages']} messages, "
+            f"{total['raw_bytes']} -> {total['stored_bytes']} bytes)"
+        )
+    return total
+
+
+# ------------------ RESTORE / READ ------------------
+
+async def archived_among(db, session_ids: Iterable[str]) -> List[str]:
+    """Which of these sessions are archived (db: session or connection)."""
+    session_ids = list(session_ids)
+    if not session_ids:
+        return []
+    result = await db.execute(
+        select(ArchivedSession.session_id).where(ArchivedSession.session_id.in_(session_ids))
+    )
+    return list(result.scalars().all())
+
+
+async def restore_session(db: AsyncSession, session_id: str) -> bool:
+    """
+    Put an archived session's messages back into chat_history (and commit).
+
+    Returns False (after one primary-key lookup) if it isn't archived.
+    db: session or connection, with no transaction of its own going on.
+    """
+    archived = await db.scalar(select(ArchivedSession.session_id).where(ArchivedSession.session_id == session_id))
+    if archived is None:
+        return False
+
+    begin = time.perf_counter()
+    async with _write_lock:
+        row = (await db.execute(
+            delete(ArchivedSession).where(ArchivedSession.session_id == session_id)
+            .returning(ArchivedSession.dictionary_id, ArchivedSession.data)
+            .execution_options(synchronize_session=False)
+        )).first()
+        if row is None:
+            await db.commit()
+            return False   # restored meanwhile by another request
+        messages = await decode_archive(db, row[0], row[1])
+        # Rows saved since (same idempotency key) are kept, the archived copy skipped
+        await db.execute(sqlite_insert(ChatHistory).on_conflict_do_nothing(), [
+            {"id": id_, "session_id": session_id, "role": role, "content": content,
+             "timestamp": ts or datetime.utcnow(), "idempotency_key": key}
+            for id_, role, content, ts, key in messages
+        ])
+        await db.commit()
+
+    _counts["restored"] += 1
+    _counts["restore_ms"] += (time.perf_counter() - begin) * 1000
+    logger.info(f"Restored archived session {session_id} ({len(messages)} messages)")
+    return True
+
+
+async def archived_replies(db: AsyncSession, session_ids: List[str]) -> Dict[str, str]:
+    """The last assistant message of each archived session among `session_ids` (read-only)."""
+    if not session_ids:
+        return {}
+    result = await db.execute(
+        select(ArchivedSession.session_id, ArchivedSession.dictionary_id, ArchivedSession.data)
+        .where(ArchivedSession.session_id.in_(session_ids))
+    )
+    replies = {}
+    for session_id, dictionary_id, data in result.all():
+        for _, role, content, _, _ in reversed(await decode_archive(db, dictionary_id, data)):
+            if role.lower() == "assistant":
+                replies[session_id] = content
+                break
+    return replies
+
+
+# ------------------ VACUUM ------------------
+
+async def incremental_vacuum(pages: Optional[int] = None) -> int:
+    """
+    Give up to `pages` free pages back to the file system (0 = all). Returns how many.
+
+    Only works on databases with auto_vacuum=INCREMENTAL (new ones get it in
+    init_db; an older file needs one full_vacuum(): `python -m app.cli archive --full-vacuum`).
+    """
+    pages = settings.ARCHIVE_VACUUM_PAGES if pages is None else pages
+    async with _write_lock, engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        before = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        # Frees one page per step, and only executescript() steps it to the end
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({max(0, int(pages))})")
+        after = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+    freed = max(0, before - after)
+    _counts["vacuumed_pages"] += freed
+    return freed
+
+
+async def full_vacuum() -> None:
+    """VACUUM the whole file once (switches an older database to auto_vacuum=INCREMENTAL; slow)."""
+    async with _write_lock, engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.exec_driver_sql("VACUUM")
+
+
+async def storage_report() -> dict:
+    """Archived vs. live data and the database file's pages (reads the whole archive index)."""
+    async with SessionLocal() as db:
+        archived = (await db.execute(select(
+            func.count(), func.coalesce(func.sum(ArchivedSession.messages), 0),
+            func.coalesce(func.sum(ArchivedSession.raw_bytes), 0),
+            func.coalesce(func.sum(func.length(ArchivedSession.data)), 0),
+        ))).one()
+        live = (await db.execute(select(func.count(), func.count(func.distinct(ChatHistory.session_id))))).one()
+        pragmas = {name: (await db.execute(text(f"PRAGMA {name}"))).scalar()
+                   for name in ("page_size", "page_count", "freelist_count", "auto_vacuum")}
+    return {
+        "archived_sessions": archived[0], "archived_messages": archived[1],
+        "archived_raw_bytes": archived[2], "archived_stored_bytes": archived[3],
+        "live_messages": live[0], "live_sessions": live[1],
+        "file_bytes": pragmas["page_size"] * pragmas["page_count"],
+        "free_bytes": pragmas["page_size"] * pragmas["freelist_count"],
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(pragmas["auto_vacuum"]),
+    }
+
+
+# ------------------ BACKGROUND JOB ------------------
+
+async def run_archiver(interval_seconds: float) -> None:
+    """Archive idle sessions and vacuum a little, every `interval_seconds`, until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await archive_idle_sessions()
+            freed = await incremental_vacuum()
+            if freed:
+                logger.info(f"Incremental vacuum freed {freed} pages")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # e.g. another worker archived the same sessions at the same time
+            logger.exception("Session archival failed (will try again next time)")
+
+
+def stats() -> dict:
+    restored = _counts["restored"]
+    return {
+        **_counts,
+        "restore_ms": round(_counts["restore_ms"], 1),
+        "restore_mean_ms": round(_counts["restore_ms"] / restored, 2) if restored else None,
+    }
@@ -0,0 +1,196 @@
+"""
+Session Service - Keeps the `sessions` table in sync with chat_history.
+
+Things like the career goal (first user message), the last AI reply, the
+number of turns and the language used to be recomputed by scanning all of
+chat_history. Now they live in one `sessions` row per session:
+
+- record_turn() updates that row in the SAME transaction that saves the
+  chat messages (an atomic upsert, so concurrent turns can't lose counts)
+- get_session_plan() fetches the goal + last AI reply in one query
+  (for an archived session the reply is read from its archive blob)
+- backfill_sessions() fills the table once for chats saved before it existed
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import engine
+from ..models import ChatHistory, ChatSession
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert_statement():
+    stmt = sqlite_insert(ChatSession)
+    # Existing session: keep goal + created_at, update everything else
+    return stmt.on_conflict_do_update(
+        index_elements=[ChatSession.session_id],
+        set_={
+            "language": func.coalesce(stmt.excluded.language, ChatSession.language),
+            "turn_count": ChatSession.turn_count + 1,
+            "last_assistant_message_id": stmt.excluded.last_assistant_message_id,
+            "last_activity_at": stmt.excluded.last_activity_at,
+        },
+    )
+
+
+def turn_params(
+    session_id: str,
+    user_message: str,
+    language: Optional[str],
+    assistant_message_id: int,
+    now: datetime
+) -> dict:
+    """Parameters of one turn for record_turns()."""
+    return {
+        "session_id": session_id,
+        "career_goal": user_message,
+        "language": language,
+        "turn_count": 1,
+        "last_assistant_message_id": assistant_message_id,
+        "created_at": now,
+        "last_activity_at": now,
+    }
+
+
+async def record_turns(db: AsyncSession, turns: List[dict]) -> None:
+    """
+    Create or update the session rows for finished turns (caller commits).
+
+    `turns` are turn_params() dicts, applied in order in one executemany.
+    """
+    if turns:
+        await db.execute(_upsert_statement(), turns)
+
+
+async def record_turn(
+    db: AsyncSession,
+    session_id: str,
+    user_message: str,
+    language: Optional[str],
+    assistant_message_id: int,
+    now: datetime
+) -> None:
+    """Create or update the session row for one finished turn (caller commits)."""
+    await record_turns(db, [turn_params(session_id, user_message, language, assistant_message_id, now)])
+
+
+async def get_session(db: AsyncSession, session_id: str) -> Optional[ChatSession]:
+    """The session row (primary-key lookup), or None."""
+    return await db.get(ChatSession, session_id)
+
+
+async def get_sessions(db: AsyncSession, session_ids: List[str]) -> Dict[str, ChatSession]:
+    """The session rows of many sessions in one query (unknown ids are missing)."""
+    if not session_ids:
+        return {}
+    result = await db.execute(select(ChatSession).where(ChatSession.session_id.in_(session_ids)))
+    return {session.session_id: session for session in result.scalars()}
+
+
+async def get_session_plan(
+    db: AsyncSession,
+    session_id: str
+) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """
+    (career goal, last AI reply) of a session, or None if the session is unknown.
+
+    One query: the session row by primary key, joined to its last AI message by id
+    (plus one for the archive if that message was archived).
+    """
+    result = await db.execute(
+        select(ChatSession.career_goal, ChatHistory.content)
+        .select_from(ChatSession)
+        .outerjoin(ChatHistory, ChatHistory.id == ChatSession.last_assistant_message_id)
+        .where(ChatSession.session_id == session_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    goal, reply = row
+    if reply is None:
+        reply = (await _archived_replies(db, [session_id])).get(session_id)
+    return goal, reply
+
+
+async def get_session_plans(
+    db: AsyncSession,
+    session_ids: Optional[List[str]] = None,
+    active_since: Optional[datetime] = None,
+    active_until: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    (session_id, career goal, last AI reply) of many sessions in one query.
+
+    Sessions are picked by id and/or by last activity in [active_since, active_until).
+    Unknown ids are simply missing from the result.
+    """
+    stmt = (
+        select(ChatSession.session_id, ChatSession.career_goal, ChatHistory.content)
+        .select_from(ChatSession)
+        .outerjoin(ChatHistory, ChatHistory.id == ChatSession.last_assistant_message_id)
+        .order_by(ChatSession.session_id)
+    )
+    if session_ids is not None:
+        stmt = stmt.where(ChatSession.session_id.in_(session_ids))
+    if active_since is not None:
+        stmt = stmt.where(ChatSession.last_activity_at >= active_since)
+    if active_until is not None:
+        stmt = stmt.where(ChatSession.last_activity_at < active_until)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    plans = [(row[0], row[1], row[2]) for row in await db.execute(stmt)]
+    archived = await _archived_replies(db, [session_id for session_id, _, reply in plans if reply is None])
+    return [(session_id, goal, reply if reply is not None else archived.get(session_id))
+            for session_id, goal, reply in plans]
+
+
+async def _archived_replies(db: AsyncSession, session_ids: List[str]) -> Dict[str, str]:
+    """Last AI replies of sessions whose messages were archived (their rows are gone)."""
+    # Imported here: session_archive -> chat_writer -> this module
+    from .session_archive import archived_replies
+    return await archived_replies(db, session_ids)
+
+
+# One-time fill for chats that were saved before the sessions table existed
+_BACKFILL_SQL = text("""
+INSERT OR IGNORE INTO sessions
+    (session_id, career_goal, language, turn_count,
+     last_assistant_message_id, created_at, last_activity_at)
+SELECT
+    h.session_id,
+    (SELECT u.content FROM chat_history u
+      WHERE u.session_id = h.session_id AND lower(u.role) = 'user'
+      ORDER BY u.timestamp, u.id LIMIT 1),
+    NULL,
+    SUM(CASE WHEN lower(h.role) = 'user' THEN 1 ELSE 0 END),
+    (SELECT a.id FROM chat_history a
+      WHERE a.session_id = h.session_id AND lower(a.role) = 'assistant'
+      ORDER BY a.timestamp DESC, a.id DESC LIMIT 1),
+    MIN(h.timestamp),
+    MAX(h.timestamp)
+FROM chat_history h
+GROUP BY h.session_id
+""")
+
+
+async def backfill_sessions() -> None:
+    """
+    Fill `sessions` from chat_history if it is still empty (runs at startup).
+
+    Only does real work the first time, on a database that already has chats.
+    """
+    async with engine.begin() as conn:
+        has_sessions = (await conn.execute(text("SELECT 1 FROM sessions LIMIT 1"))).first()
+        has_history = (await conn.execute(text("SELECT 1 FROM chat_history LIMIT 1"))).first()
+        if has_sessions or not has_history:
+            return
+        result = await conn.execute(_BACKFILL_SQL)
+        logger.info(f"Backfilled {result.rowcount} session rows from chat_history")
@@ -0,0 +1,498 @@
+"""
+Session Transfer - Bulk export / import of all chats as JSON lines.
+
+Used for analytics, backups and moving the data to another database.
+The format is one JSON object per line (NDJSON, optionally gzip-compressed):
+
+    {"format": "career-coach-sessions", "version": 1, "exported_at": "..."}
+    {"type": "session", "session_id": "abc", "language": "en", "created_at": "..."}
+    {"type": "message", "session_id": "abc", "role": "user", "content": "...",
+     "timestamp": "...", "idempotency_key": "..."}
+    ...
+
+Each session line comes right before that session's messages (oldest first).
+Archived sessions (services/session_archive.py) come after the others, read
+straight from their blobs. Database ids are not exported: the importing
+database assigns its own.
+
+Memory stays the same no matter how big chat_history is:
+
+- export reads through ONE server-side cursor, EXPORT_CHUNK_ROWS rows per
+  fetch, and yields each chunk as soon as it is encoded (and compressed)
+- import parses the incoming bytes line by line and writes IMPORT_BATCH_ROWS
+  rows per executemany + commit. The sessions it touched are remembered in
+  a TEMP table (not a Python set), and their `sessions` rows are rebuilt
+  from chat_history at the end, a chunk of sessions per transaction.
+  Archived sessions that get new messages are restored first.
+
+Messages that have an idempotency key are never imported twice (the unique
+index skips them). Messages without a key are imported again if the same
+file is imported twice.
+"""
+
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+import json
+import logging
+import zlib
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..config import settings
+from ..database import engine
+from ..models import ArchivedSession, ChatHistory, ChatSession
+from .chat_writer import _write_lock
+from .history_service import history_buffer
+from .session_archive import archived_among, decode_archive, restore_session
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "career-coach-sessions"
+FORMAT_VERSION = 1
+
+# A line longer than this is not one of ours (chat messages are a few KB)
+MAX_LINE_BYTES = 8 * 1024 * 1024
+
+# Archived sessions decoded per exported chunk
+_EXPORT_CHUNK_ARCHIVES = 50
+
+# Sessions whose `sessions` row is rebuilt per transaction after an import
+_REBUILD_CHUNK_SESSIONS = 2000
+
+# How many bad lines are reported back (all of them are counted)
+_MAX_REPORTED_ERRORS = 20
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_GUNZIP_PIECE_BYTES = 256 * 1024
+
+
+class ImportFormatError(ValueError):
+    """The file is not an export of this app (wrong header or unreadable data)."""
+
+
+# ------------------ EXPORT ------------------
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """A time as naive UTC, like the database stores them (times with an offset are converted)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+async def export_lines(
+    session_ids: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    chunk_rows: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    The export as NDJSON, one bytes chunk per EXPORT_CHUNK_ROWS messages.
+
+    session_ids: only these sessions. since: only messages at or after this
+    time (with an offset, e.g. "...Z" from the query string, it is converted
+    to UTC first). Rows come in (session_id, timestamp, id) order, straight
+    off the index.
+    """
+    chunk_rows = chunk_rows or settings.EXPORT_CHUNK_ROWS
+    if since is not None:
+        since = _utc_naive(since)
+
+    stmt = (
+        select(
+            ChatHistory.session_id, ChatHistory.role, ChatHistory.content,
+            ChatHistory.timestamp, ChatHistory.idempotency_key,
+            ChatSession.language, ChatSession.created_at,
+        )
+        .select_from(ChatHistory)
+        .outerjoin(ChatSession, ChatSession.session_id == ChatHistory.session_id)
+        .order_by(ChatHistory.session_id, ChatHistory.timestamp, ChatHistory.id)
+        .execution_options(yield_per=chunk_rows)
+    )
+    if session_ids:
+        stmt = stmt.where(ChatHistory.session_id.in_(session_ids))
+    if since is not None:
+        stmt = stmt.where(ChatHistory.timestamp >= since)
+
+    header = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "exported_at": _iso(datetime.utcnow())}
+    yield (_dumps(header) + "\n").encode("utf-8")
+
+    archived = (
+        select(ArchivedSession.session_id, ArchivedSession.dictionary_id, ArchivedSession.data,
+               ChatSession.language, ChatSession.created_at)
+        .outerjoin(ChatSession, ChatSession.session_id == ArchivedSession.session_id)
+        .order_by(ArchivedSession.session_id)
+        .execution_options(yield_per=_EXPORT_CHUNK_ARCHIVES)
+    )
+    if session_ids:
+        archived = archived.where(ArchivedSession.session_id.in_(session_ids))
+
+    def session_line(session_id, language, created_at) -> str:
+        return _dumps({
+            "type": "session",
+            "session_id": session_id,
+            "language": language,
+            "created_at": _iso(created_at),
+        })
+
+    def message_line(session_id, role, content, timestamp, key) -> str:
+        return _dumps({
+            "type": "message",
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "timestamp": _iso(timestamp),
+            "idempotency_key": key,
+        })
+
+    current_session = None
+    # One read connection (and one snapshot) for the whole export
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt)
+        async for rows in result.partitions(chunk_rows):
+            lines = []
+            for session_id, role, content, timestamp, key, language, created_at in rows:
+                if session_id != current_session:
+                    current_session = session_id
+                    lines.append(session_line(session_id, language, created_at))
+                lines.append(message_line(session_id, role, content, timestamp, key))
+            lines.append("")
+            yield "\n".join(lines).encode("utf-8")
+
+        result = await conn.stream(archived)
+        async for rows in result.partitions(_EXPORT_CHUNK_ARCHIVES):
+            lines = []
+            for session_id, dictionary_id, data, language, created_at in rows:
+                messages = [
+                    (role, content, timestamp, key)
+                    for _, role, content, timestamp, key in await decode_archive(conn, dictionary_id, data)
+                    if since is None or (timestamp is not None and timestamp >= since)
+                ]
+                if messages:
+                    lines.append(session_line(session_id, language, created_at))
+                    lines.extend(message_line(session_id, *message) for message in messages)
+            if lines:
+                lines.append("")
+                yield "\n".join(lines).encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Compress a stream of chunks into one gzip stream, chunk by chunk."""
+    level = settings.EXPORT_GZIP_LEVEL if level is None else level
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)   # 16+ = gzip header
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_sessions(
+    compress: bool = False,
+    session_ids: Optional[List[str]] = None,
+    since: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """The export as bytes chunks: NDJSON, or gzip-compressed JSONL with compress=True."""
+    lines = export_lines(session_ids=session_ids, since=since)
+    return gzip_chunks(lines) if compress else lines
+
+
+# ------------------ IMPORT ------------------
+
+def _gunzip(decompressor, chunk: bytes):
+    """
+    Un-gzip one incoming chunk, at most _GUNZIP_PIECE_BYTES of output at a time
+    (well-compressed chat text expands 30x+; a gzip bomb much more).
+
+    Yields (decompressor, piece): a new decompressor starts at the next gzip
+    member, so concatenated files (cat a.jsonl.gz b.jsonl.gz) work too.
+    """
+    full = False
+    while chunk or full:
+        try:
+            piece = decompressor.decompress(chunk, _GUNZIP_PIECE_BYTES)
+        except zlib.error as e:
+            raise ImportFormatError(f"Broken gzip data: {e}")
+        # A full piece may have more output waiting, even with no input left
+        full = len(piece) == _GUNZIP_PIECE_BYTES
+        if decompressor.eof:
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            full = False
+        else:
+            chunk = decompressor.unconsumed_tail
+        yield decompressor, piece
+
+
+async def _decoded_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split incoming bytes into lines, un-gzipping them if they start like gzip.
+
+    Only the current partial line (and one piece of un-gzipped data) is kept in memory.
+    """
+    decompressor = None
+    head = b""   # first bytes, until we know whether it's gzip (then None)
+    pending = b""
+
+    def split(data: bytes) -> List[bytes]:
+        nonlocal pending
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        if len(pending) > MAX_LINE_BYTES:
+            raise ImportFormatError(f"A line is longer than {MAX_LINE_BYTES} bytes.")
+        return lines
+
+    async for chunk in chunks:
+        if head is not None:
+            head += chunk
+            if len(head) < len(_GZIP_MAGIC):
+                continue
+            chunk, head = head, None
+            if chunk.startswith(_GZIP_MAGIC):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if not chunk:
+            continue
+        if decompressor is None:
+            for line in split(chunk):
+                yield line
+            continue
+        for decompressor, piece in _gunzip(decompressor, chunk):
+            for line in split(piece):
+                yield line
+
+    if head:
+        pending = head   # a 1-byte body
+    if pending:
+        yield pending
+
+
+def _parse_time(value) -> Optional[datetime]:
+    """An ISO timestamp as naive UTC, like the database stores them (times with an offset are converted)."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO string")
+    return _utc_naive(datetime.fromisoformat(value))
+
+
+def _message_row(record: dict) -> dict:
+    """A chat_history row from a message line (ValueError if a field is wrong)."""
+    session_id, role, content = record.get("session_id"), record.get("role"), record.get("content")
+    key = record.get("idempotency_key")
+    if not isinstance(session_id, str) or not session_id or len(session_id) > 100:
+        raise ValueError("session_id must be a non-empty string of at most 100 characters")
+    if not isinstance(role, str) or not role or len(role) > 20:
+        raise ValueError("role must be a non-empty string of at most 20 characters")
+    if not isinstance(content, str):
+        raise ValueError("content must be a string")
+    if key is not None and (not isinstance(key, str) or len(key) > 64):
+        raise ValueError("idempotency_key must be a string of at most 64 characters")
+    return {
+        "session_id": session_id,
+        "role": role,
+        "content": content,
+        "timestamp": _parse_time(record.get("timestamp")) or datetime.utcnow(),
+        "idempotency_key": key,
+    }
+
+
+def _session_row(record: dict) -> dict:
+    """A sessions row (metadata only) from a session line."""
+    session_id, language = record.get("session_id"), record.get("language")
+    if not isinstance(session_id, str) or not session_id or len(session_id) > 100:
+        raise ValueError("session_id must be a non-empty string of at most 100 characters")
+    if language is not None and (not isinstance(language, str) or len(language) > 10):
+        raise ValueError("language must be a string of at most 10 characters")
+    created_at = _parse_time(record.get("created_at")) or datetime.utcnow()
+    return {
+        "session_id": session_id,
+        "language": language,
+        "turn_count": 0,
+        "created_at": created_at,
+        "last_activity_at": created_at,
+    }
+
+
+def _insert_messages_statement():
+    # Same (session, key, role) already saved: skip it (unique index)
+    return sqlite_insert(ChatHistory).on_conflict_do_nothing()
+
+
+def _insert_sessions_statement():
+    stmt = sqlite_insert(ChatSession)
+    # Existing session: only fill in the language if it had none
+    return stmt.on_conflict_do_update(
+        index_elements=[ChatSession.session_id],
+        set_={"language": func.coalesce(ChatSession.language, stmt.excluded.language)},
+    )
+
+
+# Every session that was imported into, for the rebuild at the end
+_CREATE_TOUCHED = text("CREATE TEMP TABLE IF NOT EXISTS import_sessions (session_id TEXT PRIMARY KEY)")
+_ADD_TOUCHED = text("INSERT OR IGNORE INTO temp.import_sessions (session_id) VALUES (:session_id)")
+_DROP_TOUCHED = text("DROP TABLE IF EXISTS temp.import_sessions")
+
+# Rebuild the sessions rows of a chunk of imported sessions from chat_history
+# (same numbers as backfill_sessions(), but kept: language, earlier created_at)
+_ENSURE_SESSIONS_SQL = text("""
+INSERT OR IGNORE INTO sessions (session_id, turn_count, created_at, last_activity_at)
+SELECT session_id, 0, :now, :now FROM temp.import_sessions
+WHERE rowid > :after AND rowid <= :upto
+""")
+
+_REBUILD_SESSIONS_SQL = text("""
+UPDATE sessions SET
+    career_goal = COALESCE(career_goal,
+        (SELECT u.content FROM chat_history u
+          WHERE u.session_id = sessions.session_id AND lower(u.role) = 'user'
+          ORDER BY u.timestamp, u.id LIMIT 1)),
+    turn_count =
+        (SELECT COUNT(*) FROM chat_history c
+          WHERE c.session_id = sessions.session_id AND lower(c.role) = 'user'),
+    last_assistant_message_id =
+        (SELECT a.id FROM chat_history a
+          WHERE a.session_id = sessions.session_id AND lower(a.role) = 'assistant'
+          ORDER BY a.timestamp DESC, a.id DESC LIMIT 1),
+    created_at = MIN(created_at, COALESCE(
+        (SELECT MIN(f.timestamp) FROM chat_history f WHERE f.session_id = sessions.session_id),
+        created_at)),
+    last_activity_at = COALESCE(
+        (SELECT MAX(l.timestamp) FROM chat_history l WHERE l.session_id = sessions.session_id),
+        last_activity_at)
+WHERE session_id IN (
+    SELECT session_id FROM temp.import_sessions WHERE rowid > :after AND rowid <= :upto
+)
+""")
+
+
+async def _write_batch(conn, messages: List[dict], sessions: List[dict]) -> int:
+    """Insert one batch of lines and commit. Returns how many messages were new."""
+    touched = {row["session_id"] for row in messages} | {row["session_id"] for row in sessions}
+    # New messages of an archived session join its old ones in chat_history
+    for session_id in await archived_among(conn, touched):
+        await restore_session(conn, session_id)
+    async with _write_lock:
+        if sessions:
+            await conn.execute(_insert_sessions_statement(), sessions)
+        inserted = 0
+        if messages:
+            result = await conn.execute(_insert_messages_statement(), messages)
+            inserted = result.rowcount
+        await conn.execute(_ADD_TOUCHED, [{"session_id": session_id} for session_id in touched])
+        await conn.commit()
+    # Chats of these sessions must read the new messages from the database
+    for session_id in touched:
+        history_buffer.discard(session_id)
+    return inserted
+
+
+async def _rebuild_sessions(conn) -> int:
+    """Recompute the sessions rows of everything imported. Returns how many sessions."""
+    total = (await conn.execute(text("SELECT COALESCE(MAX(rowid), 0) FROM temp.import_sessions"))).scalar()
+    now = datetime.utcnow()
+    for after in range(0, total, _REBUILD_CHUNK_SESSIONS):
+        params = {"after": after, "upto": after + _REBUILD_CHUNK_SESSIONS, "now": now}
+        async with _write_lock:
+            await conn.execute(_ENSURE_SESSIONS_SQL, params)
+            await conn.execute(_REBUILD_SESSIONS_SQL, params)
+            await conn.commit()
+    return total
+
+
+async def import_sessions(chunks: AsyncIterator[bytes], batch_rows: Optional[int] = None) -> dict:
+    """
+    Import an export (NDJSON or gzip, as bytes chunks) into this database.
+
+    Every IMPORT_BATCH_ROWS lines are committed, so a failure part-way keeps
+    what was imported so far (importing the file again skips those messages
+    if they have idempotency keys). Raises ImportFormatError for a foreign
+    file (the first line must be the format header); bad lines are skipped,
+    counted and reported.
+    """
+    batch_rows = batch_rows or settings.IMPORT_BATCH_ROWS
+    report = {"lines": 0, "messages": 0, "imported": 0, "duplicates": 0,
+              "sessions": 0, "invalid": 0, "errors": []}
+    messages: List[dict] = []
+    sessions: List[dict] = []
+
+    def bad_line(number: int, reason: str) -> None:
+        report["invalid"] += 1
+        if len(report["errors"]) < _MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": number, "error": reason})
+
+    async def flush() -> None:
+        if messages or sessions:
+            report["imported"] += await _write_batch(conn, messages, sessions)
+            messages.clear()
+            sessions.clear()
+
+    async with engine.connect() as conn:
+        await conn.execute(_DROP_TOUCHED)
+        await conn.execute(_CREATE_TOUCHED)
+        await conn.commit()
+        try:
+            number = 0
+            header_seen = False
+            async for raw in _decoded_lines(chunks):
+                number += 1
+                if not raw.strip():
+                    continue
+                report["lines"] += 1
+                try:
+                    record = json.loads(raw)
+                except ValueError as e:
+                    if not header_seen:
+                        raise ImportFormatError("The file does not start with a JSON line.")
+                    bad_line(number, f"not JSON: {e}")
+                    continue
+                if not header_seen and (not isinstance(record, dict) or "format" not in record):
+                    raise ImportFormatError(f"The first line is not a {FORMAT_NAME!r} header.")
+                header_seen = True
+                if not isinstance(record, dict):
+                    bad_line(number, "not a JSON object")
+                    continue
+
+                if "format" in record:
+                    # Header: only our own format (any newer version is refused)
+                    if record["format"] != FORMAT_NAME or record.get("version") != FORMAT_VERSION:
+                        raise ImportFormatError(
+                            f"Unsupported export format {record.get('format')!r} "
+                            f"version {record.get('version')!r}."
+                        )
+                    continue
+
+                kind = record.get("type", "message")
+                try:
+                    if kind == "message":
+                        messages.append(_message_row(record))
+                        report["messages"] += 1
+                    elif kind == "session":
+                        sessions.append(_session_row(record))
+                    else:
+                        bad_line(number, f"unknown type {kind!r}")
+                except ValueError as e:
+                    bad_line(number, str(e))
+
+                if len(messages) + len(sessions) >= batch_rows:
+                    await flush()
+
+            await flush()
+            report["sessions"] = await _rebuild_sessions(conn)
+        finally:
+            await conn.execute(_DROP_TOUCHED)
+            await conn.commit()
+
+    report["duplicates"] = report["messages"] - report["imported"]
+    logger.info(
+        f"Imported {report['imported']} messages into {report['sessions']} sessions "
+        f"({report['duplicates']} duplicates, {report['invalid']} bad lines)"
+    )
+    return report
+
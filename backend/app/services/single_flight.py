@@ -0,0 +1,54 @@
+"""
+Single Flight - Runs identical concurrent calls only once.
+
+When a client retries or double-submits, the same work (an LLM call, a chat
+turn) starts twice at the same time. SingleFlight.do(key, fn) runs fn()
+for the first caller; everyone who asks for the same key while it is still
+running waits for that one result (or error) instead of starting their own.
+
+The key is forgotten as soon as the call finishes - this is NOT a cache.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """In-flight calls by key (one instance per kind of call)."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0      # calls that really ran
+        self.shared = 0     # callers that waited for someone else's call
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Result of fn(), shared with concurrent callers of the same key.
+
+        The call runs as its own task: if the first caller is cancelled (the
+        client went away) it still finishes for the others.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        self.calls += 1
+        task.add_done_callback(lambda finished: self._forget(key, finished))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the error as seen even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
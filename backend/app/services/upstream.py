@@ -0,0 +1,353 @@
+"""
+Upstream Guard - Protects the app (and Groq) when Groq is slow, limited or down.
+
+Before, any Groq error was an instant failure for the user, and under load
+Groq's 429 "rate limited" answers turned straight into errors. Every Groq
+call now goes through UpstreamGuard:
+
+- Queue with a deadline: requests wait up to LLM_QUEUE_DEADLINE_SECONDS for
+  a concurrency slot / rate-limit budget instead of failing right away
+- Token bucket: stays under LLM_RPM requests and LLM_TPM tokens per minute
+  (0 = no limit), and pauses everyone when Groq answers 429 + Retry-After
+- Retries: 429, 5xx, timeouts and connection errors are retried up to
+  LLM_MAX_RETRIES times with jittered exponential backoff
+- Circuit breaker: after LLM_BREAKER_FAILURES failures in a row, calls fail
+  immediately for LLM_BREAKER_RESET_SECONDS, then one trial call decides
+  whether Groq is back
+
+When a call can't be made in time, UpstreamUnavailable is raised; the
+endpoints answer 503 with a Retry-After header.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import logging
+import math
+import random
+import time
+
+from ..config import settings
+from .metrics import LLM_IN_FLIGHT, observe_phase
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailable(Exception):
+    """Groq can't be used right now; try again after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """Groq failed repeatedly - calls are refused without trying."""
+
+
+class UpstreamBusy(UpstreamUnavailable):
+    """No slot or rate-limit budget became free before the deadline."""
+
+
+def _retry_after_header(error: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header on a Groq error, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    """429, 5xx, timeouts and connection problems are worth another try."""
+    import groq   # already loaded by the client that raised the error
+
+    if isinstance(error, groq.APIConnectionError):   # includes timeouts
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute budget (0 = unlimited)."""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int, deadline: float) -> int:
+        """
+        Take one request and `tokens` tokens from the budget, waiting if needed.
+
+        The budget is reserved right away (it may go below zero) and the
+        caller sleeps until its turn, so callers are served in arrival order.
+        If that turn comes after the deadline, UpstreamBusy is raised at
+        once instead of waiting for nothing. Returns the tokens taken.
+        """
+        if self.tpm:
+            tokens = min(tokens, self.tpm)   # a single huge call must still fit
+        now = time.monotonic()
+        self._refill(now)
+
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+        if self.tpm and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+        wait = max(wait, self._paused_until - now)
+        if now + wait > deadline:
+            raise UpstreamBusy("Groq rate limit budget is used up", retry_after=wait)
+
+        if self.rpm:
+            self._requests -= 1
+        if self.tpm:
+            self._tokens -= tokens
+
+        # Sleep until our turn - longer if a 429 paused everyone meanwhile
+        while True:
+            wait = max(wait, self._paused_until - time.monotonic())
+            if wait <= 0:
+                return tokens
+            if time.monotonic() + wait > deadline:
+                self._give_back(tokens)
+                raise UpstreamBusy("Groq rate limit budget is used up", retry_after=wait)
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+            wait = 0.0
+
+    def _give_back(self, tokens: int) -> None:
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + 1)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + tokens)
+
+    def refund(self, reserved: int, used: Optional[int]) -> None:
+        """Give back tokens that were reserved but not used (usage is known after the call)."""
+        if self.tpm and used is not None and used < reserved:
+            self._tokens = min(self.tpm, self._tokens + reserved - used)
+
+    def pause(self, seconds: float) -> None:
+        """Groq said 429: nobody sends anything for `seconds`."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "waited_seconds": round(self.waited_seconds, 2),
+        }
+
+
+class CircuitBreaker:
+    """closed (normal) -> open (refuse everything) -> half-open (one trial call)."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen if calls are not allowed right now."""
+        if self.state == "closed":
+            return
+        remaining = self._opened_at + self.reset_seconds - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_running:
+            self._trial_running = True   # this call is the trial
+            return
+        self.rejected += 1
+        raise CircuitOpen("Groq is failing, not calling it for a while", retry_after=max(remaining, 1))
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._trial_running = False
+        if self.state != "closed":
+            logger.info("Groq is back, circuit breaker closed")
+        self.state = "closed"
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Groq failed {self._failures} time(s) in a row, circuit breaker opened")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """The trial call ended without telling us anything (e.g. cancelled)."""
+        self._trial_running = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class UpstreamGuard:
+    """Queue slot + rate limit + retries + circuit breaker, around one upstream."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        queue_deadline_seconds: float,
+        limiter: TokenBucketLimiter,
+        breaker: CircuitBreaker,
+        max_retries: int = 2,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 8.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_deadline_seconds = queue_deadline_seconds
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_retries = max(0, max_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.retries = 0
+        self.failures = 0
+        self.timed_out_in_queue = 0
+
+    def deadline(self) -> float:
+        """Latest time (monotonic) a new request may still be waiting."""
+        return time.monotonic() + self.queue_deadline_seconds
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, inside the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def reset(self) -> None:
+        """Forget the semaphore (call when the event loop is closed, e.g. on shutdown)."""
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def slot(self, deadline: float):
+        """Wait (until the deadline) for one of the max_concurrency upstream slots."""
+        semaphore = self._get_semaphore()
+        waiting_since = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timed_out_in_queue += 1
+            raise UpstreamBusy("Too many requests are waiting for the AI", retry_after=1)
+        observe_phase("llm_queue", time.perf_counter() - waiting_since)
+        LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            LLM_IN_FLIGHT.dec()
+            semaphore.release()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: random between 0 and base * 2^attempt (capped)."""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    async def call(self, fn: Callable[[], Awaitable[T]], tokens: int, deadline: float) -> T:
+        """
+        Run fn() (one Groq request) with rate limiting, retries and the breaker.
+
+        `tokens` is the estimated size of the call (prompt + max reply) for
+        the tokens-per-minute budget. Errors that are not worth retrying
+        (400, 401, ...) are raised unchanged; when Groq stays unavailable,
+        UpstreamUnavailable is raised. An attempt that fails gives its tokens
+        back to the budget (Groq didn't generate anything), so retries during
+        an overload don't use up the budget of unrelated requests.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                reserved = await self.limiter.acquire(tokens, deadline)
+            except UpstreamBusy:
+                self.breaker.release_trial()
+                raise
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.breaker.release_trial()
+                raise
+            except Exception as error:
+                self.limiter.refund(reserved, 0)
+                if not _is_retryable(error):
+                    self.breaker.release_trial()
+                    raise
+                retry_after = _retry_after_header(error)
+                if getattr(error, "status_code", None) == 429:
+                    # Rate limited is not "down": pause, but don't trip the breaker
+                    self.breaker.release_trial()
+                    self.limiter.pause(retry_after if retry_after is not None else self._backoff(attempt + 1))
+                else:
+                    self.breaker.record_failure()
+
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    self.failures += 1
+                    logger.warning(f"Groq call failed after {attempt + 1} attempt(s): {error!r}")
+                    raise UpstreamUnavailable(
+                        "AI is temporarily unavailable", retry_after=delay or 1
+                    ) from error
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timed_out_in_queue": self.timed_out_in_queue,
+            "limiter": self.limiter.stats(),
+            "breaker": self.breaker.stats(),
+        }
+
+
+# One guard for Groq per app worker process
+groq_guard = UpstreamGuard(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    queue_deadline_seconds=settings.LLM_QUEUE_DEADLINE_SECONDS,
+    limiter=TokenBucketLimiter(rpm=settings.LLM_RPM, tpm=settings.LLM_TPM),
+    breaker=CircuitBreaker(
+        failure_threshold=settings.LLM_BREAKER_FAILURES,
+        reset_seconds=settings.LLM_BREAKER_RESET_SECONDS,
+    ),
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_base_seconds=settings.LLM_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.LLM_RETRY_MAX_SECONDS,
+)
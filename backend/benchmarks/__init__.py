@@ -0,0 +1,3 @@
+# backend/benchmarks/__init__.py
+# Load tests and micro-benchmarks. Run them from the backend folder, e.g.:
+#   python -m benchmarks.bench_llm_concurrency
@@ -0,0 +1,219 @@
+"""
+Benchmark: archiving idle sessions - storage saved and rehydration latency.
+
+Fills a database with --sessions chats of --turns turns (synthetic coach
+conversations: stock phrases, "Month N:" plans, a few random details), marks
+them idle and runs the archiver (services/session_archive.py). Reports:
+
+- the database file before, after archiving, and after incremental VACUUM
+- compression of the archived messages: JSON as is, zlib alone, zlib with
+  the shared dictionary
+- how long a returning user waits: reading the recent history of an
+  archived session (restore + read) vs. of a live one (both uncached)
+
+--db runs the same on a COPY of a real database instead (every session is
+treated as idle), which gives the numbers for real chats.
+
+Run from the backend folder:
+    python -m benchmarks.bench_archive
+    python -m benchmarks.bench_archive --sessions 5000 --turns 10
+    python -m benchmarks.bench_archive --db career.db
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+CAREERS = ["pilot", "data scientist", "chef", "UX designer", "nurse", "game developer", "lawyer",
+           "teacher", "civil engineer", "photographer", "doctor", "architect", "musician", "accountant"]
+
+QUESTIONS = [
+    "I want to be a {career}.",
+    "My parents want me to become a {career}, but I am not sure.",
+    "Is {career} a good career in {year}?",
+    "How much does a {career} earn?",
+    "What if I fail?",
+    "I don't have money for a degree.",
+    "Give me the final roadmap.",
+    "But everyone says the market for {career}s is crowded.",
+    "I am {age} years old, is it too late to become a {career}?",
+]
+
+COACH = [
+    "Are you sure? Most people who want to become a {career} quit in the first year.",
+    "Let me push back on that: why {career} and not something safer?",
+    "That is a common worry, and it is a fair one.",
+    "The market for {career}s is competitive, but skilled people are always in demand.",
+    "Salary depends a lot on the city and on your experience.",
+    "Talk to two or three people who work as a {career} before you decide.",
+    "You don't need to be perfect, you need to be consistent.",
+    "Failing once is normal; what matters is what you learn from it.",
+    "Scholarships and free online courses can cover a lot of the cost.",
+    "Here is what I would do in your place.",
+    "Build a small portfolio that shows what you can do.",
+    "Set aside at least one hour every day for practice.",
+    "Find a mentor who has already done what you want to do.",
+]
+
+PLAN = [
+    "Learn the fundamentals of the field with a free online course.",
+    "Practice every day and keep notes of what you learned.",
+    "Build your first small project and show it to a mentor.",
+    "Join a community of {career}s and ask questions.",
+    "Apply for an internship or a part-time job.",
+    "Prepare for the certification exam.",
+    "Update your CV and your portfolio.",
+    "Start applying for entry-level jobs.",
+]
+
+
+def _reply(rng: random.Random, career: str, plan: bool) -> str:
+    lines = [rng.choice(COACH).format(career=career) for _ in range(rng.randint(3, 7))]
+    if plan:
+        lines.append(f"Here is your roadmap to become a {career}:")
+        for month in range(1, rng.randint(4, 7)):
+            steps = " ".join(rng.choice(PLAN).format(career=career) for _ in range(2))
+            lines.append(f"Month {month}: {steps} (about {rng.randint(5, 20)} hours a week)")
+    lines.append(f"Your next step: {rng.choice(PLAN).format(career=career).lower()}")
+    return "\n".join(lines)
+
+
+def _seed(path: str, sessions: int, turns: int) -> None:
+    """Fill chat_history + sessions with plain sqlite3 (tables made by init_db first)."""
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1)
+    connection = sqlite3.connect(path)
+    with connection:
+        message_rows, session_rows = [], []
+        for session in range(sessions):
+            career = rng.choice(CAREERS)
+            session_id = f"s{session:06d}"
+            first = ts = start + timedelta(minutes=session)
+            goal = None
+            for turn in range(turns):
+                question = rng.choice(QUESTIONS).format(career=career, year=2025, age=rng.randint(16, 40))
+                goal = goal or question
+                ts += timedelta(seconds=rng.randint(20, 300))
+                key = f"{session_id}-{turn}"
+                message_rows.append((session_id, "user", question, ts.isoformat(" "), key))
+                message_rows.append((session_id, "assistant", _reply(rng, career, turn == turns - 1),
+                                     ts.isoformat(" "), key))
+            session_rows.append((session_id, goal, "en", turns, first.isoformat(" "), ts.isoformat(" ")))
+        connection.executemany(
+            "INSERT INTO chat_history (session_id, role, content, timestamp, idempotency_key) VALUES (?, ?, ?, ?, ?)",
+            message_rows,
+        )
+        connection.executemany(
+            "INSERT INTO sessions (session_id, career_goal, language, turn_count, created_at, last_activity_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            session_rows,
+        )
+        # The sessions row points at the last AI reply, like record_turn() does
+        connection.execute("""
+            UPDATE sessions SET last_assistant_message_id = (
+                SELECT MAX(id) FROM chat_history h WHERE h.session_id = sessions.session_id AND h.role = 'assistant')
+        """)
+    connection.close()
+
+
+def _file_mb(path: str) -> float:
+    return os.path.getsize(path) / 1024 / 1024
+
+
+async def _run(args, path: str):
+    from sqlalchemy import text
+    from app.database import SessionLocal, engine, init_db
+    from app import models  # noqa: F401  (registers the tables)
+    from app.services import session_archive
+    from app.services.history_service import get_recent_history, history_buffer
+
+    await init_db()
+    if args.db is None:
+        await engine.dispose()
+        _seed(path, args.sessions, args.turns)
+    async with SessionLocal() as db:
+        await db.execute(text("UPDATE sessions SET last_activity_at = :old"),
+                         {"old": datetime.utcnow() - timedelta(days=365)})
+        await db.commit()
+        sessions = (await db.execute(text("SELECT session_id FROM sessions ORDER BY session_id"))).scalars().all()
+    # One session stays live (the newest message is never archived): the live baseline
+    before = _file_mb(path)
+
+    begin = time.perf_counter()
+    report = await session_archive.archive_idle_sessions(idle_for=timedelta(days=1))
+    archive_s = time.perf_counter() - begin
+    archived = _file_mb(path)
+    begin = time.perf_counter()
+    freed = await session_archive.incremental_vacuum(0)
+    vacuum_s = time.perf_counter() - begin
+    await engine.dispose()   # checkpoint the WAL, so the file size is final
+    vacuumed = _file_mb(path)
+
+    # zlib without the dictionary, on the same archived sessions
+    async with SessionLocal() as db:
+        rows = (await db.execute(text(
+            "SELECT dictionary_id, data FROM session_archive ORDER BY session_id LIMIT 500"
+        ))).all()
+        plain = with_dictionary = raw = 0
+        for dictionary_id, data in rows:
+            messages = await session_archive.decode_archive(db, dictionary_id, data)
+            encoded = session_archive.encode_messages(messages)
+            raw += len(encoded)
+            plain += len(session_archive.compress(encoded, None))
+            with_dictionary += len(data)
+
+    print(f"sessions: {len(sessions)}, archived: {report['sessions']} ({report['messages']} messages)")
+    print(f"archiving: {archive_s:.2f} s, incremental VACUUM of {freed} pages: {vacuum_s:.2f} s")
+    print(f"database file: {before:.1f} MB -> {archived:.1f} MB archived -> {vacuumed:.1f} MB after VACUUM "
+          f"({(1 - vacuumed / before) * 100:.0f}% smaller)")
+    if raw:
+        print(f"archived messages (first {len(rows)} sessions): JSON {raw / 1024:.0f} KB, "
+              f"zlib {plain / 1024:.0f} KB ({raw / plain:.1f}x), "
+              f"zlib + dictionary {with_dictionary / 1024:.0f} KB ({raw / with_dictionary:.1f}x)")
+
+    # -------- A returning user: recent history of an archived vs. a live session --------
+    rng = random.Random(1)
+    archived_ids = rng.sample(sessions[:-1], min(args.restores, len(sessions) - 1))
+    timings = {"archived": [], "live": []}
+    for kind, session_ids in (("archived", archived_ids), ("live", archived_ids)):
+        for session_id in session_ids:
+            history_buffer.discard(session_id)
+            async with SessionLocal() as db:
+                begin = time.perf_counter()
+                history = await get_recent_history(db, session_id)
+                timings[kind].append((time.perf_counter() - begin) * 1000)
+            assert history, session_id
+    for kind, values in timings.items():
+        values.sort()
+        print(f"recent history, {kind:<8} session: mean {statistics.mean(values):6.2f} ms  "
+              f"p50 {values[len(values) // 2]:6.2f} ms  p99 {values[int(len(values) * 0.99)]:6.2f} ms")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--restores", type=int, default=200, help="archived sessions read back")
+    parser.add_argument("--db", help="benchmark a copy of this database instead of synthetic chats")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="career-archive-")
+    path = os.path.join(workdir, "bench.db")
+    if args.db:
+        shutil.copy(args.db, path)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    asyncio.run(_run(args, path))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: replaying scripted debates - one /api/chat call per turn vs. /api/chat/batch.
+
+S sessions with T turns each (turns of a session must run in order):
+- per_turn: C clients, each replays whole sessions with one POST /api/chat per turn
+- batch:    ONE POST /api/chat/batch with all S*T items (max_concurrency=C)
+
+Reports wall time, turns per second and how many SQL statements were sent
+to the database (history reads, replay checks, inserts, commits).
+
+Run from the backend folder:
+    python -m benchmarks.bench_chat_batch
+    python -m benchmarks.bench_chat_batch --sessions 100 --turns 5 --concurrency 16 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from .fake_groq import FakeGroqConfig, run_fake_groq
+
+
+def _items(sessions: int, turns: int, run: str):
+    return [
+        {"session_id": f"{run}-{s}", "message": f"Turn {t}: I still want to be a pilot ({s})", "use_cache": False}
+        for t in range(turns) for s in range(sessions)
+    ]
+
+
+async def _per_turn(client, items, concurrency):
+    by_session = {}
+    for item in items:
+        by_session.setdefault(item["session_id"], []).append(item)
+    queue = list(by_session.values())
+
+    async def worker():
+        while queue:
+            for item in queue.pop():
+                response = await client.post("/api/chat", json=item)
+                response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _batch(client, items, concurrency):
+    async with client.stream("POST", "/api/chat/batch",
+                             json={"items": items, "max_concurrency": concurrency}) as response:
+        response.raise_for_status()
+        last = None
+        async for line in response.aiter_lines():
+            if line:
+                last = json.loads(line)
+    assert last and last["done"] and last["ok"] == len(items), last
+
+
+async def _run(args):
+    import httpx
+    from sqlalchemy import event
+    from app.database import engine
+    from app.main import create_app
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    app = create_app("persistent")
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            print(f"{'mode':<9} {'turns':>6} {'seconds':>8} {'turns/s':>8} {'SQL stmts':>10} {'per turn':>9}")
+            for mode, run in (("per_turn", _per_turn), ("batch", _batch)):
+                items = _items(args.sessions, args.turns, mode)
+                statements.clear()
+                begin = time.perf_counter()
+                await run(client, items, args.concurrency)
+                elapsed = time.perf_counter() - begin
+                print(f"{mode:<9} {len(items):>6} {elapsed:>8.2f} {len(items) / elapsed:>8.1f} "
+                      f"{len(statements):>10} {len(statements) / len(items):>9.2f}")
+    finally:
+        await app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Groq seconds to first token")
+    args = parser.parse_args()
+
+    with run_fake_groq(FakeGroqConfig(latency=args.latency, tokens_per_second=5000)) as base_url:
+        os.environ.update({
+            "GROQ_BASE_URL": base_url,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db",
+            "CHAT_BATCH_CONCURRENCY": str(args.concurrency),
+            "STARTUP_WARM_UP": "blocking",
+        })
+        os.environ.setdefault("GROQ_API_KEY", "benchmark")
+        asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
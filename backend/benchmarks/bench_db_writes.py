@@ -0,0 +1,100 @@
+"""
+Benchmark: chat-turn write throughput at 1, 10 and 100 concurrent sessions.
+
+Each configuration runs in its own process (settings and the engine are
+read once at import):
+- default: DB_PROFILE=default (rollback journal, NullPool) - the old engine setup
+- tuned:   DB_PROFILE=tuned (WAL, synchronous=NORMAL, mmap, busy_timeout, pool)
+- batched: tuned + DB_WRITE_BATCHING=true (group commit)
+
+Every session saves its turns one after another through
+chat_writer.save_turn(), exactly like the chat endpoint does.
+
+Run from the backend folder:
+    python -m benchmarks.bench_db_writes
+    python -m benchmarks.bench_db_writes --sessions 1 10 100 --turns 1000
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+CONFIGS = {
+    "default": {"DB_PROFILE": "default", "DB_WRITE_BATCHING": "false"},
+    "tuned": {"DB_PROFILE": "tuned", "DB_WRITE_BATCHING": "false"},
+    "batched": {"DB_PROFILE": "tuned", "DB_WRITE_BATCHING": "true"},
+}
+
+
+def _child(env, sessions, turns, results):
+    os.environ.update(env)
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    import asyncio
+
+    async def run():
+        from app.database import SessionLocal, engine, init_db
+        import app.models  # noqa: F401  (register the tables)
+        from app.services.chat_writer import chat_write_batcher, save_turn
+
+        await init_db()
+        per_session = max(1, turns // sessions)
+        latencies = []
+        errors = []
+        reply = "Here is your roadmap. " * 40
+
+        async def session(n):
+            for i in range(per_session):
+                begin = time.perf_counter()
+                try:
+                    async with SessionLocal() as db:
+                        await save_turn(db, f"s{n}", f"message {i}", reply, "en")
+                except Exception as e:
+                    errors.append(type(e).__name__)
+                latencies.append(time.perf_counter() - begin)
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(session(n) for n in range(sessions)))
+        elapsed = time.perf_counter() - begin
+
+        await chat_write_batcher.close()
+        await engine.dispose()
+        latencies.sort()
+        results.put({
+            "turns_per_s": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            "errors": len(errors),
+            "batches": chat_write_batcher.batches,
+        })
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--turns", type=int, default=1000, help="turns per run (split across sessions)")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS))
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'config':<8} {'sessions':>8} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'batches':>8}")
+    for sessions in args.sessions:
+        for name in args.configs:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(CONFIGS[name], DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/bench.db")
+                results = ctx.Queue()
+                proc = ctx.Process(target=_child, args=(env, sessions, args.turns, results))
+                proc.start()
+                r = results.get()
+                proc.join()
+            print(f"{name:<8} {sessions:>8} {r['turns_per_s']:>9,.0f} {r['p50_ms']:>8.1f} "
+                  f"{r['p95_ms']:>8.1f} {r['errors']:>7} {r['batches']:>8}")
+
+
+if __name__ == "__main__":
+    main()
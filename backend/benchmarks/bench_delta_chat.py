@@ -0,0 +1,110 @@
+"""
+Benchmark: stateless POST /api/chat with the full history vs. the delta protocol.
+
+For long conversations (H messages of --chars characters each) it compares:
+
+- full:  every turn sends the whole history, growing by each answered
+         turn (what the React client did)
+- delta: the history is sent once, then only session_id + history_version
+         + the new message (services/conversation_store.py)
+
+Reports the request body size, latency per turn (in-process app, the fake
+Groq server answers at once, so the request handling dominates) and the
+time FastAPI / Pydantic spend on parsing and validating the body alone.
+
+Run from the backend folder:
+    python -m benchmarks.bench_delta_chat
+    python -m benchmarks.bench_delta_chat --history 10 50 100 --turns 40 --chars 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from .fake_groq import FakeGroqConfig, run_fake_groq
+
+
+def _history(messages: int, chars: int):
+    sentence = "I have been thinking about this career for a long time and my family disagrees. "
+    text = (sentence * (chars // len(sentence) + 1))[:chars]
+    return [{"role": "user" if n % 2 == 0 else "assistant", "content": f"{n} {text}"} for n in range(messages)]
+
+
+def _validate_ms(body: bytes, repeat: int = 20) -> float:
+    """Time to parse + validate one body into the endpoint's ChatRequest model."""
+    from app.routers.stateless import ChatRequest
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        ChatRequest.model_validate(json.loads(body))
+    return (time.perf_counter() - begin) * 1000 / repeat
+
+
+async def _run(args):
+    import httpx
+    from app.main import create_app
+    from app.services.llm_service import close_client
+
+    app = create_app("stateless")
+    await app.router.startup()
+    print(f"{'history':>7} {'mode':<6} {'request KB':>10} {'mean ms':>8} {'p50 ms':>7} {'p99 ms':>7} {'parse ms':>9}")
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for size in args.history:
+                for mode in ("full", "delta"):
+                    history = _history(size, args.chars)
+                    session_id = f"{mode}-{size}"
+                    version = None
+                    latencies, sizes = [], []
+                    for turn in range(args.turns + 1):
+                        message = f"Turn {turn}: but what about the salary?"
+                        if mode == "full" or version is None:
+                            payload = {"session_id": session_id if mode == "delta" else None,
+                                       "history": history, "message": message, "use_cache": False}
+                        else:
+                            payload = {"session_id": session_id, "history_version": version,
+                                       "message": message, "use_cache": False}
+                        body = json.dumps(payload).encode()
+                        begin = time.perf_counter()
+                        response = await client.post("/api/chat", content=body,
+                                                     headers={"Content-Type": "application/json"})
+                        elapsed = (time.perf_counter() - begin) * 1000
+                        response.raise_for_status()
+                        reply = response.json()
+                        version = reply["history_version"]
+                        # Both clients know the same conversation, so both prompts are the same
+                        history = history + [{"role": "user", "content": message},
+                                             {"role": "assistant", "content": reply["reply"]}]
+                        if turn:   # turn 0 seeds the delta session
+                            latencies.append(elapsed)
+                            sizes.append(len(body))
+                    latencies.sort()
+                    print(f"{size:>7} {mode:<6} {statistics.mean(sizes) / 1024:>10.1f} "
+                          f"{statistics.mean(latencies):>8.2f} {statistics.median(latencies):>7.2f} "
+                          f"{latencies[int(len(latencies) * 0.99)]:>7.2f} {_validate_ms(body):>9.3f}")
+    finally:
+        await app.router.shutdown()
+        await close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 50, 140],
+                        help="messages in the history at the start (at most 200 - 2 * turns)")
+    parser.add_argument("--chars", type=int, default=4000, help="characters per history message")
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+
+    with run_fake_groq(FakeGroqConfig(latency=0, tokens_per_second=1e6, reply_tokens=50)) as base_url:
+        os.environ.update({"GROQ_BASE_URL": base_url, "STARTUP_WARM_UP": "off", "LLM_CACHE_ENABLED": "false",
+                           "METRICS_ENABLED": "false"})
+        os.environ.setdefault("GROQ_API_KEY", "benchmark")
+        asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: loading chat history for one turn, for small and huge sessions.
+
+Compares three ways to get "the last 20 messages of a session":
+- full_scan: the old query (every row of the session as ORM objects, then slice)
+- limit:     ORDER BY timestamp DESC, id DESC LIMIT 20 on the composite index
+- buffer:    the in-memory ring buffer (steady-state turns)
+
+Run from the backend folder:
+    python -m benchmarks.bench_history
+    python -m benchmarks.bench_history --sizes 10 1000 100000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _seed(db_path: str, sizes):
+    """Create one session per size (plus some other sessions as noise)."""
+    conn = sqlite3.connect(db_path)
+    start = datetime(2025, 1, 1)
+    rows = []
+    for size in sizes:
+        for i in range(size):
+            rows.append((
+                f"session-{size}",
+                "user" if i % 2 == 0 else "assistant",
+                f"message {i} " + "lorem ipsum " * 20,
+                start + timedelta(seconds=i // 2),
+            ))
+    for i in range(50_000):
+        rows.append((f"noise-{i % 500}", "user", "noise " * 10, start))
+    conn.executemany(
+        "INSERT INTO chat_history (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples) * 1000
+
+
+async def _run(sizes, repeat):
+    from sqlalchemy import select
+    from app.database import SessionLocal, init_db, engine
+    from app.models import ChatHistory
+    from app.services.history_service import (
+        fetch_recent_history, get_recent_history, history_buffer,
+    )
+
+    await init_db()
+    await asyncio.to_thread(_seed, engine.url.database, sizes)
+
+    print(f"{'messages':>9} {'full_scan ms':>13} {'limit ms':>9} {'buffer ms':>10}")
+    async with SessionLocal() as db:
+        for size in sizes:
+            session_id = f"session-{size}"
+
+            async def full_scan():
+                result = await db.execute(
+                    select(ChatHistory)
+                    .where(ChatHistory.session_id == session_id)
+                    .order_by(ChatHistory.timestamp.asc())
+                )
+                history = [{"role": h.role, "content": h.content} for h in result.scalars().all()]
+                db.expunge_all()
+                return history[-20:]
+
+            async def limit():
+                return await fetch_recent_history(db, session_id, 20)
+
+            async def buffered():
+                return await get_recent_history(db, session_id)
+
+            # Same answer from all three
+            assert await full_scan() == await limit()
+            history_buffer.discard(session_id)
+
+            scan_ms = await _time(full_scan, max(1, repeat // 10) if size >= 100_000 else repeat)
+            limit_ms = await _time(limit, repeat)
+            buffer_ms = await _time(buffered, repeat)
+            print(f"{size:>9} {scan_ms:>13.3f} {limit_ms:>9.3f} {buffer_ms:>10.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_history.db"
+    asyncio.run(_run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: language detection of chat messages (Hindi vs English).
+
+Compares on a small Hindi / English / Hinglish corpus:
+- langdetect: the old path (detect() on every message, seeded)
+- fast:       language_service.detect_language() (script fast path)
+- memo:       LanguageDetector.detect() with per-session memo, messages
+              replayed as 5-turn sessions
+
+Reports detections/sec, the cold-start cost of loading the profiles, and
+accuracy against the corpus labels (plus agreement with the old path).
+
+Run from the backend folder:
+    python -m benchmarks.bench_language
+    python -m benchmarks.bench_language --repeat 20
+"""
+
+import argparse
+import time
+
+# (text, expected "hi" / "en")
+# Latin-script Hinglish is labelled "en": the old path could never answer
+# "hi" for it and the English prompt is what those users have been getting.
+CORPUS = [
+    # Hindi (Devanagari)
+    ("मुझे डेटा साइंटिस्ट बनना है", "hi"),
+    ("क्या मुझे इंजीनियरिंग छोड़कर डिज़ाइन करना चाहिए?", "hi"),
+    ("मेरे पिताजी चाहते हैं कि मैं सरकारी नौकरी करूँ", "hi"),
+    ("अगले छह महीने में मुझे क्या सीखना चाहिए?", "hi"),
+    ("नमस्ते", "hi"),
+    ("धन्यवाद, यह बहुत उपयोगी था", "hi"),
+    ("मैं बारहवीं कक्षा में हूँ और मुझे विज्ञान पसंद है", "hi"),
+    ("वेतन के बारे में बताइए", "hi"),
+    # Hinglish with Devanagari
+    ("मुझे data science सीखना है", "hi"),
+    ("क्या UPSC की तैयारी सही रहेगी?", "hi"),
+    ("मैं B.Tech के बाद MBA करूँ या job?", "hi"),
+    ("Python सीखूं या Java?", "hi"),
+    ("data science ya web development, कौन सा better है?", "hi"),
+    # English
+    ("I want to become a data scientist", "en"),
+    ("Should I quit engineering and study design instead?", "en"),
+    ("My parents want me to take a government job", "en"),
+    ("What should I learn in the next six months?", "en"),
+    ("Thanks, that was really helpful!", "en"),
+    ("ok", "en"),
+    ("Tell me about salaries in product management", "en"),
+    ("Is a PhD worth it for machine learning roles?", "en"),
+    # Hinglish in Latin script
+    ("mujhe data scientist banna hai, kya karu?", "en"),
+    ("aap kaise ho", "en"),
+    ("engineering chhod du kya?", "en"),
+    ("salary kitni milegi fresher ko", "en"),
+]
+
+
+def _old_detect(text: str) -> str:
+    from langdetect import LangDetectException, detect
+    try:
+        return "hi" if detect(text) == "hi" else "en"
+    except LangDetectException:
+        return "en"
+
+
+def _rate(fn, texts, repeat):
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    elapsed = time.perf_counter() - begin
+    return repeat * len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    from langdetect import DetectorFactory
+    DetectorFactory.seed = 0
+
+    # Cold start: the first langdetect call loads every language profile
+    begin = time.perf_counter()
+    _old_detect("hello")
+    cold_ms = (time.perf_counter() - begin) * 1000
+
+    from app.services.language_service import LanguageDetector, detect_language
+
+    texts = [text for text, _ in CORPUS]
+    labels = [label for _, label in CORPUS]
+
+    old = [_old_detect(t) for t in texts]
+    fast = [detect_language(t) or "en" for t in texts]
+
+    def accuracy(predicted):
+        return sum(p == l for p, l in zip(predicted, labels)) / len(labels)
+
+    detector = LanguageDetector()
+    counter = iter(range(10 ** 9))
+
+    def with_memo(text):
+        # Five messages per session, like a short conversation
+        return detector.detect(f"s{next(counter) // 5}", text)
+
+    # Each session repeats one corpus message five times (same script each turn)
+    session_texts = [t for t in texts for _ in range(5)]
+
+    print(f"langdetect cold start: {cold_ms:.0f} ms (paid at app startup now)")
+    print(f"{'path':<12} {'detections/s':>13} {'accuracy':>9} {'agrees w/ old':>14}")
+    print(f"{'langdetect':<12} {_rate(_old_detect, texts, args.repeat):>13,.0f} "
+          f"{accuracy(old):>9.0%} {'-':>14}")
+    agree = sum(a == b for a, b in zip(old, fast)) / len(old)
+    print(f"{'fast':<12} {_rate(detect_language, texts, args.repeat):>13,.0f} "
+          f"{accuracy(fast):>9.0%} {agree:>14.0%}")
+    print(f"{'memo':<12} {_rate(with_memo, session_texts, args.repeat):>13,.0f} "
+          f"{'':>9} {'':>14}")
+    print(f"memo stats: {detector.stats()}")
+
+    for text, label, o, f in zip(texts, labels, old, fast):
+        if o != f or f != label:
+            print(f"  differs: {text!r} label={label} langdetect={o} fast={f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Load benchmark: /api/chat throughput under many concurrent chats.
+
+Boots the FastAPI app in-process (httpx ASGI transport) against the local
+fake Groq server, and fires N concurrent chats for several values of N.
+With the shared async client, throughput should grow with concurrency until
+LLM_MAX_CONCURRENCY is reached; the old synchronous client stays flat at
+roughly 1 / latency requests per second because it blocks the event loop.
+
+Run from the backend folder:
+    python -m benchmarks.bench_llm_concurrency
+    python -m benchmarks.bench_llm_concurrency --latency 0.3 --levels 1 10 100 200 --compare-sync
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from .fake_groq import FakeGroqConfig, fetch_stats, run_fake_groq
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def _run_level(app, concurrency: int, rounds: int):
+    import httpx
+
+    latencies = []
+    body = {"history": [], "message": "I want to be a data scientist"}
+
+    async def one_chat(client):
+        start = time.perf_counter()
+        response = await client.post("/api/chat", json=body)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one_chat(client) for _ in range(concurrency * rounds)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def _use_sync_client(base_url: str):
+    """Patch in the old behaviour: a blocking Groq call inside the async handler."""
+    from groq import Groq
+    from app.services import llm_service
+
+    sync_client = Groq(api_key="fake", base_url=base_url)
+
+    async def blocking_complete_chat(messages, temperature=0.6, max_tokens=800):
+        completion = sync_client.chat.completions.create(
+            model=llm_service.MODEL_NAME, messages=messages,
+            temperature=temperature, max_tokens=max_tokens,
+        )
+        return completion.choices[0].message.content.strip()
+
+    from app.routers import stateless
+    stateless.complete_chat = blocking_complete_chat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Groq latency in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--rounds", type=int, default=3, help="requests per concurrent client")
+    parser.add_argument("--compare-sync", action="store_true", help="also run the old blocking client")
+    args = parser.parse_args()
+
+    config = FakeGroqConfig(latency=args.latency)
+    with run_fake_groq(config) as base_url:
+        os.environ["GROQ_BASE_URL"] = base_url
+        os.environ.setdefault("GROQ_API_KEY", "fake-key")
+        os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+        os.environ.setdefault("LLM_MAX_CONCURRENCY", "64")
+        os.environ.setdefault("LLM_MAX_CONNECTIONS", os.environ["LLM_MAX_CONCURRENCY"])
+
+        from app.main import create_app
+        app = create_app("stateless")
+
+        print(f"fake Groq latency={args.latency}s  LLM_MAX_CONCURRENCY={os.environ['LLM_MAX_CONCURRENCY']}")
+        print(f"{'mode':<6} {'conc':>5} {'reqs':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+
+        modes = ["async"] + (["sync"] if args.compare_sync else [])
+        for mode in modes:
+            if mode == "sync":
+                _use_sync_client(base_url)
+            for level in args.levels:
+                rounds = 1 if mode == "sync" else args.rounds
+                result = asyncio.run(_run_level(app, level, rounds))
+                # a fresh event loop is used per level, so start with a fresh client too
+                from app.services import llm_service
+                llm_service._client = None
+                llm_service.groq_guard.reset()
+                print(f"{mode:<6} {result['concurrency']:>5} {result['requests']:>6} "
+                      f"{result['throughput_rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+        stats = fetch_stats(base_url)
+        print(f"upstream requests={stats['requests']} max in flight={stats['max_in_flight']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: PDFs of a whole cohort - one /api/export-pdf per session vs. one ZIP.
+
+S sessions, each with its own roadmap (nothing cached at the start):
+
+- serial:    one POST /api/export-pdf per session, one after the other
+- bulk_cold: ONE POST /api/export-pdf/bulk for all sessions (renders in parallel)
+- bulk_warm: the same ZIP again (every PDF comes from the cache)
+
+Reports total time, time to the first byte and the download size.
+Renders run in PDF_WORKERS processes: set it to the number of CPU cores.
+
+Run from the backend folder:
+    python -m benchmarks.bench_pdf_bulk
+    PDF_WORKERS=4 python -m benchmarks.bench_pdf_bulk --sessions 64 --pages 4
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+from .bench_pdf_pool import roadmap_text
+
+ADMIN = {"Authorization": "Bearer benchmark"}
+
+
+async def _seed(sessions: int, pages: int, run: str) -> None:
+    from app.services.chat_writer import TurnToSave, save_turns
+
+    # A different plan per session (and per run), so nothing is cached yet
+    await save_turns([
+        TurnToSave(f"{run}-{s}", f"I want to be a data analyst ({s})",
+                   f"# Plan {run} {s}\n" + roadmap_text(pages), "en", f"seed-{run}-{s}")
+        for s in range(sessions)
+    ])
+
+
+async def _serial(client, ids):
+    begin = time.perf_counter()
+    first = None
+    size = 0
+    for session_id in ids:
+        response = await client.post("/api/export-pdf", json={"session_id": session_id, "message": "pdf"})
+        response.raise_for_status()
+        first = first or time.perf_counter() - begin
+        size += len(response.content)
+    return first, size
+
+
+async def _bulk(client, ids):
+    begin = time.perf_counter()
+    first = None
+    body = bytearray()
+    async with client.stream("POST", "/api/export-pdf/bulk", json={"session_ids": ids}, headers=ADMIN) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if chunk and first is None:
+                first = time.perf_counter() - begin
+            body += chunk
+    with zipfile.ZipFile(io.BytesIO(bytes(body))) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        assert len(manifest) == len(ids) and all("file" in entry for entry in manifest), manifest
+    return first, len(body)
+
+
+async def _run(args):
+    import socket
+    import httpx
+    import uvicorn
+    from app.main import create_app
+
+    # A real HTTP server: the in-process ASGI transport would only hand over
+    # the response body once it is complete, hiding when the first byte came
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app("persistent"), host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+            print(f"{'mode':<10} {'PDFs':>5} {'seconds':>8} {'PDFs/s':>7} {'first byte':>11} {'MB':>6}")
+            for mode, run, seed in (("serial", _serial, "serial"), ("bulk_cold", _bulk, "bulk"),
+                                    ("bulk_warm", _bulk, None)):
+                if seed:
+                    await _seed(args.sessions, args.pages, seed)
+                ids = [f"{seed or 'bulk'}-{s}" for s in range(args.sessions)]
+                begin = time.perf_counter()
+                first, size = await run(client, ids)
+                elapsed = time.perf_counter() - begin
+                print(f"{mode:<10} {len(ids):>5} {elapsed:>8.2f} {len(ids) / elapsed:>7.1f} "
+                      f"{first * 1000:>9.0f}ms {size / 1e6:>6.1f}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=3, help="roughly how many pages per PDF")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="career-pdf-bulk-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "PDF_CACHE_DIR": os.path.join(workdir, "pdf_cache"),
+        "ADMIN_TOKEN": "benchmark",
+        "STARTUP_WARM_UP": "blocking",
+        "LANGUAGE_WARM_UP": "false",
+    })
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("PDF_WORKERS", str(os.cpu_count() or 1))
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: chat latency while PDF exports are running.
+
+Keeps a steady stream of /api/chat requests going (against the local fake
+Groq server) while several clients export long roadmaps through
+/api/export-pdf at the same time, and reports the chat p50 / p99 latency.
+
+Modes:
+- idle:   chat only (baseline)
+- inline: PDFs rendered on the event loop (the old behaviour)
+- pool:   PDFs rendered in the worker process pool
+
+Run from the backend folder:
+    python -m benchmarks.bench_pdf_pool
+    python -m benchmarks.bench_pdf_pool --exporters 4 --pages 20 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from .fake_groq import FakeGroqConfig, run_fake_groq
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def roadmap_text(pages: int) -> str:
+    """A markdown-ish roadmap of roughly `pages` PDF pages."""
+    lines = []
+    for month in range(1, pages * 2 + 1):
+        lines.append(f"## Month {month}: Build skills")
+        for item in range(1, 9):
+            lines.append(f"- Step {item}: practise **Python**, SQL and statistics for two hours every day")
+        lines.append("")
+    return "\n".join(lines)
+
+
+class InlinePool:
+    """Stand-in for pdf_pool that renders on the event loop (old behaviour)."""
+
+    async def run(self, fn, *args):
+        return fn(*args)
+
+
+async def _run_mode(app, mode: str, exporters: int, pages: int, duration: float, chat_rate: float):
+    import httpx
+    from app.services import pdf_cache
+    from app.services.pdf_pool import pdf_pool
+
+    # serve_pdf() renders through pdf_cache.pdf_pool
+    pdf_cache.pdf_pool = InlinePool() if mode == "inline" else pdf_pool
+
+    chat_latencies = []
+    pdf_done = 0
+    pdf_rejected = 0
+    content = roadmap_text(pages)
+    stop_at = time.perf_counter() + duration
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def one_chat(n):
+            start = time.perf_counter()
+            response = await client.post("/api/chat", json={
+                "history": [], "message": f"chat {n}", "use_cache": False,
+            })
+            response.raise_for_status()
+            chat_latencies.append(time.perf_counter() - start)
+
+        async def chatter():
+            tasks = []
+            n = 0
+            while time.perf_counter() < stop_at:
+                tasks.append(asyncio.create_task(one_chat(n)))
+                n += 1
+                await asyncio.sleep(1 / chat_rate)
+            await asyncio.gather(*tasks)
+
+        async def exporter():
+            nonlocal pdf_done, pdf_rejected
+            while time.perf_counter() < stop_at:
+                # The in-process transport has no real I/O, so yield once like a network hop would
+                await asyncio.sleep(0.001)
+                response = await client.post("/api/export-pdf", json={"content": content})
+                if response.status_code == 429:
+                    pdf_rejected += 1
+                    await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                else:
+                    response.raise_for_status()
+                    pdf_done += 1
+
+        workers = [chatter()] + ([exporter() for _ in range(exporters)] if mode != "idle" else [])
+        await asyncio.gather(*workers)
+
+    return {
+        "mode": mode,
+        "chats": len(chat_latencies),
+        "chat_p50_ms": statistics.median(chat_latencies) * 1000,
+        "chat_p99_ms": _percentile(chat_latencies, 99) * 1000,
+        "pdfs": pdf_done,
+        "pdf_429s": pdf_rejected,
+    }
+
+
+async def _main(args):
+    from app.main import create_app
+    from app.services.pdf_pool import pdf_pool
+
+    app = create_app("stateless")
+    await pdf_pool.start()
+    print(f"exporters={args.exporters} pages~{args.pages} duration={args.duration}s "
+          f"PDF_WORKERS={pdf_pool.workers} PDF_MAX_QUEUE={pdf_pool.max_queue}")
+    print(f"{'mode':<7} {'chats':>6} {'p50 ms':>9} {'p99 ms':>9} {'pdfs':>5} {'429s':>5}")
+    try:
+        for mode in ("idle", "inline", "pool"):
+            r = await _run_mode(app, mode, args.exporters, args.pages, args.duration, args.chat_rate)
+            print(f"{r['mode']:<7} {r['chats']:>6} {r['chat_p50_ms']:>9.1f} "
+                  f"{r['chat_p99_ms']:>9.1f} {r['pdfs']:>5} {r['pdf_429s']:>5}")
+    finally:
+        pdf_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exporters", type=int, default=4, help="concurrent PDF export clients")
+    parser.add_argument("--pages", type=int, default=10, help="approximate pages per PDF")
+    parser.add_argument("--duration", type=float, default=8.0, help="seconds per mode")
+    parser.add_argument("--chat-rate", type=float, default=20.0, help="chat requests per second")
+    parser.add_argument("--latency", type=float, default=0.1, help="fake Groq latency in seconds")
+    args = parser.parse_args()
+
+    with run_fake_groq(FakeGroqConfig(latency=args.latency)) as base_url:
+        os.environ["GROQ_BASE_URL"] = base_url
+        os.environ.setdefault("GROQ_API_KEY", "fake-key")
+        os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+        asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: download latency after a roadmap reply, with and without pre-rendering.
+
+Each simulated user: POST /api/chat (the fake Groq server answers with a
+"Month N:" roadmap), reads it for --think seconds, then clicks download
+(POST /api/export-pdf). Every session has its own goal, so every PDF is a
+cold render.
+
+- on_demand: PDF_PRERENDER off - the download renders the PDF
+- prerender: the PDF is rendered in the background after the reply
+             (services/pdf_prerender.py); think=0 shows a download that
+             joins a pre-render still running
+
+Chat latency is reported too: speculation must not slow chat down.
+
+Run from the backend folder:
+    python -m benchmarks.bench_pdf_prerender
+    python -m benchmarks.bench_pdf_prerender --users 20 --think 0 2 --reply-tokens 2000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from .fake_groq import FakeGroqConfig, run_fake_groq
+
+
+def _summary(values):
+    values = sorted(values)
+    return statistics.mean(values), values[len(values) // 2], values[int(len(values) * 0.95)]
+
+
+async def _user(client, session_id: str, think: float):
+    begin = time.perf_counter()
+    response = await client.post("/api/chat", json={
+        "session_id": session_id, "message": f"I want to be a pilot ({session_id})", "use_cache": False,
+    })
+    response.raise_for_status()
+    chat_ms = (time.perf_counter() - begin) * 1000
+
+    await asyncio.sleep(think)
+    begin = time.perf_counter()
+    response = await client.post("/api/export-pdf", json={"session_id": session_id, "message": "pdf"})
+    response.raise_for_status()
+    return chat_ms, (time.perf_counter() - begin) * 1000
+
+
+async def _run(args):
+    import socket
+    import httpx
+    import uvicorn
+    from app.main import create_app
+    from app.services.pdf_prerender import pdf_prerenderer
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app("persistent"), host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"{'mode':<10} {'think s':>7} {'chat mean':>9} {'chat p95':>8} "
+          f"{'pdf mean':>8} {'pdf p50':>7} {'pdf p95':>7}   (ms)")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            for think in args.think:
+                for mode in ("on_demand", "prerender"):
+                    pdf_prerenderer.max_pending = args.max_pending if mode == "prerender" else 0
+                    chats, pdfs = [], []
+                    # Users arrive one after another, a few at a time
+                    for start in range(0, args.users, args.concurrency):
+                        results = await asyncio.gather(*(
+                            _user(client, f"{mode}-{think}-{n}", think)
+                            for n in range(start, min(args.users, start + args.concurrency))
+                        ))
+                        for chat_ms, pdf_ms in results:
+                            chats.append(chat_ms)
+                            pdfs.append(pdf_ms)
+                    chat_mean, _, chat_p95 = _summary(chats)
+                    pdf_mean, pdf_p50, pdf_p95 = _summary(pdfs)
+                    print(f"{mode:<10} {think:>7.1f} {chat_mean:>9.0f} {chat_p95:>8.0f} "
+                          f"{pdf_mean:>8.0f} {pdf_p50:>7.0f} {pdf_p95:>7.0f}")
+            print(f"\npre-renders: {pdf_prerenderer.stats()}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=3, help="users chatting at the same time")
+    parser.add_argument("--think", type=float, nargs="+", default=[0, 2], help="seconds between reply and download")
+    parser.add_argument("--reply-tokens", type=int, default=1500, help="roadmap length (words)")
+    parser.add_argument("--max-pending", type=int, default=32)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="career-prerender-")
+    config = FakeGroqConfig(latency=0.2, tokens_per_second=2000, reply_tokens=args.reply_tokens,
+                            roadmap_replies=True)
+    with run_fake_groq(config) as base_url:
+        os.environ.update({
+            "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+            "PDF_CACHE_DIR": os.path.join(workdir, "pdf_cache"),
+            "GROQ_BASE_URL": base_url,
+            "LLM_CACHE_ENABLED": "false",
+            "STARTUP_WARM_UP": "blocking",
+            "LANGUAGE_WARM_UP": "false",
+            "ROADMAP_REUSE": "off",
+        })
+        os.environ.setdefault("GROQ_API_KEY", "benchmark")
+        asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
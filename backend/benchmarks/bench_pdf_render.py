@@ -0,0 +1,128 @@
+"""
+Micro-benchmark: CPU time per PDF export, before and after the shared
+stylesheet registry + markdown parser.
+
+"before" is a copy of the old export code (new stylesheet on every call,
+ad-hoc line-by-line parsing); "after" is the current render functions.
+Runs in a single process, no server needed.
+
+Run from the backend folder:
+    python -m benchmarks.bench_pdf_render
+    python -m benchmarks.bench_pdf_render --pages 1 10 50 --repeat 10
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import time
+from io import BytesIO
+
+from .bench_pdf_pool import roadmap_text
+
+
+def legacy_inline_pdf(content: str, title: str) -> bytes:
+    """The old main.export_pdf rendering code."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=inch)
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name="TitleBold", fontName="Helvetica-Bold", fontSize=18, spaceAfter=20))
+    styles.add(ParagraphStyle(name="Content", fontName="Helvetica", fontSize=11, leading=14, spaceAfter=12))
+    story = [Paragraph(title, styles["TitleBold"]), Spacer(1, 0.3 * inch)]
+    for line in content.split("\n"):
+        if line.strip():
+            if line.startswith("## "):
+                story.append(Paragraph(line[3:].strip(), styles["Heading2"]))
+            elif line.startswith("### "):
+                story.append(Paragraph(line[4:].strip(), styles["Heading3"]))
+            elif line.strip().startswith("- ") or line.strip().startswith("* "):
+                story.append(Paragraph(f"• {line.strip()[2:]}", styles["Content"]))
+            else:
+                story.append(Paragraph(line, styles["Content"]))
+        else:
+            story.append(Spacer(1, 0.15 * inch))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def legacy_report_pdf(plan_text: str, career_goal: str) -> bytes:
+    """The old generate_pdf_report rendering code (in memory)."""
+    from datetime import datetime
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=72)
+    styles = getSampleStyleSheet()
+    story = [Paragraph("Career Roadmap & Debate Summary", styles["Title"]), Spacer(1, 0.4 * inch)]
+    story += [Paragraph(f"Career Goal: {career_goal}", styles["Heading2"]), Spacer(1, 0.3 * inch)]
+    story += [Paragraph(f"Generated on: {datetime.now():%Y-%m-%d %H:%M UTC}", styles["Normal"]),
+              Spacer(1, 0.5 * inch)]
+    story += [Paragraph("Detailed Roadmap / Plan:", styles["Heading2"]), Spacer(1, 0.3 * inch)]
+    for line in plan_text.split("\n"):
+        line = line.strip()
+        if not line:
+            story.append(Spacer(1, 0.15 * inch))
+            continue
+        if line.startswith(("-", "*", "•", "1.", "2.", "3.", "4.", "5.")):
+            cleaned = line.lstrip("-*•123456789. ").strip()
+            story.append(Paragraph(f"• {cleaned}", styles["BodyText"]))
+        else:
+            story.append(Paragraph(line, styles["Normal"]))
+        story.append(Spacer(1, 0.12 * inch))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _cpu_ms(fn, args, repeat):
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.process_time()
+        fn(*args)
+        samples.append(time.process_time() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    from app.services.pdf_services import render_pdf_bytes, render_report_bytes
+
+    # Warm up imports and the stylesheet registry (a PDF worker does this at startup)
+    render_pdf_bytes("warm up", "t")
+    render_report_bytes("warm up", "goal")
+
+    # "plain" has no inline markup, so old and new produce the same document.
+    # "markdown" has **bold** in every list item: the old code printed the
+    # asterisks literally, the new code renders bold (mixed fonts cost more layout time).
+    print(f"{'pages':>5} {'path':<7} {'before ms':>10} {'after ms':>9} {'saved':>7} {'after, markdown ms':>19}")
+    for pages in args.pages:
+        markdown = roadmap_text(pages)
+        plain = markdown.replace("**", "")
+        for name, before, after, extra in (
+            ("inline", legacy_inline_pdf, render_pdf_bytes, "Career Roadmap"),
+            ("report", legacy_report_pdf, render_report_bytes, "Become a data scientist"),
+        ):
+            before_ms = _cpu_ms(before, (plain, extra), args.repeat)
+            after_ms = _cpu_ms(after, (plain, extra), args.repeat)
+            markdown_ms = _cpu_ms(after, (markdown, extra), args.repeat)
+            print(f"{pages:>5} {name:<7} {before_ms:>10.1f} {after_ms:>9.1f} "
+                  f"{(1 - after_ms / before_ms) * 100:>6.0f}% {markdown_ms:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
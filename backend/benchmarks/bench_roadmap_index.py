@@ -0,0 +1,175 @@
+"""
+Benchmark: the roadmap index (services/roadmap_index.py).
+
+1. lookup:  find_roadmaps() latency after filing --entries roadmaps (goals
+            spread over a few dozen careers, with places, employers, degrees
+            and a long tail of rare words, like real first messages)
+2. chat:    --chats first messages of new sessions against the fake Groq
+            server (roadmap-shaped 800-token replies) with ROADMAP_REUSE
+            off / exemplar / reuse: latency per turn and tokens generated
+
+Run from the backend folder:
+    python -m benchmarks.bench_roadmap_index
+    python -m benchmarks.bench_roadmap_index --entries 200000 --chats 300
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .fake_groq import FakeGroqConfig, fetch_stats, run_fake_groq
+
+CAREERS = """
+data scientist, data analyst, software engineer, web developer, android developer, game developer,
+pilot, doctor, nurse, pharmacist, dentist, chartered accountant, investment banker, lawyer, judge,
+civil engineer, mechanical engineer, architect, interior designer, graphic designer, ux designer,
+fashion designer, chef, hotel manager, teacher, professor, psychologist, journalist, content writer,
+youtuber, actor, musician, photographer, ias officer, army officer, police officer, entrepreneur,
+digital marketer, product manager, cloud engineer, cybersecurity analyst, ai engineer, robotics engineer,
+biotechnologist, marine engineer, air hostess, physiotherapist, veterinarian, economist, sports coach
+""".replace("\n", " ").split(", ")
+CAREERS = [career.strip() for career in CAREERS]
+OPENERS = ["I want to become a {}", "I want to be a {}", "How do I become a {}?", "career as a {}",
+           "Should I become a {} after 12th?", "I dream of being a {} one day", "{} roadmap please"]
+
+
+EXTRAS = ["in Delhi", "in Mumbai", "in Bangalore", "in Pune", "in Jaipur", "in Kolkata", "abroad", "in Canada",
+          "in Germany", "at Google", "at Infosys", "at ISRO", "in the government", "after BTech", "after BCom",
+          "after BSc", "with no degree", "from a small town", "part time", "at 30"]
+
+
+def _goal(rng: random.Random, extras: bool = True) -> str:
+    goal = rng.choice(OPENERS).format(rng.choice(CAREERS))
+    if not extras:
+        return goal
+    if rng.random() < 0.5:
+        goal += " " + rng.choice(EXTRAS)
+    if rng.random() < 0.2:
+        # Names, typos, niche topics: words that (almost) nobody else uses
+        goal += f" zq{rng.randrange(50_000)}"
+    return goal
+
+
+# Runs in a child process: files the roadmaps through the app, then times lookups
+LOOKUP_CHILD = r"""
+import asyncio, json, random, sys, time, statistics
+from datetime import datetime
+from app.database import SessionLocal, engine, init_db
+from app.services.roadmap_index import _file_roadmaps, find_roadmaps
+from benchmarks.bench_roadmap_index import _goal
+
+async def run(entries, queries):
+    await init_db()
+    rng = random.Random(1)
+    begin = time.perf_counter()
+    async with engine.begin() as conn:
+        for start in range(0, entries, 5000):
+            await _file_roadmaps(conn, [(n + 1, _goal(rng), "en", n % 3 > 0)
+                                        for n in range(start, min(entries, start + 5000))], datetime.utcnow())
+    goals = (await (await engine.connect()).exec_driver_sql("SELECT count(*) FROM roadmap_goals")).scalar()
+    filed = time.perf_counter() - begin
+
+    latencies = []
+    async with SessionLocal() as db:
+        for goal in [_goal(rng) for _ in range(queries)]:
+            begin = time.perf_counter()
+            await find_roadmaps(db, goal, "en", limit=1)
+            latencies.append((time.perf_counter() - begin) * 1000)
+    await engine.dispose()
+    latencies.sort()
+    print(json.dumps({"filed": filed, "goals": goals, "p50": statistics.median(latencies),
+                      "p99": latencies[int(len(latencies) * 0.99)], "max": latencies[-1]}))
+
+asyncio.run(run(*json.loads(sys.stdin.read())))
+"""
+
+
+def _bench_lookup(entries: int, queries: int) -> None:
+    import json
+
+    workdir = tempfile.mkdtemp(prefix="career-roadmap-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{workdir}/bench.db", GROQ_API_KEY="benchmark",
+               PYTHONPATH=os.getcwd())
+    out = subprocess.run([sys.executable, "-c", LOOKUP_CHILD], env=env, input=json.dumps([entries, queries]),
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"filed {entries} roadmaps under {result['goals']} goals in {result['filed']:.1f} s "
+          f"({os.path.getsize(f'{workdir}/bench.db') / 1e6:.0f} MB)")
+    print(f"find_roadmaps(): p50 {result['p50']:.2f} ms  p99 {result['p99']:.2f} ms  max {result['max']:.2f} ms")
+
+
+async def _bench_chat(chats: int, base_url: str) -> None:
+    import httpx
+    import importlib
+
+    print(f"\n{'mode':<9} {'turns':>5} {'mean ms':>8} {'p50 ms':>7} {'LLM calls':>10} {'tokens':>8}")
+    for mode in ("off", "exemplar", "reuse"):
+        os.environ.update({
+            "DATABASE_URL": f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db",
+            "ROADMAP_REUSE": mode,
+        })
+        # Settings and the engine are read at import time: start from scratch per mode
+        for name in [name for name in sys.modules if name == "app" or name.startswith("app.")]:
+            del sys.modules[name]
+        main_module = importlib.import_module("app.main")
+        from app.services.llm_service import close_client
+        from app.database import engine
+
+        app = main_module.create_app("persistent")
+        await app.router.startup()
+        rng = random.Random(7)
+        latencies = []
+        tokens_before = _generated_tokens()
+        calls_before = fetch_stats(base_url)["requests"]
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                for n in range(chats):
+                    begin = time.perf_counter()
+                    response = await client.post("/api/chat", json={
+                        # LLM_CACHE_ENABLED=false: use_cache only allows "reuse" here
+                        "session_id": f"{mode}-{n}", "message": _goal(rng, extras=False), "use_cache": True,
+                    })
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - begin) * 1000)
+        finally:
+            await app.router.shutdown()
+            await close_client()
+            await engine.dispose()
+        calls = fetch_stats(base_url)["requests"] - calls_before
+        print(f"{mode:<9} {chats:>5} {statistics.mean(latencies):>8.0f} {statistics.median(latencies):>7.0f} "
+              f"{calls:>10} {_generated_tokens() - tokens_before:>8.0f}")
+
+
+def _generated_tokens() -> float:
+    """Completion tokens counted by /metrics (career_coach_llm_tokens_total{kind="completion"})."""
+    from app.services.metrics import LLM_TOKENS
+    return LLM_TOKENS.labels("completion").value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000, help="roadmaps in the index for the lookup test")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=1000)
+    args = parser.parse_args()
+
+    _bench_lookup(args.entries, args.queries)
+
+    config = FakeGroqConfig(latency=0.1, tokens_per_second=args.tokens_per_second,
+                            reply_tokens=800, roadmap_replies=True)
+    with run_fake_groq(config) as base_url:
+        os.environ.update({"GROQ_BASE_URL": base_url, "STARTUP_WARM_UP": "off", "LLM_CACHE_ENABLED": "false"})
+        os.environ.setdefault("GROQ_API_KEY", "benchmark")
+        asyncio.run(_bench_chat(args.chats, base_url))
+
+
+if __name__ == "__main__":
+    main()
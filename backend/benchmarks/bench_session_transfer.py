@@ -0,0 +1,128 @@
+"""
+Benchmark: bulk session export / import - speed and memory vs. table size.
+
+For each --rows size a database is filled with that many chat_history rows
+(sessions of --turns turns), then in a FRESH process each:
+
+- export:     all sessions to NDJSON          (services/session_transfer.py)
+- export_gz:  all sessions to gzip JSONL
+- import:     that gzip file into an empty database
+
+Reports rows per second, file size and peak memory (max RSS) of the process.
+Memory should stay flat while the row count grows. SQLite's memory-mapped
+reads (DB_MMAP_SIZE) are turned off here: pages of the database file that are
+mapped in count as RSS, although the kernel can drop them at any time.
+
+Run from the backend folder:
+    python -m benchmarks.bench_session_transfer
+    python -m benchmarks.bench_session_transfer --rows 100000 1000000 5000000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Runs in the child process: one export or import, then prints a JSON line
+CHILD = r"""
+import asyncio, json, os, resource, sys, time
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+from app.database import engine, init_db
+from app import models
+from app.services.session_transfer import export_sessions, import_sessions
+
+async def chunks_of(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+async def run(op, path):
+    await init_db()
+    before = rss_mb()
+    begin = time.perf_counter()
+    result = {}
+    if op == "import":
+        result = await import_sessions(chunks_of(path))
+    else:
+        with open(path, "wb") as out:
+            async for chunk in export_sessions(compress=op == "export_gz"):
+                out.write(chunk)
+    seconds = time.perf_counter() - begin
+    await engine.dispose()
+    print(json.dumps({"seconds": seconds, "rss_start_mb": before, "rss_peak_mb": rss_mb(),
+                      "imported": result.get("imported")}))
+
+asyncio.run(run(sys.argv[1], sys.argv[2]))
+"""
+
+
+def _seed(path: str, rows: int, turns: int) -> None:
+    """Fill chat_history (+ sessions) quickly with plain sqlite3 executemany."""
+    _child("export", path, os.devnull)   # creates the tables
+    start = datetime(2025, 1, 1)
+    reply = "Are you serious? Most people who try this fail because the market is crowded. " * 4
+
+    def history():
+        for n in range(rows // 2):
+            session, turn = divmod(n, turns)
+            ts = start + timedelta(seconds=n)
+            key = f"bench-{session}-{turn}"
+            yield (f"s{session}", "user", f"Turn {turn}: I want to be a pilot ({session})", ts.isoformat(" "), key)
+            yield (f"s{session}", "assistant", reply, (ts + timedelta(milliseconds=500)).isoformat(" "), key)
+
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO chat_history (session_id, role, content, timestamp, idempotency_key) VALUES (?, ?, ?, ?, ?)",
+            history(),
+        )
+        conn.execute("""
+            INSERT INTO sessions (session_id, language, turn_count, created_at, last_activity_at)
+            SELECT session_id, 'en', COUNT(*) / 2, MIN(timestamp), MAX(timestamp)
+            FROM chat_history GROUP BY session_id
+        """)
+
+
+def _child(op: str, db: str, path: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{db}", GROQ_API_KEY="benchmark")
+    out = subprocess.run([sys.executable, "-c", CHILD, op, path], env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--turns", type=int, default=10, help="turns per session")
+    args = parser.parse_args()
+    os.environ.setdefault("PYTHONPATH", os.getcwd())
+    os.environ.setdefault("DB_MMAP_SIZE", "0")
+
+    print(f"{'rows':>9} {'op':<10} {'seconds':>8} {'rows/s':>9} {'file MB':>8} {'RSS start':>10} {'RSS peak':>9}")
+    for rows in args.rows:
+        workdir = tempfile.mkdtemp(prefix="career-transfer-")
+        source, target = os.path.join(workdir, "source.db"), os.path.join(workdir, "target.db")
+        _seed(source, rows, args.turns)
+        for op, db, path in (
+            ("export", source, os.path.join(workdir, "sessions.ndjson")),
+            ("export_gz", source, os.path.join(workdir, "sessions.jsonl.gz")),
+            ("import", target, os.path.join(workdir, "sessions.jsonl.gz")),
+        ):
+            result = _child(op, db, path)
+            if op == "import":
+                assert result["imported"] == rows, result
+            print(f"{rows:>9} {op:<10} {result['seconds']:>8.2f} {rows / result['seconds']:>9.0f} "
+                  f"{os.path.getsize(path) / 1e6:>8.1f} {result['rss_start_mb']:>8.1f}MB {result['rss_peak_mb']:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: app startup time and idle memory per worker.
+
+Starts a fresh Python process per run (imports are only slow once), which
+imports app.main, runs the startup hooks and reports:
+
+- import_ms:  importing app.main (FastAPI, our services, the app object)
+- ready_ms:   import + startup hooks = when the worker can serve requests
+- warm_ms:    until the warm-up (Groq SDK, PDF workers, ...) has finished
+- rss_ready_mb / rss_warm_mb: memory of the app process at those points
+- pdf_workers_mb: memory of the PDF worker processes
+- heavy:      which heavy packages are loaded when the worker is ready
+
+Each configuration runs --repeat times; the median is printed.
+
+Run from the backend folder:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --tree /tmp/old-checkout/backend   (compare another commit)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Runs in the child process, inside the backend folder of --tree
+CHILD = r"""
+import asyncio, json, sys, time
+begin = time.perf_counter()
+
+def rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return 0.0
+    return 0.0
+
+HEAVY = ("groq", "httpx", "reportlab", "langdetect", "sqlalchemy", "aiosqlite")
+
+import app.main as main_module
+imported = time.perf_counter()
+
+async def run():
+    app = main_module.app
+    await app.router.startup()
+    ready = time.perf_counter()
+    result = {
+        "import_ms": (imported - begin) * 1000,
+        "ready_ms": (ready - begin) * 1000,
+        "rss_ready_mb": rss_mb(),
+        "heavy": [name for name in HEAVY if name in sys.modules],
+    }
+    warm_up = getattr(app.state, "warm_up", None)
+    if warm_up is not None:
+        await warm_up
+    result["warm_ms"] = (time.perf_counter() - begin) * 1000
+    result["rss_warm_mb"] = rss_mb()
+    from app.services.pdf_pool import pdf_pool
+    executor = pdf_pool._executor
+    result["pdf_workers_mb"] = sum(rss_mb(pid) for pid in (executor._processes if executor else {}))
+    await app.router.shutdown()
+    print(json.dumps(result))
+
+asyncio.run(run())
+"""
+
+CONFIGS = {
+    "stateless": {"APP_MODE": "stateless"},
+    "persistent": {"APP_MODE": "persistent"},
+    "stateless_blocking": {"APP_MODE": "stateless", "STARTUP_WARM_UP": "blocking"},
+    "persistent_blocking": {"APP_MODE": "persistent", "STARTUP_WARM_UP": "blocking"},
+}
+
+
+def run_once(tree: str, env: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix="career-startup-")
+    child_env = dict(
+        os.environ,
+        GROQ_API_KEY="benchmark",
+        DATABASE_URL=f"sqlite+aiosqlite:///{workdir}/bench.db",
+        PDF_CACHE_DIR=os.path.join(workdir, "pdf_cache"),
+        TEMP_PDF_DIR=os.path.join(workdir, "temp_pdfs"),
+        PYTHONPATH=tree,
+        **env,
+    )
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=tree, env=child_env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tree", default=".", help="backend folder to measure (default: this one)")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the medians to this file")
+    args = parser.parse_args()
+
+    print(f"{'config':<20} {'import':>7} {'ready':>7} {'warm':>7} {'rss rdy':>8} {'rss warm':>8} {'pdf wrk':>8}  heavy at ready")
+    report = {}
+    for name in args.configs:
+        runs = [run_once(os.path.abspath(args.tree), CONFIGS[name]) for _ in range(args.repeat)]
+        median = {key: statistics.median(run[key] for run in runs)
+                  for key in ("import_ms", "ready_ms", "warm_ms", "rss_ready_mb", "rss_warm_mb", "pdf_workers_mb")}
+        median["heavy"] = runs[-1]["heavy"]
+        report[name] = median
+        print(f"{name:<20} {median['import_ms']:>5.0f}ms {median['ready_ms']:>5.0f}ms {median['warm_ms']:>5.0f}ms "
+              f"{median['rss_ready_mb']:>6.1f}MB {median['rss_warm_mb']:>6.1f}MB {median['pdf_workers_mb']:>6.1f}MB  "
+              f"{','.join(median['heavy']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
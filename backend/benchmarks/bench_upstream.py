@@ -0,0 +1,125 @@
+"""
+Benchmark: Groq resilience (services/upstream.py) against injected failures.
+
+Runs complete_chat() against the fake Groq server in a few bad-weather
+scenarios and reports what users would see:
+
+- flaky:      20% of requests get a 429 / 500 / 503
+- rate_limit: 30% get a 429 with Retry-After: 0.5
+- outage:     Groq answers 503 to everything for the first 3 seconds
+- rpm_budget: LLM_RPM=30, 45 requests at once (the queue deadline decides)
+
+Each scenario runs twice, each time in a fresh process (settings are read
+at import):
+- no_retry: LLM_MAX_RETRIES=0 and the breaker effectively off
+- guarded:  the defaults (2 retries with jitter, breaker after 5 failures)
+
+Run from the backend folder:
+    python -m benchmarks.bench_upstream
+    python -m benchmarks.bench_upstream --requests 400 --concurrency 40
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+
+from benchmarks.fake_groq import FakeGroqConfig, fetch_stats, run_fake_groq
+
+SCENARIOS = {
+    "flaky": (dict(error_rate=0.2), {}),
+    "rate_limit": (dict(error_rate=0.3, error_statuses=(429,), retry_after=0.5), {}),
+    "outage": (dict(outage_seconds=3.0), {"LLM_BREAKER_RESET_SECONDS": "1"}),
+    "rpm_budget": (dict(), {"LLM_RPM": "30"}),
+}
+
+CONFIGS = {
+    "no_retry": {"LLM_MAX_RETRIES": "0", "LLM_BREAKER_FAILURES": "1000000"},
+    "guarded": {},
+}
+
+
+def _child(env, requests, concurrency, spread, results):
+    os.environ.update(env)
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    import asyncio
+    import logging
+    logging.disable(logging.WARNING)   # one log line per failure is too much here
+
+    async def run():
+        from app.services.llm_service import close_client, complete_chat
+        from app.services.upstream import UpstreamUnavailable, groq_guard
+
+        outcomes = []   # (kind, seconds)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            # Spread the requests over `spread` seconds (0 = all at once)
+            await asyncio.sleep(spread * i / requests)
+            async with semaphore:
+                messages = [{"role": "user", "content": f"question {i}"}]
+                begin = time.perf_counter()
+                try:
+                    await complete_chat(messages, use_cache=False)
+                    kind = "ok"
+                except UpstreamUnavailable:
+                    kind = "503"
+                except Exception:
+                    kind = "error"
+                outcomes.append((kind, time.perf_counter() - begin))
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        stats = groq_guard.stats()
+        await close_client()
+
+        ok_times = sorted(t for kind, t in outcomes if kind == "ok")
+        failed_times = [t for kind, t in outcomes if kind != "ok"]
+        results.put({
+            "ok": len(ok_times),
+            "503": sum(kind == "503" for kind, _ in outcomes),
+            "error": sum(kind == "error" for kind, _ in outcomes),
+            "ok_p50_ms": statistics.median(ok_times) * 1000 if ok_times else 0,
+            "ok_p95_ms": ok_times[int(len(ok_times) * 0.95) - 1] * 1000 if ok_times else 0,
+            "fail_p50_ms": statistics.median(failed_times) * 1000 if failed_times else 0,
+            "retries": stats["retries"],
+            "opened": stats["breaker"]["times_opened"],
+            "shed": stats["breaker"]["rejected"],
+        })
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'scenario':<11} {'config':<9} {'ok':>4} {'503':>4} {'err':>4} {'ok p50':>7} {'ok p95':>7} "
+          f"{'fail p50':>8} {'upstream':>8} {'retries':>7} {'opened':>6} {'shed':>5}")
+    for scenario in args.scenarios:
+        fake_options, scenario_env = SCENARIOS[scenario]
+        requests = 45 if scenario == "rpm_budget" else args.requests
+        # outage: spread the load over 6 s so it overlaps the outage and the recovery
+        spread = 6.0 if scenario == "outage" else 0.0
+        for name, config_env in CONFIGS.items():
+            fake = FakeGroqConfig(latency=0.05, tokens_per_second=5000, **fake_options)
+            with run_fake_groq(fake) as base_url:
+                env = dict(scenario_env, **config_env, GROQ_BASE_URL=base_url)
+                results = ctx.Queue()
+                proc = ctx.Process(target=_child, args=(env, requests, args.concurrency, spread, results))
+                proc.start()
+                r = results.get()
+                proc.join()
+                upstream = fetch_stats(base_url)["requests"]
+            print(f"{scenario:<11} {name:<9} {r['ok']:>4} {r['503']:>4} {r['error']:>4} "
+                  f"{r['ok_p50_ms']:>7.0f} {r['ok_p95_ms']:>7.0f} {r['fail_p50_ms']:>8.0f} "
+                  f"{upstream:>8} {r['retries']:>7} {r['opened']:>6} {r['shed']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark: throughput of the production launcher (serve.py) per worker count.
+
+For each --workers N it starts `python serve.py --workers N` (stateless
+mode, against the local fake Groq server, LLM cache off) and reports:
+
+- ready_s:   from start until /health answers (all workers warmed up first)
+- rps, p50 / p99 latency of POST /api/chat for --seconds, driven by
+  --clients load generator processes (so the client isn't the bottleneck)
+- rss_mb / pss_mb: memory of all workers together. PSS splits shared pages
+  between the processes that share them, so the gap to RSS is what forking
+  after preload() saves (Linux only)
+
+Throughput only grows with workers up to the number of CPU cores: on a
+machine with one core, more workers just share it.
+
+Run from the backend folder:
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --seconds 15 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .fake_groq import FakeGroqConfig, run_fake_groq
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _memory_mb(pid: int):
+    """(RSS, PSS) of one process in MB, from /proc (None, None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            values = {line.split(":")[0]: int(line.split()[1]) for line in rollup if line.split()[-1] == "kB"}
+        return values["Rss"] / 1024, values["Pss"] / 1024
+    except (OSError, KeyError):
+        return None, None
+
+
+def _worker_pids(launcher_pid: int):
+    try:
+        with open(f"/proc/{launcher_pid}/task/{launcher_pid}/children") as children:
+            return [int(pid) for pid in children.read().split()]
+    except OSError:
+        return []
+
+
+async def _load(port: int, connections: int, seconds: float, client: int):
+    import httpx
+
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def one_connection(http, number):
+        nonlocal errors
+        turn = 0
+        while time.perf_counter() < deadline:
+            turn += 1
+            begin = time.perf_counter()
+            response = await http.post("/api/chat", json={
+                "history": [], "message": f"client {client}/{number} turn {turn}: how do I become a pilot?",
+                "use_cache": False,
+            })
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - begin) * 1000)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=connections)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as http:
+        await asyncio.gather(*(one_connection(http, n) for n in range(connections)))
+    return latencies, errors
+
+
+def _load_process(port: int, connections: int, seconds: float, client: int):
+    return asyncio.run(_load(port, connections, seconds, client))
+
+
+def _wait_ready(port: int, process: subprocess.Popen, timeout: float = 120) -> bool:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def _run(workers: int, args, env) -> None:
+    port = _free_port()
+    begin = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port),
+         "--host", "127.0.0.1", "--log-level", "warning"],
+        cwd=BACKEND, env=env,
+    )
+    try:
+        if not _wait_ready(port, process):
+            print(f"{workers:>7}  serve.py did not start")
+            return
+        ready_s = time.perf_counter() - begin
+
+        # Wait until every worker is up, so the load is spread from the start
+        while len(_worker_pids(process.pid)) < workers and time.perf_counter() - begin < 120:
+            time.sleep(0.1)
+        _load_process(port, 2, 1.0, 0)   # warm-up
+
+        per_client = max(1, args.concurrency // args.clients)
+        with ProcessPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(_load_process, [port] * args.clients, [per_client] * args.clients,
+                                    [args.seconds] * args.clients, range(args.clients)))
+        latencies = sorted(value for result in results for value in result[0])
+        errors = sum(result[1] for result in results)
+
+        rss = pss = 0.0
+        for pid in _worker_pids(process.pid):
+            worker_rss, worker_pss = _memory_mb(pid)
+            rss += worker_rss or 0
+            pss += worker_pss or 0
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+        print(f"{workers:>7} {ready_s:>7.1f} {len(latencies) / args.seconds:>8.0f} "
+              f"{statistics.median(latencies) if latencies else 0:>7.1f} {p99:>7.1f} {errors:>6} "
+              f"{rss:>7.0f} {pss:>7.0f}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=8)
+    parser.add_argument("--concurrency", type=int, default=32, help="open connections in total")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="career-workers-")
+    config = FakeGroqConfig(latency=0, tokens_per_second=1e6, reply_tokens=50)
+    with run_fake_groq(config) as base_url:
+        env = dict(os.environ)
+        env.update({
+            "APP_MODE": "stateless",
+            "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+            "GROQ_BASE_URL": base_url,
+            "LLM_CACHE_ENABLED": "false",
+            "LANGUAGE_WARM_UP": "false",
+            "WORKER_MAX_REQUESTS": "0",
+        })
+        env.setdefault("GROQ_API_KEY", "benchmark")
+
+        print(f"CPU cores: {os.cpu_count()}")
+        print(f"{'workers':>7} {'ready s':>7} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'errors':>6} "
+              f"{'rss MB':>7} {'pss MB':>7}")
+        for workers in args.workers:
+            _run(workers, args, env)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Fake Groq server for benchmarks.
+
+A tiny FastAPI app that answers POST /openai/v1/chat/completions like Groq
+does (normal JSON and stream=True Server-Sent Events), with configurable
+latency and token rate. It can also fail on purpose: a share of requests
+(error_rate) gets a 429 (with Retry-After) or a 5xx, and for the first
+outage_seconds every request fails, like a Groq outage. It runs in its own process with uvicorn (so it does
+not fight the benchmark for the GIL), and the real AsyncGroq client talks to
+it over real HTTP connections.
+
+Usage:
+    with run_fake_groq(FakeGroqConfig(latency=0.2)) as base_url:
+        os.environ["GROQ_BASE_URL"] = base_url
+        ...
+        print(fetch_stats(base_url))
+"""
+
+from contextlib import contextmanager
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+
+class FakeGroqConfig:
+    """Knobs for the fake server (fixed once the server has started)."""
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 500.0,
+                 reply_tokens: int = 50, error_rate: float = 0.0,
+                 error_statuses=(429, 500, 503), retry_after: float = 1.0,
+                 outage_seconds: float = 0.0, seed: int = 0, roadmap_replies: bool = False):
+        self.latency = latency                    # seconds before the first token
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens          # how many "words" in each reply (at most max_tokens)
+        self.roadmap_replies = roadmap_replies    # replies shaped like "Month 1: ..." roadmaps
+        self.error_rate = error_rate              # share of requests that fail (0..1)
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after            # Retry-After of 429 answers
+        self.outage_seconds = outage_seconds      # everything fails until then (from first request)
+        self.seed = seed
+        self.requests = 0                         # total requests received
+        self.errors = 0                           # requests answered with an error
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+def create_fake_groq_app(config: FakeGroqConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    first_request = []
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": config.requests,
+            "errors": config.errors,
+            "in_flight": config.in_flight,
+            "max_in_flight": config.max_in_flight,
+        }
+
+    def _injected_error():
+        """An error response for this request, or None to answer normally."""
+        now = time.monotonic()
+        if not first_request:
+            first_request.append(now)
+        in_outage = now - first_request[0] < config.outage_seconds
+        if not in_outage and rng.random() >= config.error_rate:
+            return None
+        config.errors += 1
+        status = 503 if in_outage else rng.choice(config.error_statuses)
+        headers = {"retry-after": str(config.retry_after)} if status == 429 else {}
+        return JSONResponse(
+            {"error": {"message": f"injected {status}", "type": "fake_error"}},
+            status_code=status,
+            headers=headers,
+        )
+
+    def _words(count: int):
+        if config.roadmap_replies:
+            # A new "Month N:" line every 10 words
+            return [(f"\nMonth {i // 10 + 1}: " if i % 10 == 0 else "") + f"word{i} " for i in range(count)]
+        return [f"word{i} " for i in range(count)]
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        config.requests += 1
+        error = _injected_error()
+        if error is not None:
+            return error
+        config.in_flight += 1
+        config.max_in_flight = max(config.max_in_flight, config.in_flight)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+        # Like a real model, stop at max_tokens
+        reply_tokens = min(config.reply_tokens, body.get("max_tokens") or config.reply_tokens)
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": reply_tokens,
+            "total_tokens": prompt_tokens + reply_tokens,
+        }
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(config.latency + reply_tokens / config.tokens_per_second)
+            finally:
+                config.in_flight -= 1
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(_words(reply_tokens))},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        async def events():
+            try:
+                await asyncio.sleep(config.latency)
+                for word in _words(reply_tokens):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(1 / config.tokens_per_second)
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "x_groq": {"id": completion_id, "usage": usage},
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                config.in_flight -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(config: FakeGroqConfig, port: int) -> None:
+    uvicorn.run(
+        create_fake_groq_app(config),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=4096,
+    )
+
+
+def fetch_stats(base_url: str) -> dict:
+    """Request counters of a running fake server."""
+    return httpx.get(f"{base_url}/stats").json()
+
+
+@contextmanager
+def run_fake_groq(config: FakeGroqConfig = None):
+    """Start the fake server in a child process; yields its base URL."""
+    config = config or FakeGroqConfig()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(config, port), daemon=True
+    )
+    process.start()
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                fetch_stats(base_url)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or not process.is_alive():
+                    raise RuntimeError("fake Groq server did not start")
+                time.sleep(0.05)
+        yield base_url
+    finally:
+        process.terminate()
+        process.join(timeout=5)
@@ -0,0 +1,321 @@
+"""
+Benchmark suite: the whole app under load, with a JSON result per run.
+
+Boots the FastAPI app in-process (startup hooks included) against the
+local fake Groq server and a freshly seeded SQLite database, then drives
+these scenarios at each concurrency level:
+
+- chat:        POST /api/chat (a different message each time, so no cache hits)
+- pdf_inline:  POST /api/export-pdf with the roadmap text in the body
+- pdf_session: POST /api/export-pdf of a seeded session (APP_MODE=persistent)
+
+For every (scenario, concurrency) it reports throughput, p50 / p95 / p99
+latency, status codes and memory (this process + the PDF workers), and
+writes everything to one JSON file that can be compared across commits:
+
+Run from the backend folder:
+    python -m benchmarks.suite --out results.json
+    python -m benchmarks.suite --latency 0.3 --error-rate 0.05 --levels 1 10 50 --requests 300
+    python -m benchmarks.suite --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from .fake_groq import FakeGroqConfig, fetch_stats, run_fake_groq
+
+# Scenario -> the app mode that serves it (see create_app in main.py)
+SCENARIO_MODES = {"chat": "stateless", "pdf_inline": "stateless", "pdf_session": "persistent"}
+SCENARIOS = tuple(SCENARIO_MODES)
+
+GOALS = ["data scientist", "pilot", "chef", "UX designer", "nurse", "game developer", "lawyer", "teacher"]
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def _rss_mb(pid="self"):
+    """Resident memory of a process in MB (Linux /proc; None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def _memory():
+    from app.services.pdf_pool import pdf_pool
+
+    executor = pdf_pool._executor
+    workers = [_rss_mb(pid) for pid in (executor._processes if executor else {})]
+    workers = [rss for rss in workers if rss is not None]
+    # ru_maxrss is in KB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "rss_mb": _rss_mb(),
+        "peak_rss_mb": round(peak, 1),
+        "pdf_workers_rss_mb": round(sum(workers), 1) if workers else None,
+    }
+
+
+def roadmap_text(rng: random.Random, goal: str, months: int = 6) -> str:
+    """A markdown roadmap like the ones the coach writes."""
+    lines = [f"# Roadmap: becoming a {goal}", ""]
+    for month in range(1, months + 1):
+        lines.append(f"## Month {month}")
+        for step in range(1, rng.randint(3, 6)):
+            lines.append(f"- Step {step}: practise **{goal}** skills for {rng.randint(1, 4)} hours a day")
+        lines.append("")
+    return "\n".join(lines)
+
+
+async def seed_database(sessions: int, turns: int, seed: int):
+    """Fill the (empty) database with `sessions` chats of `turns` turns each."""
+    from app.database import SessionLocal, init_db
+    from app.services.chat_writer import TurnToSave, add_turns
+
+    await init_db()
+    rng = random.Random(seed)
+    session_ids = []
+    async with SessionLocal() as db:
+        for n in range(sessions):
+            session_id = f"bench-{n}"
+            goal = rng.choice(GOALS)
+            batch = [
+                TurnToSave(session_id, f"I want to be a {goal} ({t})", roadmap_text(rng, goal), "en")
+                for t in range(turns)
+            ]
+            await add_turns(db, batch)
+            session_ids.append(session_id)
+        await db.commit()
+    return session_ids
+
+
+def _make_request(scenario: str, i: int, rng: random.Random, session_ids, pdf_distinct: int):
+    """(path, json body) of the i-th request of a scenario."""
+    if scenario == "chat":
+        return "/api/chat", {"history": [], "message": f"I want to be a {rng.choice(GOALS)} #{i}"}
+    if scenario == "pdf_inline":
+        # pdf_distinct=0: every export is new (cold render); N: N documents repeat (cache hits)
+        doc = i if pdf_distinct == 0 else i % pdf_distinct
+        content = roadmap_text(random.Random(doc), GOALS[doc % len(GOALS)]) + f"\nDocument {doc}"
+        return "/api/export-pdf", {"content": content, "title": "Career Roadmap"}
+    session_id = session_ids[i % len(session_ids)]
+    return "/api/export-pdf", {"session_id": session_id, "message": "export"}
+
+
+async def run_level(client, scenario: str, concurrency: int, requests: int, first: int, session_ids, args):
+    """
+    `concurrency` clients send `requests` requests in total, each waiting for its answer.
+
+    Requests are numbered from `first`, so a level never re-sends the chats or
+    documents of the level before it (which would only measure the caches).
+    """
+    rng = random.Random(args.seed + first)
+    work = [_make_request(scenario, first + i, rng, session_ids, args.pdf_distinct)
+            for i in range(requests)]
+    work.reverse()
+    latencies = []
+    statuses = Counter()
+
+    async def client_loop():
+        while work:
+            path, body = work.pop()
+            begin = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                statuses[str(response.status_code)] += 1
+                if response.status_code < 400:
+                    latencies.append(time.perf_counter() - begin)
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - begin
+
+    ok = len(latencies)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": ok,
+        "errors": requests - ok,
+        "status_counts": dict(statuses),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if ok else None,
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2) if ok else None,
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2) if ok else None,
+        "max_ms": round(max(latencies) * 1000, 2) if ok else None,
+        "memory": _memory(),
+    }
+
+
+async def run_suite(args):
+    """Run the scenarios; each mode gets its own app (create_app) and startup / shutdown."""
+    import httpx
+    from app.main import create_app
+
+    session_ids = await seed_database(args.sessions, args.turns, args.seed)
+    results = []
+    metrics = []
+    for mode in ("stateless", "persistent"):
+        scenarios = [s for s in args.scenarios if SCENARIO_MODES[s] == mode]
+        if not scenarios:
+            continue
+        app = create_app(mode)
+        # ASGITransport does not send lifespan events: run the startup hooks ourselves
+        await app.router.startup()
+        try:
+            if app.state.warm_up is not None:
+                await app.state.warm_up   # measure serving, not warm-up
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                for scenario in scenarios:
+                    for n, level in enumerate(args.levels):
+                        first = n * args.requests
+                        result = await run_level(client, scenario, level, args.requests, first, session_ids, args)
+                        results.append(result)
+                        _print_row(result)
+                if args.keep_metrics:
+                    metrics.append((await client.get("/metrics")).text)
+        finally:
+            await app.router.shutdown()
+    return results, "".join(metrics) if args.keep_metrics else None
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "") or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_row(r):
+    def ms(value):
+        return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+    print(f"{r['scenario']:<12} {r['concurrency']:>5} {r['ok']:>5} {r['errors']:>5} {r['throughput_rps']:>8.1f} "
+          f"{ms(r['p50_ms'])} {ms(r['p95_ms'])} {ms(r['p99_ms'])} {r['memory']['rss_mb'] or 0:>7.1f}")
+
+
+def compare(before_path: str, after_path: str):
+    """Print throughput and latency changes between two result files."""
+    with open(before_path) as f:
+        before = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+
+    def change(old, new):
+        if not old or new is None:
+            return f"{'-':>8}"
+        return f"{(new - old) / old * 100:>+7.1f}%"
+
+    print(f"{'scenario':<12} {'conc':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'rss':>8}")
+    for r in after:
+        old = before.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        print(f"{r['scenario']:<12} {r['concurrency']:>5} "
+              f"{change(old['throughput_rps'], r['throughput_rps'])} "
+              f"{change(old['p50_ms'], r['p50_ms'])} {change(old['p95_ms'], r['p95_ms'])} "
+              f"{change(old['p99_ms'], r['p99_ms'])} "
+              f"{change(old['memory']['rss_mb'], r['memory']['rss_mb'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50], help="concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Groq seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0, help="fake Groq token rate")
+    parser.add_argument("--reply-tokens", type=int, default=50, help="words per fake Groq reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake Groq calls that fail")
+    parser.add_argument("--sessions", type=int, default=200, help="seeded chat sessions")
+    parser.add_argument("--turns", type=int, default=10, help="seeded turns per session")
+    parser.add_argument("--pdf-distinct", type=int, default=0,
+                        help="distinct inline PDF documents (0 = every export is a new document)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--keep-metrics", action="store_true", help="store the final /metrics text too")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    fake = FakeGroqConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                          reply_tokens=args.reply_tokens, error_rate=args.error_rate, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="career-bench-")
+    with run_fake_groq(fake) as base_url:
+        # Settings are read at import, so everything is set before the app is imported
+        os.environ.update({
+            "GROQ_BASE_URL": base_url,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+            "PDF_CACHE_DIR": os.path.join(workdir, "pdf_cache"),
+            "TEMP_PDF_DIR": os.path.join(workdir, "temp_pdfs"),
+            "LLM_CACHE_SQLITE_PATH": "",
+        })
+        os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+        print(f"{'scenario':<12} {'conc':>5} {'ok':>5} {'err':>5} {'req/s':>8} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rss MB':>7}")
+        results, metrics = asyncio.run(run_suite(args))
+        upstream = fetch_stats(base_url)
+
+    from app.config import settings
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+            "fake_groq": {k: v for k, v in vars(fake).items()
+                          if k not in ("requests", "errors", "in_flight", "max_in_flight")},
+            "app": {
+                "LLM_MAX_CONCURRENCY": settings.LLM_MAX_CONCURRENCY,
+                "PDF_WORKERS": settings.PDF_WORKERS,
+                "PDF_MAX_QUEUE": settings.PDF_MAX_QUEUE,
+                "DB_PROFILE": settings.DB_PROFILE,
+                "DB_WRITE_BATCHING": settings.DB_WRITE_BATCHING,
+            },
+        },
+        "results": results,
+        "upstream": upstream,
+    }
+    if metrics is not None:
+        report["metrics"] = metrics
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
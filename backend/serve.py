@@ -0,0 +1,180 @@
+# backend/serve.py
+"""
+Production server: several warm uvicorn workers behind one port.
+
+run.py is for development (one process, auto-reload). This launcher:
+
+- loads the app ONCE in this process (app.main.preload: routers, Groq SDK,
+  language profiles, database tables) and then forks WEB_WORKERS workers
+  (default: one per CPU core), which share that memory copy-on-write
+- every worker warms up before it accepts a connection: PDF worker
+  processes with ReportLab and its stylesheets, the Groq client
+  (STARTUP_WARM_UP=blocking, unless set otherwise)
+- all workers accept from the same listening socket, so any worker may get
+  any request. With more than one worker the per-worker history buffer
+  (services/history_service.py) is switched off - another worker may have
+  saved turns it never saw - and every turn reads its history from the
+  database. Stateless delta chats (services/conversation_store.py) that
+  reach a worker without their copy get a 409 and resync with the full
+  history; put a proxy with sticky sessions in front to avoid that
+- a worker that has served WORKER_MAX_REQUESTS requests (+ random jitter)
+  finishes its running requests, exits and is replaced by a fresh one, so
+  slow memory growth can't pile up
+- SIGTERM / Ctrl+C: workers stop accepting, let running requests and
+  streaming replies finish (up to GRACEFUL_TIMEOUT_SECONDS), then exit
+
+Needs os.fork (Linux / macOS). Settings come from the environment (.env),
+see config.py; command line options override them.
+
+Run from the backend folder:
+    python serve.py
+    python serve.py --workers 4 --port 8000
+"""
+
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+
+# Workers warm up before they accept traffic (read by app.config at import)
+os.environ.setdefault("STARTUP_WARM_UP", "blocking")
+
+import uvicorn
+
+from app.config import settings
+
+logger = logging.getLogger("serve")
+
+# A worker that dies sooner than this after starting is restarted with a pause
+MIN_WORKER_SECONDS = 5.0
+
+
+def _serve_worker(sock: socket.socket, args) -> None:
+    """Body of one forked worker process (never returns: exits the process)."""
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+        signal.signal(sig, signal.SIG_DFL)
+    random.seed()
+
+    from app.main import create_app
+
+    max_requests = None
+    if args.max_requests > 0:
+        max_requests = args.max_requests + random.randint(0, max(0, settings.WORKER_MAX_REQUESTS_JITTER))
+    config = uvicorn.Config(
+        create_app(),
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    except Exception:
+        logger.exception(f"Worker {os.getpid()} crashed")
+        sys.exit(1)
+    # A normal exit, so multiprocessing cleans up after the PDF pool
+    sys.exit(0)
+
+
+class Launcher:
+    """Forks the workers, replaces the ones that exit, stops them all on SIGTERM."""
+
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}          # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _serve_worker(self.sock, self.args)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, sig, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Stopping {len(self.workers)} worker(s), waiting up to {self.args.graceful_timeout} s")
+        for pid in self.workers:
+            self._signal(pid, signal.SIGTERM)
+        # Workers that are still busy after the graceful timeout are killed
+        signal.alarm(self.args.graceful_timeout + 5)
+
+    def kill(self, sig, frame) -> None:
+        for pid in self.workers:
+            logger.warning(f"Killing worker {pid} (graceful timeout exceeded)")
+            self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGALRM, self.kill)
+        for _ in range(self.args.workers):
+            self.spawn()
+        logger.info(f"Serving on http://{self.args.host}:{self.args.port} with {self.args.workers} worker(s)")
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            # Recycled (max requests) or crashed: start a fresh worker
+            code = os.waitstatus_to_exitcode(status)
+            logger.info(f"Worker {pid} exited ({code}), starting a new one")
+            if time.monotonic() - started < MIN_WORKER_SECONDS:
+                time.sleep(1)   # don't spin if workers fail right at startup
+            if not self.stopping:
+                self.spawn()
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--max-requests", type=int, default=settings.WORKER_MAX_REQUESTS)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork (Linux / macOS). On Windows use: uvicorn app.main:app")
+
+    # Workers share no memory: a buffered history could miss turns that
+    # another worker saved, so read it from the database every time
+    if args.workers > 1 and settings.HISTORY_BUFFER_MAX_SESSIONS > 0:
+        logger.info(f"{args.workers} workers: history buffer off (HISTORY_BUFFER_MAX_SESSIONS=0)")
+        settings.HISTORY_BUFFER_MAX_SESSIONS = 0
+
+    # Load everything once, before forking (shared copy-on-write by the workers)
+    from app.main import preload
+    preload()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    Launcher(sock, args).run()
+
+
+if __name__ == "__main__":
+    main()
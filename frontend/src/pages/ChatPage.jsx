@@ -8,7 +8,7 @@ import { useChat } from '../hooks/useChat';
 import Navbar from '../components/Navbar';
 
 const ChatPage = () => {
-  const { messages, addMessage, goal } = useChatStore();
+  const { messages, addMessage, goal, sessionId, historyVersion, setHistoryVersion } = useChatStore();
   const { mutate: sendMessage, isPending } = useChat();
   const [lastError, setLastError] = useState(null);
   const messagesEndRef = useRef(null);
@@ -25,11 +25,14 @@ const ChatPage = () => {
 
     sendMessage(
       {
-        history: messages,
+        history: messages.filter(m => !m.isError),
         message: text.trim(),
+        sessionId,
+        historyVersion,
       },
       {
         onSuccess: (data) => {
+          setHistoryVersion(data?.history_version || null);
           addMessage({
             role: 'assistant',
             content: data?.reply || 'No response from coach.',
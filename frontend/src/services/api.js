@@ -11,19 +11,32 @@ const getErrorMessage = async (response) => {
   }
 };
 
+const postChat = (body) =>
+  fetch(`${API_BASE}/api/chat`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(body),
+    signal: AbortSignal.timeout(30000),
+  });
+
 /**
  * Send chat message to backend
+ *
+ * Once the server knows the chat (historyVersion from the last reply), only
+ * the new message is sent. If the server's copy is gone or differs (409),
+ * the full history is sent once instead.
  */
-export async function sendChatMessage({ history, message }) {
+export async function sendChatMessage({ history, message, sessionId, historyVersion }) {
   try {
-    const response = await fetch(`${API_BASE}/api/chat`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({ history, message }),
-      signal: AbortSignal.timeout(30000),
-    });
+    let response = historyVersion
+      ? await postChat({ session_id: sessionId, history_version: historyVersion, message })
+      : await postChat({ session_id: sessionId, history, message });
+
+    if (response.status === 409 && historyVersion) {
+      response = await postChat({ session_id: sessionId, history, message });
+    }
 
     if (!response.ok) {
       const errorMsg = await getErrorMessage(response);
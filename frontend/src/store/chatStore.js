@@ -2,9 +2,14 @@
 
 import { create } from 'zustand';
 
+const newSessionId = () => crypto.randomUUID();
+
 export const useChatStore = create((set) => ({
   messages: [],
   goal: '',
+  // The server keeps a copy of the chat: after the first reply only new messages are sent
+  sessionId: newSessionId(),
+  historyVersion: null,
   
   addMessage: (message) =>
     set((state) => ({
@@ -13,5 +18,7 @@ export const useChatStore = create((set) => ({
 
   setGoal: (goal) => set({ goal }),
 
-  reset: () => set({ messages: [], goal: '' }),
+  setHistoryVersion: (historyVersion) => set({ historyVersion }),
+
+  reset: () => set({ messages: [], goal: '', sessionId: newSessionId(), historyVersion: null }),
 }));
\ No newline at end of file